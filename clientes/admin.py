@@ -1,6 +1,21 @@
 from django.contrib import admin
+
+from mi_proyecto.bajas import eliminar_o_desactivar
+from .busqueda import invalidar_autocompletar
 from .models import Cliente
 
-# Register your models here.
-# Mostrar el modelo Cliente en el panel de administración.
-admin.site.register(Cliente)
\ No newline at end of file
+
+# Mostrar el modelo Cliente en el panel de administración, con una acción para
+# dar de baja muchos a la vez: se borran los que no compraron y se inactiva el resto.
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'apellido', 'email', 'activo')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'apellido', 'email')
+    actions = ['eliminar_o_inactivar']
+
+    @admin.action(description="Eliminar o inactivar (si tienen compras)")
+    def eliminar_o_inactivar(self, request, queryset):
+        borrados, inactivados = eliminar_o_desactivar(queryset, 'compras')
+        invalidar_autocompletar()
+        self.message_user(request, f"{borrados} cliente(s) eliminado(s) y {inactivados} inactivado(s).")
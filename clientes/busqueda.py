@@ -0,0 +1,26 @@
+from mi_proyecto.busqueda import buscar
+from mi_proyecto.cache import CacheLRU, invalidar
+
+from .models import Cliente
+
+# Campos indexados en la tabla FTS de clientes (ver migración 0003).
+CAMPOS_BUSQUEDA = ('nombre', 'apellido', 'email')
+
+
+def buscar_clientes(texto, queryset=None):
+    """
+    Busca clientes por nombre, apellido y email, ordenados por relevancia.
+    """
+    if queryset is None:
+        queryset = Cliente.objects.all()
+    return buscar(queryset, texto, CAMPOS_BUSQUEDA)
+
+
+# Resultados del autocompletado de clientes, se limpia al guardar o borrar un
+# cliente. La clave lleva la versión de los clientes, como en productos.
+cache_autocompletar = CacheLRU(maximo=512, vencimiento=60)
+
+
+def invalidar_autocompletar():
+    cache_autocompletar.limpiar()
+    invalidar('clientes')
@@ -0,0 +1,17 @@
+from mi_proyecto.exportar import TAMANIO_BLOQUE, filtro_de_fechas
+
+from .models import Cliente
+
+ENCABEZADOS = ('id', 'nombre', 'apellido', 'email', 'telefono', 'activo', 'fecha_creacion')
+
+
+def filas_clientes(desde=None, hasta=None, activo=None):
+    """
+    Clientes dados de alta entre dos días (inclusive), en orden de id.
+    """
+    clientes = Cliente.objects.filter(**filtro_de_fechas('fecha_creacion', desde, hasta))
+    if activo is not None:
+        clientes = clientes.filter(activo=activo)
+    filas = clientes.order_by('id').values_list(*ENCABEZADOS)
+    for fila in filas.iterator(chunk_size=TAMANIO_BLOQUE):
+        yield fila[:5] + ('si' if fila[5] else 'no',) + fila[6:]
@@ -0,0 +1,48 @@
+from mi_proyecto.importar import TAMANIO_LOTE, booleano, email, importar, texto, texto_opcional, upsert
+
+from mi_proyecto.busqueda import indice_en_bloque
+
+from .busqueda import CAMPOS_BUSQUEDA, invalidar_autocompletar
+from .models import Cliente
+
+# Columnas que se pueden importar. Un archivo exportado (ver exportar.py) se
+# puede volver a importar: `id` y `fecha_creacion` se ignoran.
+CONVERSIONES = {
+    'nombre': texto(100, obligatorio=True),
+    'apellido': texto(100, obligatorio=True),
+    'email': email,
+    'telefono': texto_opcional(20),
+    'activo': booleano,
+}
+OBLIGATORIAS = ('nombre', 'apellido', 'email')
+
+
+def importar_clientes(archivo, lote=TAMANIO_LOTE):
+    """
+    Crea o actualiza clientes desde un CSV, usando el email como clave.
+    Las columnas que no están en el archivo no se tocan en los clientes que
+    ya existen. Devuelve un ResultadoImportacion.
+    """
+    resultado = importar(archivo, CONVERSIONES, OBLIGATORIAS, 'email', guardar_clientes, lote, modelo=Cliente)
+    # Se escribe sin pasar por el modelo y no hay señales: limpiamos el autocompletado a mano.
+    invalidar_autocompletar()
+    return resultado
+
+
+def guardar_clientes(filas, columnas):
+    emails = [valores['email'] for _, valores in filas]
+    existentes = {
+        email: (nombre, apellido)
+        for email, nombre, apellido in Cliente.objects.filter(email__in=emails).values_list('email', 'nombre', 'apellido')
+    }
+    # Solo se reindexan los nuevos y los que cambian de nombre o apellido.
+    a_indexar = [
+        valores['email'] for _, valores in filas
+        if existentes.get(valores['email']) != (valores['nombre'], valores['apellido'])
+    ]
+    with indice_en_bloque(Cliente, CAMPOS_BUSQUEDA, 'email', a_indexar):
+        upsert(
+            Cliente, [valores for _, valores in filas], clave='email',
+            actualizar=[columna for columna in columnas if columna != 'email'],
+        )
+    return len(filas) - len(existentes), len(existentes), []
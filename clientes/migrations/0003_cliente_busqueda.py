@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from mi_proyecto import busqueda
+
+
+def crear_indice(apps, schema_editor):
+    busqueda.crear_indice(schema_editor, 'clientes_cliente', ['nombre', 'apellido', 'email'])
+
+
+def eliminar_indice(apps, schema_editor):
+    busqueda.eliminar_indice(schema_editor, 'clientes_cliente')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_cliente_activo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
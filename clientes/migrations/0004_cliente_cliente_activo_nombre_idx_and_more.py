@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0003_cliente_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['nombre', 'id'], name='cliente_activo_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('activo', False)), fields=['nombre', 'id'], name='cliente_inactivo_nombre_idx'),
+        ),
+    ]
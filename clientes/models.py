@@ -10,6 +10,13 @@ class Cliente(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     activo = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Listas de activos e inactivos: filtran por `activo` y paginan por (nombre, id).
+            models.Index(fields=['nombre', 'id'], condition=models.Q(activo=True), name='cliente_activo_nombre_idx'),
+            models.Index(fields=['nombre', 'id'], condition=models.Q(activo=False), name='cliente_inactivo_nombre_idx'),
+        ]
+
     
     def __str__(self):
         return f"{self.nombre} {self.apellido}."
@@ -0,0 +1,11 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .busqueda import invalidar_autocompletar
+from .models import Cliente
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def clientes_cambiaron(sender, **kwargs):
+    invalidar_autocompletar()
@@ -1,3 +1,220 @@
-from django.test import TestCase
+import base64
+import os
+import tempfile
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from mi_proyecto import bajas
+from mi_proyecto.paginacion import ANTERIOR, SIGUIENTE, codificar_cursor
+from productos.models import Producto
+from ventas.servicios import registrar_venta
+from .busqueda import buscar_clientes, cache_autocompletar
+from .models import Cliente
 
 # Create your tests here.
+
+# La búsqueda sin acentos y por relevancia usa FTS5; con otros motores es `icontains`.
+SOLO_FTS5 = skipUnless(connection.vendor == 'sqlite', 'la búsqueda con FTS5 es propia de SQLite')
+
+
+def crear_cliente(nombre='Juan', apellido='Pérez', email=None, **campos):
+    return Cliente.objects.create(
+        nombre=nombre,
+        apellido=apellido,
+        email=email or f'{nombre.lower()}.{apellido.lower()}@ejemplo.com',
+        **campos,
+    )
+
+
+@SOLO_FTS5
+class BusquedaClientesTests(TestCase):
+
+    def setUp(self):
+        self.juan = crear_cliente('Juan', 'Pérez', 'jperez@kiosco.com')
+        self.maria = crear_cliente('María', 'Gómez', 'maria@correo.com')
+
+    def test_busca_por_nombre_apellido_y_email(self):
+        self.assertEqual(list(buscar_clientes('maria')), [self.maria])
+        self.assertEqual(list(buscar_clientes('perez')), [self.juan])
+        self.assertEqual(list(buscar_clientes('kiosco')), [self.juan])
+
+    def test_combina_nombre_y_apellido(self):
+        self.assertEqual(list(buscar_clientes('mar gom')), [self.maria])
+        self.assertEqual(list(buscar_clientes('juan gomez')), [])
+
+
+class AutocompletarClientesTests(TestCase):
+
+    def setUp(self):
+        cache_autocompletar.limpiar()
+        self.juan = crear_cliente('Juan', 'Pérez', 'jperez@kiosco.com')
+        crear_cliente('Juana', 'Inactiva', activo=False)
+
+    def autocompletar(self, texto, **parametros):
+        return self.client.get(reverse('autocompletar_clientes'), {'q': texto, **parametros}).json()['resultados']
+
+    def test_devuelve_clientes_activos(self):
+        self.assertEqual(self.autocompletar('jua'), [
+            {'id': self.juan.id, 'nombre': 'Juan', 'apellido': 'Pérez', 'email': 'jperez@kiosco.com'},
+        ])
+
+    def test_limite_no_positivo_usa_el_predeterminado(self):
+        for limite in (-5, 0):
+            self.assertEqual(len(self.autocompletar('jua', limite=limite)), 1)
+
+    def test_borrar_un_cliente_invalida_el_cache(self):
+        self.autocompletar('juan')
+        with self.assertNumQueries(0):
+            self.autocompletar('juan')
+        self.juan.delete()
+
+        self.assertEqual(self.autocompletar('juan'), [])
+
+
+@override_settings(TAMANIO_PAGINA={'clientes': 2})
+class ListaClientesTests(TestCase):
+
+    def setUp(self):
+        for nombre in ['Carla', 'Ana', 'Beto', 'Ana', 'Dario']:
+            crear_cliente(nombre, email=f'{nombre}{Cliente.objects.count()}@ejemplo.com')
+        crear_cliente('Inactivo', activo=False)
+
+    def recorrer(self, url):
+        nombres = []
+        pagina = self.client.get(url).context['pagina_actual']
+        nombres += [c.nombre for c in pagina]
+        while pagina.has_next:
+            with self.assertNumQueries(1):  # sin COUNT(*) ni OFFSET
+                pagina = self.client.get(url, {'cursor': pagina.cursor_siguiente}).context['pagina_actual']
+            nombres += [c.nombre for c in pagina]
+        return pagina, nombres
+
+    def test_recorre_todas_las_paginas_en_orden(self):
+        ultima, nombres = self.recorrer(reverse('lista_clientes'))
+
+        self.assertEqual(nombres, ['Ana', 'Ana', 'Beto', 'Carla', 'Dario'])
+        self.assertTrue(ultima.has_previous)
+        self.assertEqual(ultima.total_estimado, 5)
+
+    def test_vuelve_a_la_pagina_anterior(self):
+        primera = self.client.get(reverse('lista_clientes')).context['pagina_actual']
+        segunda = self.client.get(reverse('lista_clientes'), {'cursor': primera.cursor_siguiente}).context['pagina_actual']
+        anterior = self.client.get(reverse('lista_clientes'), {'cursor': segunda.cursor_anterior}).context['pagina_actual']
+
+        self.assertEqual(list(anterior), list(primera))
+        self.assertFalse(anterior.has_previous)
+
+    def test_cursor_invalido_muestra_la_primera_pagina(self):
+        pagina = self.client.get(reverse('lista_clientes'), {'cursor': 'no-es-un-cursor'}).context['pagina_actual']
+        self.assertEqual([c.nombre for c in pagina], ['Ana', 'Ana'])
+
+    def test_cursor_con_valores_de_otro_tipo_muestra_la_primera_pagina(self):
+        cursores = [
+            codificar_cursor(SIGUIENTE, ['x', 'y']),
+            codificar_cursor(SIGUIENTE, [None, None]),
+            codificar_cursor(ANTERIOR, [['x'], {}]),
+            codificar_cursor(SIGUIENTE, ['2026-01-01T00:00:00', 10**30]),
+            codificar_cursor(SIGUIENTE, ['Ana']),
+            base64.urlsafe_b64encode(b'[null,null]').decode(),
+        ]
+        urls = ['lista_clientes', 'clientes_inactivos', 'lista_productos', 'productos_inactivos',
+                'lista_ventas', 'ventas_anuladas']
+        for nombre in urls:
+            for cursor in cursores:
+                with self.subTest(url=nombre, cursor=cursor):
+                    respuesta = self.client.get(reverse(nombre), {'cursor': cursor})
+                    self.assertEqual(respuesta.status_code, 200)
+                    self.assertFalse(respuesta.context['pagina_actual'].has_previous)
+
+    def test_inactivos(self):
+        _, nombres = self.recorrer(reverse('clientes_inactivos'))
+        self.assertEqual(nombres, ['Inactivo'])
+
+
+class ExportarClientesTests(TestCase):
+
+    def test_exporta_csv_filtrando_por_activo(self):
+        crear_cliente('Ana')
+        crear_cliente('Beto', activo=False)
+
+        respuesta = self.client.get(reverse('exportar_clientes'), {'activo': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+        filas = b''.join(respuesta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(filas), 2)
+        self.assertTrue(filas[0].startswith('id,nombre,'))
+        self.assertIn('Ana', filas[1])
+
+
+class ImportarClientesTests(TestCase):
+
+    def test_comando_crea_y_actualiza_por_email_e_informa_errores(self):
+        juan = crear_cliente('Juan', 'Pérez', 'juan@ejemplo.com', telefono='111')
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'clientes.csv')
+            informe = os.path.join(carpeta, 'errores.csv')
+            with open(archivo, 'w', encoding='utf-8') as f:
+                f.write(
+                    'nombre,apellido,email,activo\n'
+                    'Juan Carlos,Pérez,juan@ejemplo.com,no\n'
+                    'Ana,Gómez,ana@ejemplo.com,\n'
+                    'Beto,,no-es-un-email,si\n'
+                )
+            salida = StringIO()
+            call_command('importar', 'clientes', archivo, errores=informe, stdout=salida)
+            self.assertIn('1 creada(s), 1 actualizada(s), 1 con errores', salida.getvalue())
+            with open(informe, encoding='utf-8') as f:
+                lineas = f.read().splitlines()
+            self.assertEqual(lineas[0], 'linea,error')
+            self.assertTrue(lineas[1].startswith('4,'))
+            self.assertIn('apellido: es obligatorio', lineas[1])
+            self.assertIn('email:', lineas[1])
+
+            with self.assertRaises(CommandError):
+                call_command('importar', 'clientes', os.path.join(carpeta, 'no-existe.csv'), stdout=StringIO())
+
+        juan.refresh_from_db()
+        self.assertEqual((juan.nombre, juan.activo, juan.telefono), ('Juan Carlos', False, '111'))
+        self.assertTrue(Cliente.objects.get(email='ana@ejemplo.com').activo)
+        self.assertEqual(list(buscar_clientes('carlos')), [juan])
+
+
+@override_settings(METRICAS_PRESUPUESTO_ESTRICTO=True)
+class BajaMasivaClientesTests(TestCase):
+
+    def test_borra_los_que_no_compraron_e_inactiva_el_resto(self):
+        juan, maria = crear_cliente('Juan'), crear_cliente('María')
+        crear_cliente('Pedro')  # No se pide: queda como está.
+        sin_compras = [crear_cliente(f'Cliente{numero}').id for numero in range(20)]
+        producto = Producto.objects.create(nombre='Alfajor', precio=10, stock=5)
+        registrar_venta(juan, {producto.id: 1})
+        respuesta = self.client.post(reverse('eliminar_clientes'), {'ids': [juan.id, maria.id, *sin_compras]})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(
+            list(Cliente.objects.order_by('nombre').values_list('nombre', 'activo')),
+            [('Juan', False), ('Pedro', True)],
+        )
+
+    # La venta simulada cuenta dentro de la solicitud: se pasa del presupuesto.
+    @override_settings(METRICAS_PRESUPUESTO_ESTRICTO=False)
+    def test_el_que_compra_mientras_tanto_se_inactiva(self):
+        maria, ana = crear_cliente('María'), crear_cliente('Ana')
+        producto = Producto.objects.create(nombre='Alfajor', precio=10, stock=5)
+        usados_de_verdad = bajas._usados
+
+        def venta_mientras_tanto(queryset, relacion):
+            # Se ve sin compras, y antes del DELETE se confirma una venta suya.
+            usados = usados_de_verdad(queryset, relacion)
+            registrar_venta(maria, {producto.id: 1})
+            return usados
+
+        with mock.patch('mi_proyecto.bajas._usados', side_effect=venta_mientras_tanto):
+            with self.assertLogs('mi_proyecto.metricas', 'WARNING'):
+                respuesta = self.client.post(reverse('eliminar_clientes'), {'ids': [maria.id, ana.id]})
+        self.assertEqual(respuesta.status_code, 302)
+        self.assertEqual(list(Cliente.objects.values_list('nombre', 'activo')), [('María', False)])
+        self.assertEqual(maria.compras.count(), 1)
@@ -7,6 +7,10 @@ urlpatterns = [
     path('clientes/crear/', views.crear_cliente, name='crear_cliente'),
     path('clientes/editar/<int:cliente_id>/', views.editar_cliente, name='editar_cliente'),
     path('clientes/eliminar/<int:cliente_id>/', views.eliminar_cliente, name='eliminar_cliente'),
+    path('clientes/eliminar/', views.eliminar_clientes, name='eliminar_clientes'),
     path('clientes/inactivos/', views.clientes_inactivos, name='clientes_inactivos'),
+    path('clientes/autocompletar/', views.autocompletar_clientes, name='autocompletar_clientes'),
+    path('clientes/exportar/', views.exportar_clientes, name='exportar_clientes'),
+    path('clientes/importar/', views.importar_clientes, name='importar_clientes'),
 ]
 
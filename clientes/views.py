@@ -1,25 +1,41 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
+from django.http import HttpResponseBadRequest, JsonResponse
+from .busqueda import buscar_clientes, cache_autocompletar, invalidar_autocompletar
+from .exportar import ENCABEZADOS, filas_clientes
+from .importar import CONVERSIONES, OBLIGATORIAS, importar_clientes as importar_csv
 from .models import Cliente
-from django.core.paginator import Paginator
+from mi_proyecto.bajas import eliminar_o_desactivar, leer_ids
+from mi_proyecto.cache import arender_lista, contexto_lista, version
+from mi_proyecto.exportar import exportar, leer_booleano, leer_fecha
+from mi_proyecto.importar import vista_importar
+from mi_proyecto.metricas import presupuesto_consultas
+from mi_proyecto.paginacion import paginar
 from django.contrib import messages
 
+# Cantidad de resultados del autocompletado, por defecto y como máximo.
+LIMITE_AUTOCOMPLETAR = 10
+MAXIMO_AUTOCOMPLETAR = 50
+
 # Create your views here.
 
 
 # Funcion que muestra la lista de los clientes.
-def lista_clientes(request):
+@presupuesto_consultas(1)
+async def lista_clientes(request):
     """
     Vista para mostrar la lista de todos los clientes.
     """
-    lista_clientes = Cliente.objects.filter(activo=True).order_by('nombre')
-    paginator = Paginator(lista_clientes, 4)  # Mostrar 4 clientes por página.
-    num_pagina = request.GET.get('page') or 1  # Obtener el número de página de la solicitud, por defecto es 1
-    pagina_actual = paginator.get_page(num_pagina)
+    lista_clientes = Cliente.objects.filter(activo=True)
+    pagina_actual = paginar(request, lista_clientes, ('nombre', 'id'), 'clientes')
     
-    return render(request, 'clientes/lista_clientes.html', {'pagina_actual': pagina_actual})
+    return await arender_lista(
+        request, 'clientes/lista_clientes.html', 'lista_clientes', {'pagina_actual': pagina_actual}, 'clientes',
+    )
 
 
 #Funcion que nos permite crear un nuevo cliente.
+@presupuesto_consultas(1)
 def crear_cliente(request):
     """
     Vista para crear un nuevo cliente.
@@ -41,6 +57,7 @@ def crear_cliente(request):
 
 
 # Funcion que nos permite editar los datos de un cliente.
+@presupuesto_consultas(2)
 def editar_cliente(request, cliente_id):
     """
     Vista para editar los datos de un cliente.
@@ -68,6 +85,7 @@ def editar_cliente(request, cliente_id):
     return render(request, 'clientes/editar_cliente.html',{'cliente':cliente} )
 
 
+@presupuesto_consultas(3)
 def eliminar_cliente(request, cliente_id):
     """
     Vista para eliminar o inactivar un cliente, según si tiene compras.
@@ -93,13 +111,81 @@ def eliminar_cliente(request, cliente_id):
         'tiene_compras': tiene_compras
     })
     
+@require_POST
+@presupuesto_consultas(7)
+def eliminar_clientes(request):
+    """
+    Baja de varios clientes a la vez (los `ids` del formulario): se borran
+    los que no tienen compras y se marcan inactivos los demás.
+    """
+    borrados, inactivados = eliminar_o_desactivar(Cliente.objects.filter(pk__in=leer_ids(request)), 'compras')
+    # El UPDATE no dispara señales (ver signals.py).
+    invalidar_autocompletar()
+    messages.success(request, f"✅ {borrados} cliente(s) eliminado(s) y {inactivados} inactivado(s).")
+    return redirect('lista_clientes')
+
+
+@presupuesto_consultas(1)
 def clientes_inactivos(request):
     """
     Vista para mostrar la lista de clientes inactivos.
     """
-    lista_clientes_inactivos = Cliente.objects.filter(activo=False).order_by('nombre')
-    paginator = Paginator(lista_clientes_inactivos, 4)  # Mostrar 4 clientes por página.
-    num_pagina = request.GET.get('page') or 1  # Obtener el número de página de la solicitud, por defecto es 1
-    pagina_actual = paginator.get_page(num_pagina)
+    lista_clientes_inactivos = Cliente.objects.filter(activo=False)
+    pagina_actual = paginar(request, lista_clientes_inactivos, ('nombre', 'id'), 'clientes')
     
-    return render(request, 'clientes/clientes_inactivos.html', {'pagina_actual': pagina_actual})
\ No newline at end of file
+    return render(request, 'clientes/clientes_inactivos.html', {
+        'pagina_actual': pagina_actual,
+        **contexto_lista('clientes'),
+    })
+
+
+@presupuesto_consultas(1)
+def autocompletar_clientes(request):
+    """
+    Devuelve en JSON los clientes activos que coinciden con `q` (id, nombre,
+    apellido y email). Los resultados se guardan un rato en memoria y se
+    descartan cuando cambia algún cliente.
+    """
+    texto = ' '.join(request.GET.get('q', '').lower().split())
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_AUTOCOMPLETAR)), MAXIMO_AUTOCOMPLETAR)
+    except ValueError:
+        limite = LIMITE_AUTOCOMPLETAR
+    if limite < 1:
+        # Un slice negativo no se puede aplicar a un queryset: como si no fuera un número.
+        limite = LIMITE_AUTOCOMPLETAR
+
+    def calcular():
+        clientes = buscar_clientes(texto, Cliente.objects.filter(activo=True))
+        return list(clientes.values('id', 'nombre', 'apellido', 'email')[:limite])
+
+    resultados = cache_autocompletar.obtener((version('clientes'), texto, limite), calcular) if texto else []
+    return JsonResponse({'resultados': resultados})
+
+
+@presupuesto_consultas(1)
+def exportar_clientes(request):
+    """
+    Descarga todos los clientes en CSV (por defecto) o XLSX
+    (`?formato=xlsx`). Filtros opcionales: `?desde=` y `?hasta=` (AAAA-MM-DD)
+    y `?activo=1` o `0`.
+    """
+    try:
+        filtros = {
+            'desde': leer_fecha(request.GET.get('desde')),
+            'hasta': leer_fecha(request.GET.get('hasta')),
+            'activo': leer_booleano(request.GET.get('activo')),
+        }
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return exportar(request, 'clientes', ENCABEZADOS, filas_clientes(**filtros))
+
+
+# Sin presupuesto de consultas: la cantidad depende del tamaño del archivo
+# (unas pocas por cada lote de filas).
+def importar_clientes(request):
+    """
+    Importa clientes desde un CSV: crea los nuevos y actualiza los que ya
+    existen, usando el email como clave.
+    """
+    return vista_importar(request, importar_csv, CONVERSIONES, OBLIGATORIAS, 'Importar clientes', 'lista_clientes')
@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+
+
+class ProyectoConfig(AppConfig):
+    name = 'mi_proyecto'
+
+    def ready(self):
+        # Pragmas de SQLite en cada conexión nueva (ver mi_proyecto/basedatos.py).
+        from .basedatos import configurar_sqlite
+        connection_created.connect(configurar_sqlite, dispatch_uid='mi_proyecto.configurar_sqlite')
@@ -0,0 +1,74 @@
+"""
+Bajas de muchos productos o clientes a la vez.
+
+Uno que ya se usó (se vendió, tiene compras) no se puede borrar: se marca
+inactivo. Para decidir no se pregunta objeto por objeto: una sola consulta
+con EXISTS separa los usados del resto, los otros se borran juntos y los
+usados se desactivan con un solo UPDATE. Si mientras tanto se usa alguno de
+los que se iban a borrar (una venta confirmada justo antes del DELETE),
+Django no lo borra y ese también se desactiva.
+"""
+from django.db import transaction
+from django.db.models import Exists, OuterRef, ProtectedError
+from django.utils import timezone
+
+
+def leer_ids(request, campo='ids'):
+    """
+    Ids enteros enviados en `campo` por POST (una casilla por fila). Los que
+    no son números se ignoran.
+    """
+    return {int(valor) for valor in request.POST.getlist(campo) if valor.isdigit()}
+
+
+def eliminar_o_desactivar(queryset, relacion):
+    """
+    Borra los objetos de `queryset` que no tienen nada en `relacion` (el
+    related_name que los protege, por ejemplo 'compras') y desactiva el
+    resto. Devuelve (borrados, desactivados); los que ya estaban inactivos no
+    cuentan como desactivados.
+    """
+    modelo = queryset.model
+    with transaction.atomic():
+        usados = _usados(queryset, relacion)
+        borrar = [pk for pk, usado in usados.items() if not usado]
+        desactivar = [pk for pk, usado in usados.items() if usado]
+        borrados, protegidos = _borrar(modelo, borrar)
+        desactivar += protegidos
+        # update() no completa los campos auto_now como save().
+        cambios = {'activo': False}
+        for campo in modelo._meta.concrete_fields:
+            if getattr(campo, 'auto_now', False):
+                cambios[campo.name] = timezone.now()
+        desactivados = modelo.objects.filter(pk__in=desactivar, activo=True).update(**cambios) if desactivar else 0
+    return borrados, desactivados
+
+
+def _usados(queryset, relacion):
+    # {pk: si tiene algo en `relacion`}, en una sola consulta.
+    relacionado = queryset.model._meta.get_field(relacion)
+    usos = relacionado.related_model.objects.filter(**{relacionado.field.name: OuterRef('pk')})
+    return dict(queryset.annotate(usado=Exists(usos)).values_list('pk', 'usado'))
+
+
+def _borrar(modelo, pks):
+    # Borra los `pks` y devuelve (borrados, [pks que no se pudieron borrar]).
+    # Django busca lo que protege a cada uno antes de borrar nada: si algo se
+    # usó después de `_usados`, lanza ProtectedError sin haber cambiado la
+    # base y se reintenta sin esos.
+    protegidos = []
+    while pks:
+        try:
+            return modelo.objects.filter(pk__in=pks).delete()[1].get(modelo._meta.label, 0), protegidos
+        except ProtectedError as error:
+            usados = {
+                getattr(objeto, campo.attname)
+                for objeto in error.protected_objects
+                for campo in objeto._meta.concrete_fields
+                if campo.is_relation and campo.related_model is modelo
+            }.intersection(pks)
+            if not usados:
+                raise
+            protegidos += usados
+            pks = [pk for pk in pks if pk not in usados]
+    return 0, protegidos
@@ -0,0 +1,118 @@
+"""
+Configuración de la base de datos.
+
+Con DB_MOTOR=sqlite (por defecto) se usa SQLite con uno de dos perfiles.
+`desarrollo` es la configuración que trae Django: una conexión nueva por
+solicitud, diario de rollback y transacciones diferidas. Alcanza para una
+sola persona, pero con varias cajas a la vez los escritores se bloquean entre
+sí y aparecen errores "database is locked".
+
+`produccion` deja las conexiones abiertas entre solicitudes, usa el diario WAL
+(los lectores no bloquean al escritor ni al revés), espera hasta
+`ESPERA_MS` a que se libere un bloqueo en lugar de fallar enseguida y empieza
+las transacciones con BEGIN IMMEDIATE: así una transacción que lee y después
+escribe no puede quedar trabada con otra, que es el caso en el que SQLite
+falla sin esperar. Las pragmas de `PRAGMAS` se aplican en cada conexión nueva
+(ver `configurar_sqlite`, que conecta mi_proyecto/apps.py), porque casi
+todas valen solo para la conexión que las ejecuta.
+
+El perfil se elige con la variable de entorno DB_PERFIL (ver settings.py) y
+el comando `prueba_carga` compara los dos.
+
+Con DB_MOTOR=postgresql o mysql la base es un servidor, que admite varios
+escritores a la vez (ver `base_servidor`). El comando `copiar_datos` pasa los
+datos de un archivo SQLite al servidor.
+"""
+import copy
+
+from django.core.exceptions import ImproperlyConfigured
+
+ESPERA_MS = 20_000
+
+MOTORES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+PERFILES = {
+    'desarrollo': {
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,
+        'OPTIONS': {},
+        'PRAGMAS': {},
+    },
+    'produccion': {
+        'CONN_MAX_AGE': 600,
+        # Antes de reusar una conexión se comprueba que siga viva.
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        'PRAGMAS': {
+            'journal_mode': 'wal',
+            'busy_timeout': ESPERA_MS,
+            # Con WAL, NORMAL no arriesga la base ante un corte: como mucho se
+            # pierden las últimas transacciones, y se evita un fsync por commit.
+            'synchronous': 'normal',
+            'cache_size': -64_000,  # En KiB: 64 MB por conexión.
+            'mmap_size': 256 * 1024 * 1024,
+            'temp_store': 'memory',
+        },
+    },
+}
+
+
+def base_sqlite(perfil, nombre):
+    """
+    Configuración de DATABASES para la base SQLite `nombre` con `perfil`.
+    """
+    if perfil not in PERFILES:
+        raise ImproperlyConfigured(f'Perfil de base de datos desconocido: {perfil} ({", ".join(PERFILES)}).')
+    return {
+        'ENGINE': MOTORES['sqlite'],
+        'NAME': nombre,
+        **copy.deepcopy(PERFILES[perfil]),
+    }
+
+
+def base_servidor(motor, nombre, usuario='', clave='', host='localhost', puerto='', conexiones=10):
+    """
+    Configuración de DATABASES para una base PostgreSQL o MySQL.
+
+    En PostgreSQL las conexiones salen de un pool de psycopg 3 con hasta
+    `conexiones` por proceso (`conexiones=0` lo desactiva, por ejemplo detrás
+    de PgBouncer, y deja las conexiones persistentes). MySQL no tiene pool en
+    Django: se usan conexiones persistentes.
+    """
+    if motor not in MOTORES:
+        raise ImproperlyConfigured(f'Motor de base de datos desconocido: {motor} ({", ".join(MOTORES)}).')
+    base = {
+        'ENGINE': MOTORES[motor],
+        'NAME': nombre,
+        'USER': usuario,
+        'PASSWORD': clave,
+        'HOST': host,
+        'PORT': puerto,
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    if motor == 'postgresql' and conexiones:
+        # El pool ya reusa las conexiones: Django no admite las dos cosas juntas.
+        base['CONN_MAX_AGE'] = 0
+        base['OPTIONS']['pool'] = {'min_size': 1, 'max_size': conexiones, 'timeout': ESPERA_MS / 1000}
+    elif motor == 'mysql':
+        base['OPTIONS'] = {
+            # utf8 en MySQL son 3 bytes por carácter: no entran los emojis.
+            'charset': 'utf8mb4',
+            'init_command': "SET sql_mode = 'STRICT_TRANS_TABLES'",
+        }
+    return base
+
+
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Directo sobre la conexión de sqlite3: no cuentan como consultas de la
+    # solicitud que abrió la conexión (ver mi_proyecto/metricas.py).
+    for nombre, valor in connection.settings_dict.get('PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {nombre} = {valor}')
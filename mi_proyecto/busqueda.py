@@ -0,0 +1,169 @@
+"""
+Búsqueda de texto completo compartida por las aplicaciones.
+
+En SQLite cada modelo buscable tiene una tabla virtual FTS5 (`<tabla>_fts`)
+que se mantiene sincronizada con triggers, así también se actualiza cuando se
+escribe con `update()` o `bulk_create()`. La búsqueda es por prefijo, no
+distingue acentos ni mayúsculas y ordena por relevancia (bm25).
+En otros motores se usa `icontains` sobre los mismos campos.
+
+El orden por relevancia se calcula sobre las filas que ya pasaron los filtros
+del queryset (stock, activo...) y quien llama toma las primeras: así nunca
+quedan afuera coincidencias válidas. Limitar antes las coincidencias de la
+tabla FTS no ahorra nada, porque bm25 se calcula igual para todas.
+"""
+import json
+import re
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import connections, router
+from django.db.models import Q
+
+# Tokenizador de FTS5 que ignora los acentos ("turron" encuentra "Turrón").
+TOKENIZADOR = 'unicode61 remove_diacritics 2'
+
+# Largos de prefijo con índice propio en FTS5, para que "al", "alf"... sean rápidos.
+PREFIJOS = '2 3'
+
+
+def crear_indice(schema_editor, tabla, campos):
+    """
+    Crea la tabla FTS5 de `tabla` con sus triggers y la llena con los datos
+    existentes. Pensada para usarse desde una migración (RunPython).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    fts = f'{tabla}_fts'
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(campos)}, "
+        f"content='{tabla}', content_rowid='id', tokenize='{TOKENIZADOR}', prefix='{PREFIJOS}')"
+    )
+    for sql in _triggers(tabla, campos).values():
+        schema_editor.execute(sql)
+    schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _triggers(tabla, campos):
+    # {acción: CREATE TRIGGER} que mantienen la tabla FTS al día con `tabla`.
+    fts = f'{tabla}_fts'
+    columnas = ', '.join(campos)
+    nuevos = ', '.join(f'new.{campo}' for campo in campos)
+    viejos = ', '.join(f'old.{campo}' for campo in campos)
+    return {
+        'insert': (
+            f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {tabla} BEGIN "
+            f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevos}); END"
+        ),
+        'delete': (
+            f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {tabla} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos}); END"
+        ),
+        'update': (
+            f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {columnas} ON {tabla} BEGIN "
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) VALUES ('delete', old.id, {viejos}); "
+            f"INSERT INTO {fts}(rowid, {columnas}) VALUES (new.id, {nuevos}); END"
+        ),
+    }
+
+
+def recrear_triggers(schema_editor, tabla, campos):
+    """
+    Vuelve a crear los triggers de la tabla FTS5 de `tabla`. Para las
+    migraciones que reconstruyen la tabla en SQLite (por ejemplo al agregar
+    una columna única): al borrar la tabla vieja se borran sus triggers.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for accion, sql in _triggers(tabla, campos).items():
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {tabla}_fts_{accion}")
+        schema_editor.execute(sql)
+
+
+def eliminar_indice(schema_editor, tabla):
+    """
+    Borra la tabla FTS5 de `tabla` y sus triggers (reversa de `crear_indice`).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    fts = f'{tabla}_fts'
+    for accion in ('insert', 'delete', 'update'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS {fts}_{accion}")
+    schema_editor.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+@contextmanager
+def indice_en_bloque(modelo, campos, clave, valores):
+    """
+    Para escribir muchas filas de `modelo` de una vez (importaciones): las
+    filas con `clave` en `valores` salen del índice FTS al entrar, los
+    triggers no corren mientras tanto y al salir esas filas se vuelven a
+    indexar con un solo INSERT ... SELECT. Indexar fila por fila desde el
+    trigger es decenas de veces más lento.
+    Se usa dentro de una transacción: en SQLite los triggers se borran y se
+    vuelven a crear en ella, y nadie más escribe hasta el commit.
+    """
+    conexion = connections[router.db_for_write(modelo)]
+    if conexion.vendor != 'sqlite':
+        yield
+        return
+    tabla = modelo._meta.db_table
+    fts = f'{tabla}_fts'
+    columnas = ', '.join(campos)
+    # json_each evita el límite de parámetros de SQLite con muchos valores.
+    filtro = f"{modelo._meta.get_field(clave).column} IN (SELECT value FROM json_each(%s))"
+    valores = json.dumps(list(valores))
+    triggers = _triggers(tabla, campos)
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {fts}({fts}, rowid, {columnas}) SELECT 'delete', id, {columnas} FROM {tabla} WHERE {filtro}",
+            [valores],
+        )
+        for accion in ('insert', 'update'):
+            cursor.execute(f"DROP TRIGGER {fts}_{accion}")
+        yield
+        cursor.execute(f"INSERT INTO {fts}(rowid, {columnas}) SELECT id, {columnas} FROM {tabla} WHERE {filtro}", [valores])
+        for accion in ('insert', 'update'):
+            cursor.execute(triggers[accion])
+
+
+def palabras_de(texto):
+    return re.findall(r'\w+', texto or '')
+
+
+def buscar(queryset, texto, campos):
+    """
+    Filtra `queryset` por las palabras de `texto` en `campos` y lo ordena por
+    relevancia. Todas las palabras tienen que aparecer (como prefijo) en
+    alguno de los campos. El primer campo pesa más en el orden.
+    """
+    palabras = palabras_de(texto)
+    if not palabras:
+        return queryset.none()
+    if connections[queryset.db].vendor != 'sqlite':
+        return buscar_icontains(queryset, palabras, campos)
+
+    tabla = queryset.model._meta.db_table
+    fts = f'{tabla}_fts'
+    consulta = ' '.join(f'"{palabra}"*' for palabra in palabras)
+    pesos = ', '.join(['10.0'] + ['1.0'] * (len(campos) - 1))
+    # JOIN contra la tabla FTS: SQLite resuelve primero el MATCH con el índice
+    # y después trae solo las filas que coinciden.
+    return queryset.extra(
+        tables=[fts],
+        where=[f'{fts}.rowid = {tabla}.id', f'{fts} MATCH %s'],
+        params=[consulta],
+        select={'relevancia': f'bm25({fts}, {pesos})'},
+    ).order_by('relevancia', 'pk')
+
+
+def buscar_icontains(queryset, palabras, campos):
+    """
+    Alternativa para motores sin FTS5: cada palabra tiene que aparecer en
+    alguno de los campos. Ordena por el primer campo.
+    """
+    filtro = Q()
+    for palabra in palabras:
+        filtro &= reduce(or_, (Q(**{f'{campo}__icontains': palabra}) for campo in campos))
+    return queryset.filter(filtro).order_by(campos[0], 'pk')
@@ -0,0 +1,177 @@
+"""
+Caches de la aplicación.
+
+`CacheLRU` es una cache chica en la memoria de cada proceso. El resto usa la
+cache de Django (CACHES en settings.py): en memoria del proceso por defecto, o
+en archivos o un servidor compatible con Redis (Redis, Valkey, KeyDB...) para
+que todos los procesos compartan lo cacheado y las invalidaciones.
+
+Lo cacheado que depende de un grupo de datos (productos, clientes, ventas)
+lleva en su clave la `version` del grupo. Cuando los datos cambian, los
+receptores de post_save/post_delete de cada aplicación (y los servicios que
+escriben con update()) llaman a `invalidar`, que cambia la versión: lo
+anterior deja de usarse sin tener que buscarlo ni borrarlo, y vence solo.
+"""
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.shortcuts import render
+
+MOTORES = {
+    'memoria': ('django.core.cache.backends.locmem.LocMemCache', 'gestion'),
+    'archivo': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        str(Path(__file__).resolve().parent.parent / 'cache'),
+    ),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+
+
+def configurar_cache(motor, ubicacion=None):
+    """
+    Configuración de CACHES para `motor` ('memoria', 'archivo' o 'redis').
+    `ubicacion` es el nombre de la cache en memoria, la carpeta o la URL del
+    servidor; por defecto una por motor.
+    """
+    if motor not in MOTORES:
+        raise ImproperlyConfigured(f'Motor de cache desconocido: {motor} ({", ".join(MOTORES)}).')
+    backend, por_defecto = MOTORES[motor]
+    return {'BACKEND': backend, 'LOCATION': ubicacion or por_defecto}
+
+
+def _clave_version(grupo):
+    return f'version:{grupo}'
+
+
+def version(grupo):
+    """
+    Versión actual de los datos de `grupo`, para usar en la clave de lo que
+    depende de ellos. Si la cache la perdió arranca en un valor nuevo (la
+    hora), así nunca vuelve a una versión que ya se usó.
+    """
+    clave = _clave_version(grupo)
+    valor = cache.get(clave)
+    if valor is None:
+        cache.add(clave, time.time_ns(), None)
+        valor = cache.get(clave)
+    return valor
+
+
+def invalidar(*grupos):
+    """
+    Cambia la versión de cada grupo. Dentro de una transacción se cambia ya
+    (la misma solicitud ve sus cambios) y otra vez al confirmarla: mientras
+    tanto otra solicitud pudo volver a cachear los datos viejos con la versión
+    nueva.
+    """
+    def cambiar():
+        for grupo in grupos:
+            try:
+                cache.incr(_clave_version(grupo))
+            except ValueError:
+                # No había versión: la próxima lectura arranca en una nueva.
+                pass
+    cambiar()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(cambiar)
+
+
+def contexto_lista(*grupos):
+    """
+    Variables para cachear una lista con {% cache %}: `cache_segundos` y
+    `cache_version`, que junta las versiones de los `grupos` que muestra.
+    """
+    return {
+        'cache_segundos': settings.LISTAS_CACHE_SEGUNDOS,
+        'cache_version': '.'.join(str(version(grupo)) for grupo in grupos),
+    }
+
+
+async def aversion(grupo):
+    """
+    `version` para las vistas async.
+    """
+    clave = _clave_version(grupo)
+    valor = await cache.aget(clave)
+    if valor is None:
+        await cache.aadd(clave, time.time_ns(), None)
+        valor = await cache.aget(clave)
+    return valor
+
+
+async def arender_lista(request, plantilla, fragmento, contexto, *grupos):
+    """
+    `render` de una lista cacheada para las vistas async. La página
+    (`contexto['pagina_actual']`) se carga con el ORM asíncrono solo si la
+    plantilla no tiene ya el `fragmento` cacheado para este pedido: las
+    claves son las mismas que las de su {% cache %}.
+    """
+    contexto = {
+        **contexto,
+        'cache_segundos': settings.LISTAS_CACHE_SEGUNDOS,
+        'cache_version': '.'.join([str(await aversion(grupo)) for grupo in grupos]),
+    }
+    clave = make_template_fragment_key(fragmento, [contexto['cache_version'], request.get_full_path()])
+    if not contexto['cache_segundos'] or not await cache.ahas_key(clave):
+        await contexto['pagina_actual'].acargar()
+    # Las plantillas son síncronas: si el fragmento venció justo ahora, la
+    # página se carga al renderizar, en el hilo donde se puede consultar.
+    return await sync_to_async(render)(request, plantilla, contexto)
+
+
+class CacheLRU:
+    """
+    Cache chico en la memoria del proceso, con cantidad máxima de entradas
+    (se descarta la usada hace más tiempo) y vencimiento en segundos.
+    Cada proceso tiene la suya: sirve para respuestas que se piden muchas
+    veces seguidas, como el autocompletado de la caja.
+    """
+
+    def __init__(self, maximo=256, vencimiento=30):
+        self.maximo = maximo
+        self.vencimiento = vencimiento
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        # Cambia en cada limpiar(), para no guardar un valor calculado antes.
+        self._generacion = 0
+
+    def obtener(self, clave, calcular):
+        """
+        Devuelve el valor guardado para `clave`, o lo calcula con `calcular()`
+        y lo guarda si no está o ya venció.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            if clave in self._datos:
+                vence, valor = self._datos[clave]
+                if vence > ahora:
+                    self._datos.move_to_end(clave)
+                    return valor
+                del self._datos[clave]
+            generacion = self._generacion
+
+        valor = calcular()
+        with self._lock:
+            if generacion != self._generacion:
+                return valor
+            self._datos[clave] = (ahora + self.vencimiento, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return valor
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._generacion += 1
+
+    def __len__(self):
+        return len(self._datos)
@@ -0,0 +1,136 @@
+"""
+Exportación de listados completos a CSV o XLSX.
+
+Las filas se leen con `.iterator(chunk_size=...)` (cursor del lado del
+servidor en PostgreSQL, lectura por bloques en SQLite) y el CSV se manda con
+`StreamingHttpResponse` a medida que se genera, así la memoria no crece con
+la cantidad de filas. El XLSX usa el modo `write_only` de openpyxl, que
+también escribe fila por fila a un archivo temporal; openpyxl es opcional.
+"""
+import csv
+import tempfile
+from datetime import date, datetime, time, timedelta
+
+from django.http import FileResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.utils import timezone
+
+TAMANIO_BLOQUE = 2_000
+
+FORMATOS = ('csv', 'xlsx')
+
+VERDADEROS = ('1', 'true', 'si', 'sí')
+FALSOS = ('0', 'false', 'no')
+
+
+class FormatoNoDisponible(Exception):
+    pass
+
+
+def leer_fecha(texto):
+    """
+    'AAAA-MM-DD' -> date, vacío -> None. Lanza ValueError si no es válida.
+    """
+    if not texto:
+        return None
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f'Fecha inválida: {texto} (se espera AAAA-MM-DD).')
+
+
+def leer_booleano(texto):
+    """
+    '1'/'si'/'true' -> True, '0'/'no'/'false' -> False, vacío -> None.
+    """
+    if texto is None or texto == '':
+        return None
+    if texto.lower() in VERDADEROS:
+        return True
+    if texto.lower() in FALSOS:
+        return False
+    raise ValueError(f'Valor inválido: {texto} (se espera 1 o 0).')
+
+
+def filtro_de_fechas(campo, desde, hasta):
+    """
+    Filtros para un DateTimeField entre dos días (inclusive), en la zona horaria del sistema.
+    """
+    filtros = {}
+    if desde:
+        filtros[f'{campo}__gte'] = timezone.make_aware(datetime.combine(desde, time.min))
+    if hasta:
+        filtros[f'{campo}__lt'] = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return filtros
+
+
+def _celda(valor):
+    # Un texto que empieza con =, +, - o @ es una fórmula para Excel.
+    if isinstance(valor, str) and valor[:1] in ('=', '+', '-', '@'):
+        return "'" + valor
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).replace(tzinfo=None) if timezone.is_aware(valor) else valor
+    return '' if valor is None else valor
+
+
+class _Eco:
+    # "Archivo" que devuelve lo que se le escribe, para que csv.writer genere texto.
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(encabezados, filas):
+    escritor = csv.writer(_Eco())
+    # La marca BOM hace que Excel abra el archivo como UTF-8.
+    yield '\ufeff' + escritor.writerow(encabezados)
+    for fila in filas:
+        yield escritor.writerow([_celda(valor) for valor in fila])
+
+
+def escribir_csv(archivo, encabezados, filas):
+    for linea in lineas_csv(encabezados, filas):
+        archivo.write(linea)
+
+
+def escribir_xlsx(archivo, encabezados, filas, hoja='Datos'):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise FormatoNoDisponible('Para exportar a XLSX hay que instalar openpyxl.')
+
+    libro = Workbook(write_only=True)
+    planilla = libro.create_sheet(hoja)
+    planilla.append(list(encabezados))
+    for fila in filas:
+        planilla.append([_celda(valor) for valor in fila])
+    libro.save(archivo)
+
+
+def exportar(request, nombre, encabezados, filas):
+    """
+    Respuesta con el archivo `nombre`.csv o `nombre`.xlsx según `?formato=`.
+    """
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS:
+        return HttpResponseBadRequest(f'Formato inválido: {formato} (csv o xlsx).')
+    archivo = f'{nombre}-{timezone.localdate():%Y%m%d}.{formato}'
+
+    if formato == 'csv':
+        respuesta = StreamingHttpResponse(lineas_csv(encabezados, filas), content_type='text/csv; charset=utf-8')
+        respuesta['Content-Disposition'] = f'attachment; filename="{archivo}"'
+        return respuesta
+
+    # El formato XLSX es un ZIP y no se puede mandar antes de terminarlo: se arma
+    # en un archivo temporal (en disco a partir de 10 MB) y después se envía.
+    temporal = tempfile.SpooledTemporaryFile(max_size=10 * 1024 * 1024)
+    try:
+        escribir_xlsx(temporal, encabezados, filas, hoja=nombre)
+    except FormatoNoDisponible as error:
+        temporal.close()
+        return HttpResponseBadRequest(str(error))
+    temporal.seek(0)
+    return FileResponse(
+        temporal,
+        as_attachment=True,
+        filename=archivo,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
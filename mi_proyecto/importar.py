@@ -0,0 +1,304 @@
+"""
+Importación masiva de listados en CSV.
+
+El archivo se lee de a una fila (nunca entero en memoria), cada fila se
+valida y convierte en Python sin formularios ni modelos, y las válidas se
+guardan de a `TAMANIO_LOTE` en una transacción por lote con
+`bulk_create(update_conflicts=True)`: las que ya existen según la clave de
+cada modelo se actualizan y el resto se crea, en unas pocas consultas por
+lote. Las filas con errores no frenan la importación: se informan con su
+número de línea.
+"""
+import csv
+import io
+import operator
+from decimal import Decimal, InvalidOperation
+
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, connections, router, transaction
+from django.db.models.constants import OnConflict
+from django.shortcuts import render
+from django.utils import timezone
+
+from .exportar import leer_booleano
+
+TAMANIO_LOTE = 2_000
+
+# Errores que se muestran en la página; el comando `importar` los escribe todos.
+ERRORES_EN_PANTALLA = 100
+
+
+class ArchivoInvalido(Exception):
+    pass
+
+
+class FilaInvalida(ValueError):
+    pass
+
+
+class ResultadoImportacion:
+    """
+    Cantidad de filas leídas, creadas y actualizadas, y los errores de cada
+    fila como [(línea, mensaje)].
+    """
+
+    def __init__(self):
+        self.leidas = 0
+        self.creadas = 0
+        self.actualizadas = 0
+        self.errores = []
+
+    def __str__(self):
+        return (
+            f'{self.leidas} fila(s) leídas: {self.creadas} creada(s), '
+            f'{self.actualizadas} actualizada(s), {len(self.errores)} con errores.'
+        )
+
+
+# Conversiones de un texto de la planilla al valor del campo. Lanzan
+# ValueError con un mensaje para el usuario.
+
+def texto(maximo, obligatorio=False):
+    def convertir(valor):
+        valor = valor.strip()
+        if obligatorio and not valor:
+            raise ValueError('es obligatorio')
+        if len(valor) > maximo:
+            raise ValueError(f'tiene más de {maximo} caracteres')
+        return valor
+    return convertir
+
+
+def texto_opcional(maximo):
+    # Vacío -> None, para los campos que aceptan nulos.
+    convertir_texto = texto(maximo)
+
+    def convertir(valor):
+        return convertir_texto(valor) or None
+    return convertir
+
+
+def email(valor):
+    valor = valor.strip()
+    try:
+        validate_email(valor)
+    except ValidationError:
+        raise ValueError(f'"{valor}" no es un email válido')
+    return valor
+
+
+def decimal(digitos, decimales):
+    limite = Decimal(10) ** (digitos - decimales)
+
+    def convertir(valor):
+        try:
+            numero = Decimal(valor.strip().replace(',', '.'))
+        except InvalidOperation:
+            raise ValueError(f'"{valor}" no es un número')
+        if not numero.is_finite() or numero < 0:
+            raise ValueError(f'"{valor}" no es un importe válido')
+        if numero >= limite:
+            raise ValueError(f'debe ser menor que {limite}')
+        if numero.as_tuple().exponent < -decimales:
+            raise ValueError(f'tiene más de {decimales} decimales')
+        return numero
+    return convertir
+
+
+def entero_positivo(valor):
+    valor = valor.strip()
+    if not valor:
+        return 0
+    if not valor.isdigit():
+        raise ValueError(f'"{valor}" no es un entero positivo')
+    return int(valor)
+
+
+def booleano(valor):
+    # Vacío -> True: lo que se importa queda activo salvo que se diga lo contrario.
+    resultado = leer_booleano(valor.strip())
+    return True if resultado is None else resultado
+
+
+def leer_csv(archivo):
+    """
+    (encabezados, filas) de un CSV en UTF-8 (con o sin BOM) separado por coma o
+    punto y coma. `archivo` puede ser binario o de texto; las filas son
+    (número de línea, {columna: texto}) y se leen a medida que se recorren.
+    """
+    if isinstance(archivo.read(0), bytes):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    muestra = archivo.read(4096)
+    archivo.seek(0)
+    muestra = muestra.lstrip('\ufeff')
+    if not muestra.strip():
+        raise ArchivoInvalido('El archivo está vacío.')
+    delimitador = ';' if muestra.splitlines()[0].count(';') > muestra.splitlines()[0].count(',') else ','
+
+    lector = csv.reader(archivo, delimiter=delimitador)
+    encabezados = [columna.strip().lstrip('\ufeff').lower() for columna in next(lector)]
+
+    def filas():
+        for fila in lector:
+            if any(fila):
+                yield lector.line_num, dict(zip(encabezados, fila))
+    return encabezados, filas()
+
+
+def convertir_fila(fila, conversiones, modelo=None):
+    """
+    {campo: valor} aplicando `conversiones` a `fila`. Si se pasa `modelo`,
+    cada valor pasa además por los validadores de su campo (por ejemplo el
+    rango de un entero en este motor), así nada que no entre en la columna
+    llega a escribirse. Junta los errores de todas las columnas en un solo
+    FilaInvalida.
+    """
+    valores = {}
+    errores = []
+    for columna, convertir in conversiones.items():
+        try:
+            valores[columna] = convertir(fila.get(columna) or '')
+            if modelo is not None and valores[columna] is not None:
+                modelo._meta.get_field(columna).run_validators(valores[columna])
+        except ValueError as error:
+            errores.append(f'{columna}: {error}')
+        except ValidationError:
+            errores.append(f'{columna}: está fuera del rango que admite la base')
+    if errores:
+        raise FilaInvalida('; '.join(errores))
+    return valores
+
+
+def importar(archivo, conversiones, obligatorias, clave, guardar, lote=TAMANIO_LOTE, modelo=None):
+    """
+    Importa `archivo` (CSV) y devuelve un ResultadoImportacion.
+
+    `conversiones` son {columna: conversión} de las columnas que se pueden
+    importar (el resto se ignora), validadas también con los campos de
+    `modelo`, y `obligatorias` las que tiene que tener el archivo. Las filas
+    de un lote se deduplican por `clave` (gana la última), que es una columna
+    o una función de los valores de la fila, y se pasan a
+    `guardar(filas, columnas)`, que las escribe y devuelve (creadas,
+    actualizadas, errores): los errores son [(línea, mensaje)] de las filas
+    que decidió no escribir. Cada lote se guarda en su propia transacción.
+    """
+    encabezados, filas = leer_csv(archivo)
+    faltantes = [columna for columna in obligatorias if columna not in encabezados]
+    if faltantes:
+        raise ArchivoInvalido(f'Faltan las columnas: {", ".join(faltantes)}.')
+    # Solo se convierten (y después se escriben) las columnas que trae el archivo.
+    conversiones = {columna: convertir for columna, convertir in conversiones.items() if columna in encabezados}
+    columnas = list(conversiones)
+    if not callable(clave):
+        clave = operator.itemgetter(clave)
+
+    resultado = ResultadoImportacion()
+    pendientes = {}
+    for linea, fila in filas:
+        resultado.leidas += 1
+        try:
+            valores = convertir_fila(fila, conversiones, modelo)
+        except FilaInvalida as error:
+            resultado.errores.append((linea, str(error)))
+            continue
+        pendientes[clave(valores)] = (linea, valores)
+        if len(pendientes) >= lote:
+            _guardar_lote(guardar, pendientes, columnas, resultado)
+            pendientes = {}
+    if pendientes:
+        _guardar_lote(guardar, pendientes, columnas, resultado)
+    return resultado
+
+
+def _guardar_lote(guardar, pendientes, columnas, resultado):
+    try:
+        with transaction.atomic():
+            creadas, actualizadas, errores = guardar(list(pendientes.values()), columnas)
+    except DatabaseError as error:
+        # El lote entero se deshace: se informa en cada una de sus filas.
+        resultado.errores.extend((linea, f'no se pudo guardar: {error}') for linea, _ in pendientes.values())
+        return
+    resultado.creadas += creadas
+    resultado.actualizadas += actualizadas
+    resultado.errores.extend(errores)
+
+
+def upsert(modelo, filas, clave=None, actualizar=()):
+    """
+    Inserta `filas` ({campo: valor}, todas con los mismos campos) en la tabla de
+    `modelo`; si `clave` no es None, las que chocan con una existente por
+    `clave` actualizan los campos `actualizar`.
+
+    Es lo mismo que `bulk_create(update_conflicts=True)` con la cláusula
+    ON CONFLICT de cada motor, pero con `executemany` y sin armar un objeto ni
+    preparar cada valor por separado: con bulk_create eso se lleva la mayor
+    parte del tiempo. Los valores ya tienen que venir validados y convertidos
+    (ver las conversiones de arriba). Los campos que faltan toman su valor
+    por defecto, y los `auto_now`/`auto_now_add` la hora actual.
+    """
+    if not filas:
+        return
+    opciones = modelo._meta
+    conexion = connections[router.db_for_write(modelo)]
+    campos = [opciones.get_field(nombre) for nombre in filas[0]]
+    ahora = timezone.now()
+    por_defecto = {}
+    for campo in opciones.concrete_fields:
+        if campo.primary_key or campo in campos:
+            continue
+        valor = ahora if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False) else campo.get_default()
+        por_defecto[campo] = campo.get_db_prep_save(valor, conexion)
+    columnas = [campo.column for campo in campos + list(por_defecto)]
+
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        conexion.ops.quote_name(opciones.db_table),
+        ', '.join(map(conexion.ops.quote_name, columnas)),
+        ', '.join(['%s'] * len(columnas)),
+    )
+    if clave is not None:
+        sql += ' ' + conexion.ops.on_conflict_suffix_sql(
+            campos,
+            OnConflict.UPDATE,
+            [opciones.get_field(nombre).column for nombre in actualizar],
+            [opciones.get_field(clave).column],
+        )
+    constantes = tuple(por_defecto.values())
+    with conexion.cursor() as cursor:
+        cursor.executemany(sql, [tuple(fila.values()) + constantes for fila in filas])
+
+
+def escribir_errores(archivo, resultado):
+    """
+    Informe de errores en CSV: una fila por línea rechazada.
+    """
+    escritor = csv.writer(archivo)
+    escritor.writerow(['linea', 'error'])
+    escritor.writerows(sorted(resultado.errores))
+
+
+def vista_importar(request, importador, conversiones, obligatorias, titulo, volver):
+    """
+    Formulario para subir un CSV (GET) e importarlo con `importador` (POST),
+    mostrando cuántas filas se crearon y actualizaron y los primeros errores.
+    """
+    contexto = {
+        'titulo': titulo,
+        'volver': volver,
+        'columnas': list(conversiones),
+        'obligatorias': obligatorias,
+    }
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo')
+        if archivo is None:
+            messages.error(request, "Elegí un archivo CSV para importar.")
+        else:
+            try:
+                resultado = importador(archivo.file)
+            except (ArchivoInvalido, UnicodeDecodeError, csv.Error) as error:
+                messages.error(request, f"No se pudo leer el archivo: {error}")
+            else:
+                contexto['resultado'] = resultado
+                contexto['errores'] = sorted(resultado.errores)[:ERRORES_EN_PANTALLA]
+    return render(request, 'importar.html', contexto)
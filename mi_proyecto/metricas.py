@@ -0,0 +1,234 @@
+"""
+Métricas por solicitud: cantidad de consultas SQL, tiempo en SQL, tiempo de
+render de plantillas, tiempo total y (opcional) pico de memoria.
+
+`MetricasMiddleware` mide cada solicitud, agrega los encabezados `X-...` a la
+respuesta y acumula los totales por nombre de URL, que se pueden ver en
+`/metricas/`. Las vistas pueden declarar un máximo de consultas con
+`@presupuesto_consultas(n)`; si se pasa, se registra una advertencia o, con
+`METRICAS_PRESUPUESTO_ESTRICTO = True` (lo activa el ejecutor de los tests,
+ver mi_proyecto/pruebas.py), se lanza `PresupuestoExcedido`.
+
+El tiempo de render lo mide `PlantillasMedidas`, el motor de plantillas
+configurado en TEMPLATES: es el de Django con cada render cronometrado.
+"""
+import contextvars
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponseForbidden, JsonResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+_medicion_actual = contextvars.ContextVar('medicion_actual', default=None)
+
+
+class PresupuestoExcedido(Exception):
+    pass
+
+
+def presupuesto_consultas(maximo):
+    """
+    Declara la cantidad máxima de consultas SQL que puede hacer una vista.
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = maximo
+        return vista
+    return decorador
+
+
+class Medicion:
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_sql = 0.0
+        self.tiempo_render = 0.0
+        self.tiempo_total = 0.0
+        self.memoria_pico = None
+        self.renders_abiertos = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo_sql += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def _medir_consulta(execute, sql, params, many, context):
+    # El `execute_wrapper` de cada conexión, instalado una sola vez (ver
+    # `_instalar`). Cuenta para la medición de la solicitud en curso, que se
+    # busca en la variable de contexto: en ASGI varias solicitudes comparten la
+    # conexión del hilo del ORM y cada una ve solo la suya.
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def _instalar(conexiones):
+    for conexion in conexiones:
+        if _medir_consulta not in conexion.execute_wrappers:
+            conexion.execute_wrappers.append(_medir_consulta)
+
+
+class PlantillaMedida(Template):
+
+    def render(self, context=None, request=None):
+        medicion = _medicion_actual.get()
+        # Solo se mide la plantilla de más afuera (un render_to_string dentro de otra ya está adentro).
+        if medicion is None or medicion.renders_abiertos:
+            return super().render(context, request)
+        medicion.renders_abiertos += 1
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicion.tiempo_render += time.perf_counter() - inicio
+            medicion.renders_abiertos -= 1
+
+
+class PlantillasMedidas(DjangoTemplates):
+    """
+    El motor de plantillas de Django, con el tiempo de render de cada
+    solicitud sumado a su medición.
+    """
+
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name).template, self)
+
+
+class RegistroMetricas:
+    """
+    Totales acumulados por nombre de URL, en la memoria del proceso.
+    """
+
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def agregar(self, nombre, consultas, tiempo_sql, tiempo_render, tiempo_total):
+        with self._lock:
+            datos = self._datos.setdefault(nombre, {
+                'solicitudes': 0, 'consultas': 0, 'consultas_max': 0,
+                'tiempo_sql': 0.0, 'tiempo_render': 0.0, 'tiempo_total': 0.0, 'tiempo_total_max': 0.0,
+            })
+            datos['solicitudes'] += 1
+            datos['consultas'] += consultas
+            datos['consultas_max'] = max(datos['consultas_max'], consultas)
+            datos['tiempo_sql'] += tiempo_sql
+            datos['tiempo_render'] += tiempo_render
+            datos['tiempo_total'] += tiempo_total
+            datos['tiempo_total_max'] = max(datos['tiempo_total_max'], tiempo_total)
+
+    def resumen(self):
+        with self._lock:
+            return {
+                nombre: {
+                    'solicitudes': datos['solicitudes'],
+                    'consultas_promedio': round(datos['consultas'] / datos['solicitudes'], 2),
+                    'consultas_max': datos['consultas_max'],
+                    'sql_ms_promedio': round(datos['tiempo_sql'] * 1000 / datos['solicitudes'], 2),
+                    'render_ms_promedio': round(datos['tiempo_render'] * 1000 / datos['solicitudes'], 2),
+                    'total_ms_promedio': round(datos['tiempo_total'] * 1000 / datos['solicitudes'], 2),
+                    'total_ms_max': round(datos['tiempo_total_max'] * 1000, 2),
+                }
+                for nombre, datos in sorted(self._datos.items())
+            }
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+registro = RegistroMetricas()
+
+
+class MetricasMiddleware:
+    # Sirve a las vistas async sin pasarlas a un hilo (ver `__acall__`).
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.medir(connections.all()) as medicion:
+            response = self.get_response(request)
+        return self.informar(request, response, medicion)
+
+    async def __acall__(self, request):
+        # El ORM asíncrono consulta desde el hilo de la base, con las conexiones
+        # de ese hilo: esas son las que se miden.
+        conexiones = await sync_to_async(connections.all)()
+        with self.medir(conexiones) as medicion:
+            response = await self.get_response(request)
+        return self.informar(request, response, medicion)
+
+    @contextmanager
+    def medir(self, conexiones):
+        medicion = Medicion()
+        memoria = getattr(settings, 'METRICAS_MEMORIA', False)
+        if memoria:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memoria_inicial = tracemalloc.get_traced_memory()[0]
+
+        _instalar(conexiones)
+        token = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            _medicion_actual.reset(token)
+        medicion.tiempo_total = time.perf_counter() - inicio
+        if memoria:
+            medicion.memoria_pico = max(tracemalloc.get_traced_memory()[1] - memoria_inicial, 0)
+
+    def informar(self, request, response, medicion):
+        response['X-Consultas-SQL'] = str(medicion.consultas)
+        response['X-Tiempo-SQL-ms'] = f'{medicion.tiempo_sql * 1000:.2f}'
+        response['X-Tiempo-Render-ms'] = f'{medicion.tiempo_render * 1000:.2f}'
+        response['X-Tiempo-Total-ms'] = f'{medicion.tiempo_total * 1000:.2f}'
+        if medicion.memoria_pico is not None:
+            response['X-Memoria-Pico-KB'] = str(medicion.memoria_pico // 1024)
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        nombre = coincidencia.url_name if coincidencia and coincidencia.url_name else request.path
+        registro.agregar(
+            nombre, medicion.consultas, medicion.tiempo_sql, medicion.tiempo_render, medicion.tiempo_total,
+        )
+
+        presupuesto = getattr(coincidencia.func, 'presupuesto_consultas', None) if coincidencia else None
+        if presupuesto is not None and medicion.consultas > presupuesto:
+            mensaje = f'{nombre} hizo {medicion.consultas} consultas SQL (presupuesto: {presupuesto}).'
+            if getattr(settings, 'METRICAS_PRESUPUESTO_ESTRICTO', False):
+                raise PresupuestoExcedido(mensaje)
+            logger.warning(mensaje)
+        return response
+
+
+def ver_metricas(request):
+    """
+    Devuelve en JSON las métricas acumuladas por URL. Solo responde a pedidos
+    locales (o con DEBUG activo).
+    """
+    if not settings.DEBUG and request.META.get('REMOTE_ADDR') not in ('127.0.0.1', '::1'):
+        return HttpResponseForbidden()
+    return JsonResponse({'metricas': registro.resumen()})
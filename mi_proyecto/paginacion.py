@@ -0,0 +1,216 @@
+"""
+Paginación por cursor (keyset) para las listas.
+
+En lugar de `COUNT(*)` + `OFFSET`, cada página se pide "a partir de" los
+valores de orden del último (o primer) registro mostrado, así cualquier página
+cuesta lo mismo que la primera si hay un índice sobre las columnas de orden.
+El cursor viaja en la URL como un texto opaco (`?cursor=...`).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import cached_property
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+SIGUIENTE = 's'
+ANTERIOR = 'a'
+
+
+def codificar_cursor(direccion, valores):
+    datos = json.dumps({'d': direccion, 'v': valores}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Devuelve (dirección, valores) o None si el cursor no es válido.
+    """
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        if datos['d'] in (SIGUIENTE, ANTERIOR) and isinstance(datos['v'], list):
+            return datos['d'], datos['v']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        pass
+    return None
+
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return str(valor)
+    return valor
+
+
+class PaginaCursor:
+    """
+    Una página de resultados. Se evalúa recién cuando se usa, así un fragmento
+    de plantilla cacheado no hace ninguna consulta.
+    Ofrece `object_list`, `has_next`, `has_previous`, `cursor_siguiente`,
+    `cursor_anterior` y, solo si se pide, `total_estimado`.
+    """
+
+    def __init__(self, paginador, cursor=None):
+        self.paginador = paginador
+        decodificado = decodificar_cursor(cursor) if cursor else None
+        if decodificado:
+            # Un cursor armado a mano puede traer cualquier cosa: se vuelve a la primera página.
+            try:
+                decodificado = decodificado[0], paginador.convertir(decodificado[1])
+            except (ValidationError, ValueError, TypeError):
+                decodificado = None
+        self.direccion, self.valores = decodificado or (SIGUIENTE, None)
+
+    def _consulta(self):
+        # Una fila de más para saber si hay otra página.
+        hacia_atras = self.direccion == ANTERIOR
+        queryset = self.paginador.queryset.order_by(*self.paginador.orden_sql(invertido=hacia_atras))
+        if self.valores is not None:
+            queryset = queryset.filter(self.paginador.despues_de(self.valores, invertido=hacia_atras))
+        return queryset[:self.paginador.por_pagina + 1]
+
+    def _armar(self, filas):
+        por_pagina = self.paginador.por_pagina
+        hay_mas = len(filas) > por_pagina
+        filas = filas[:por_pagina]
+        if self.direccion == ANTERIOR:
+            filas.reverse()
+            return filas, True, hay_mas
+        return filas, hay_mas, self.valores is not None
+
+    @cached_property
+    def _resultados(self):
+        return self._armar(list(self._consulta()))
+
+    async def acargar(self):
+        """
+        Evalúa la página con el ORM asíncrono, para las vistas async (que no
+        pueden consultar la base desde la plantilla). Después se usa igual.
+        """
+        if '_resultados' not in self.__dict__:
+            self.__dict__['_resultados'] = self._armar([fila async for fila in self._consulta()])
+        return self
+
+    @property
+    def object_list(self):
+        return self._resultados[0]
+
+    @property
+    def has_next(self):
+        return self._resultados[1]
+
+    @property
+    def has_previous(self):
+        return self._resultados[2]
+
+    @property
+    def cursor_siguiente(self):
+        if self.has_next and self.object_list:
+            return codificar_cursor(SIGUIENTE, self.paginador.valores_de(self.object_list[-1]))
+        return None
+
+    @property
+    def cursor_anterior(self):
+        if self.has_previous and self.object_list:
+            return codificar_cursor(ANTERIOR, self.paginador.valores_de(self.object_list[0]))
+        return None
+
+    @cached_property
+    def total_estimado(self):
+        return self.paginador.total_estimado()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+
+class PaginadorCursor:
+    """
+    Pagina `queryset` según `orden` (por ejemplo `('-fecha', '-id')`).
+    El último campo del orden tiene que ser único (normalmente el id) para
+    que no se repitan ni se salteen filas, y ninguno puede ser nulo.
+    """
+
+    def __init__(self, queryset, orden, por_pagina):
+        self.queryset = queryset
+        self.orden = tuple(orden)
+        self.por_pagina = por_pagina
+
+    def get_page(self, cursor=None):
+        return PaginaCursor(self, cursor)
+
+    def _campos(self):
+        return [(campo.lstrip('-'), campo.startswith('-')) for campo in self.orden]
+
+    def orden_sql(self, invertido=False):
+        return [
+            f'{campo}' if descendente == invertido else f'-{campo}'
+            for campo, descendente in self._campos()
+        ]
+
+    def despues_de(self, valores, invertido=False):
+        """
+        Filtro "fila > cursor" según el orden: (a > x) OR (a = x AND b > y) ...
+        """
+        condicion = Q()
+        iguales = Q()
+        for (campo, descendente), valor in zip(self._campos(), valores):
+            operador = 'lt' if descendente != invertido else 'gt'
+            condicion |= iguales & Q(**{f'{campo}__{operador}': valor})
+            iguales &= Q(**{campo: valor})
+        return condicion
+
+    def convertir(self, valores):
+        """
+        Los valores de un cursor con el tipo de cada campo del orden. Lanza
+        ValueError (o ValidationError) si no corresponden.
+        """
+        campos = self._campos()
+        if len(valores) != len(campos):
+            raise ValueError('El cursor no tiene un valor por campo.')
+        convertidos = []
+        for (nombre, _), valor in zip(campos, valores):
+            if valor is None or isinstance(valor, (list, dict)):
+                raise ValueError(f'Valor inválido para {nombre}.')
+            campo = self.queryset.model._meta.get_field(nombre)
+            valor = campo.to_python(valor)
+            # Los rangos de los enteros según el motor, el largo de los textos...
+            campo.run_validators(valor)
+            convertidos.append(valor)
+        return convertidos
+
+    def valores_de(self, objeto):
+        return [_serializar(getattr(objeto, campo)) for campo, _ in self._campos()]
+
+    def total_estimado(self):
+        """
+        Cantidad aproximada de filas. En PostgreSQL usa la estimación del
+        planificador (no recorre la tabla); en los demás motores cuenta.
+        """
+        conexion = connections[self.queryset.db]
+        if conexion.vendor == 'postgresql':
+            plan = self.queryset.order_by().explain(format='json')
+            return json.loads(plan)[0]['Plan']['Plan Rows']
+        return self.queryset.count()
+
+
+def paginar(request, queryset, orden, lista):
+    """
+    Devuelve la página pedida en `?cursor=` para la lista `lista`, con el
+    tamaño configurado en `settings.TAMANIO_PAGINA[lista]`.
+    """
+    tamanios = getattr(settings, 'TAMANIO_PAGINA', {})
+    por_pagina = tamanios.get(lista, tamanios.get('default', 20))
+    return PaginadorCursor(queryset, orden, por_pagina).get_page(request.GET.get('cursor'))
@@ -0,0 +1,18 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class EjecutorPruebas(DiscoverRunner):
+    """
+    El ejecutor de tests de Django, con los presupuestos de consultas
+    estrictos: una vista que se pasa hace fallar el test que la pide.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._estricto = override_settings(METRICAS_PRESUPUESTO_ESTRICTO=True)
+        self._estricto.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._estricto.disable()
+        super().teardown_test_environment(**kwargs)
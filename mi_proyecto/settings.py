@@ -13,6 +13,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 
+from mi_proyecto.basedatos import base_servidor, base_sqlite
+from mi_proyecto.cache import configurar_cache
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -32,6 +35,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'mi_proyecto.apps.ProyectoConfig',  # Lo que es de todo el proyecto (pragmas de SQLite).
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -41,6 +45,7 @@ INSTALLED_APPS = [
     'clientes' ,# Aplicación para manejar clientes.
     'productos', # Aplicación para manejar productos.
     'ventas',    # Aplicación para manejar ventas.
+    'tareas',    # Cola de tareas en segundo plano.
 ]
     
 
@@ -52,13 +57,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'mi_proyecto.metricas.MetricasMiddleware',  # Consultas SQL y tiempos de cada solicitud.
 ]
 
 ROOT_URLCONF = 'mi_proyecto.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # El motor de Django, midiendo el tiempo de render (ver mi_proyecto/metricas.py).
+        'BACKEND': 'mi_proyecto.metricas.PlantillasMedidas',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],  # Directorio para las plantillas
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,12 +84,30 @@ WSGI_APPLICATION = 'mi_proyecto.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Motor (ver mi_proyecto/basedatos.py): 'sqlite' por defecto, 'postgresql' o 'mysql'.
+DB_MOTOR = os.environ.get('DB_MOTOR', 'sqlite')
+# Perfil de SQLite: 'desarrollo' por defecto o 'produccion' (WAL, conexiones
+# persistentes y pragmas de rendimiento).
+DB_PERFIL = os.environ.get('DB_PERFIL', 'desarrollo')
+
+if DB_MOTOR == 'sqlite':
+    DATABASES = {
+        'default': base_sqlite(DB_PERFIL, os.environ.get('DB_NOMBRE', BASE_DIR / 'db.sqlite3')),
     }
-}
+else:
+    DATABASES = {
+        'default': base_servidor(
+            DB_MOTOR,
+            nombre=os.environ.get('DB_NOMBRE', 'gestion'),
+            usuario=os.environ.get('DB_USUARIO', ''),
+            clave=os.environ.get('DB_CLAVE', ''),
+            host=os.environ.get('DB_HOST', 'localhost'),
+            puerto=os.environ.get('DB_PUERTO', ''),
+            conexiones=int(os.environ.get('DB_CONEXIONES', 10)),
+        ),
+    }
+if 'DB_CONN_MAX_AGE' in os.environ:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ['DB_CONN_MAX_AGE'])
 
 
 # Password validation
@@ -125,3 +150,41 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Métricas por solicitud (ver mi_proyecto/metricas.py).
+# Con el modo estricto, una vista que supera su presupuesto de consultas lanza una excepción.
+# Los tests lo activan siempre (ver TEST_RUNNER); fuera de ellos solo se registra una advertencia.
+METRICAS_PRESUPUESTO_ESTRICTO = os.environ.get('METRICAS_PRESUPUESTO_ESTRICTO') == 'True'
+TEST_RUNNER = 'mi_proyecto.pruebas.EjecutorPruebas'
+# Medir el pico de memoria usa tracemalloc, que hace más lenta cada solicitud.
+METRICAS_MEMORIA = os.environ.get('METRICAS_MEMORIA') == 'True'
+
+# Cache (ver mi_proyecto/cache.py): 'memoria' (de cada proceso, por defecto),
+# 'archivo' o 'redis'. Con varios procesos conviene una compartida, así las
+# invalidaciones llegan a todos. CACHE_UBICACION es la carpeta o la URL.
+CACHES = {
+    'default': configurar_cache(os.environ.get('CACHE_MOTOR', 'memoria'), os.environ.get('CACHE_UBICACION')),
+}
+
+# Segundos que se guardan en la cache las listas de productos, clientes y ventas.
+# Se descartan antes si los datos cambian.
+LISTAS_CACHE_SEGUNDOS = int(os.environ.get('LISTAS_CACHE_SEGUNDOS', 600))
+
+# Segundos que se guardan en la cache los paneles del tablero de inicio.
+TABLERO_CACHE_SEGUNDOS = int(os.environ.get('TABLERO_CACHE_SEGUNDOS', 300))
+
+# Horas durante las que un reenvío del formulario de venta devuelve la venta ya
+# registrada en lugar de crear otra (ver ventas/servicios.py).
+VENTAS_VIGENCIA_CLAVE_HORAS = int(os.environ.get('VENTAS_VIGENCIA_CLAVE_HORAS', 24))
+
+# Con True, las tareas (ver tareas/cola.py) se guardan en la cola y las ejecuta
+# el comando procesar_tareas; con False se ejecutan en el momento.
+TAREAS_EN_SEGUNDO_PLANO = os.environ.get('TAREAS_EN_SEGUNDO_PLANO') == 'True'
+
+# Cantidad de registros por página en cada lista (ver mi_proyecto/paginacion.py).
+TAMANIO_PAGINA = {
+    'default': 20,
+    'ventas': int(os.environ.get('TAMANIO_PAGINA_VENTAS', 10)),
+    'productos': int(os.environ.get('TAMANIO_PAGINA_PRODUCTOS', 20)),
+    'clientes': int(os.environ.get('TAMANIO_PAGINA_CLIENTES', 20)),
+}
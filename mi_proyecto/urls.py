@@ -16,11 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metricas import ver_metricas
 from .views import index
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', index, name='index'),  # Ruta para la página de inicio
+    path('metricas/', ver_metricas, name='metricas'),  # Métricas de las vistas (solo local)
     path('', include('clientes.urls')),  # Incluír las URLS de la aplicación clientes
     path('', include('productos.urls')),  # Incluír las URLS de la aplicación productos
     path('', include('ventas.urls')),  # Incluír las URLS de la aplicación ventas
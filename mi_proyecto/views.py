@@ -1,8 +1,23 @@
 from django.shortcuts import render
 
+from ventas.informes import DIAS_PERMITIDOS, DIAS_POR_DEFECTO, tablero
+from .metricas import presupuesto_consultas
+
+
+@presupuesto_consultas(8)
 def index(request):
     """
     Vista para la página de inicio.
-    Esta vista renderiza la plantilla 'index.html' y muestra un mensaje de bienvenida.
+    Muestra el tablero de ventas de los últimos `?dias=` días (7, 30, 90 o 365).
     """
-    return render(request, 'base.html')
\ No newline at end of file
+    try:
+        dias = int(request.GET.get('dias', DIAS_POR_DEFECTO))
+    except ValueError:
+        dias = DIAS_POR_DEFECTO
+    if dias not in DIAS_PERMITIDOS:
+        dias = DIAS_POR_DEFECTO
+
+    return render(request, 'index.html', {
+        'tablero': tablero(dias),
+        'dias_permitidos': DIAS_PERMITIDOS,
+    })
@@ -1,5 +1,25 @@
 from django.contrib import admin
+
+from mi_proyecto.bajas import eliminar_o_desactivar
+from .busqueda import invalidar_autocompletar
 from .models import Producto
-# Register your models here.
-# Mostrar el modelo Producto en el panel de administración.
-admin.site.register(Producto)
+
+
+# Mostrar el modelo Producto en el panel de administración. Para dar de baja
+# muchos a la vez (por ejemplo los de un proveedor que se deja) está la acción
+# que borra los que nunca se vendieron e inactiva el resto. El stock se ve pero
+# no se edita acá: cada cambio tiene que dejar su MovimientoStock (ver
+# stock.py), así que se ajusta desde la pantalla del producto.
+@admin.register(Producto)
+class ProductoAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'codigo', 'precio', 'stock', 'activo')
+    list_filter = ('activo',)
+    search_fields = ('nombre', 'codigo')
+    readonly_fields = ('stock',)
+    actions = ['eliminar_o_inactivar']
+
+    @admin.action(description="Eliminar o inactivar (si se vendieron)")
+    def eliminar_o_inactivar(self, request, queryset):
+        borrados, inactivados = eliminar_o_desactivar(queryset, 'detalles_venta')
+        invalidar_autocompletar()
+        self.message_user(request, f"{borrados} producto(s) eliminado(s) y {inactivados} inactivado(s).")
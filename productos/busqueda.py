@@ -0,0 +1,41 @@
+from mi_proyecto.busqueda import buscar
+from mi_proyecto.cache import CacheLRU, invalidar, version
+
+from .models import Producto
+
+# Campos indexados en la tabla FTS de productos (ver migración 0005).
+CAMPOS_BUSQUEDA = ('nombre', 'descripcion')
+
+
+def buscar_productos(texto, queryset=None):
+    """
+    Busca productos por nombre y descripción, ordenados por relevancia.
+    """
+    if queryset is None:
+        queryset = Producto.objects.all()
+    return buscar(queryset, texto, CAMPOS_BUSQUEDA)
+
+
+# Resultados del autocompletado de la caja. Se limpia cuando cambia un producto
+# (ver signals.py) o su stock (ver ventas.servicios); la clave lleva además la
+# versión de los productos, así un cambio hecho en otro proceso también se ve.
+cache_autocompletar = CacheLRU(maximo=512, vencimiento=60)
+# Lo mismo para el escáner: los códigos más leídos no llegan a la base.
+cache_codigos = CacheLRU(maximo=4_096, vencimiento=60)
+
+
+def producto_por_codigo(codigo):
+    """
+    {id, nombre, precio, stock} del producto activo con el código de barras o
+    SKU `codigo`, o None. Es una búsqueda por el índice único de `codigo`.
+    """
+    def calcular():
+        return Producto.objects.filter(codigo=codigo, activo=True).values('id', 'nombre', 'precio', 'stock').first()
+    return cache_codigos.obtener((version('productos'), codigo), calcular)
+
+
+def invalidar_autocompletar():
+    cache_autocompletar.limpiar()
+    cache_codigos.limpiar()
+    # Y las listas cacheadas, en todos los procesos (ver mi_proyecto/cache.py).
+    invalidar('productos')
@@ -0,0 +1,17 @@
+from mi_proyecto.exportar import TAMANIO_BLOQUE, filtro_de_fechas
+
+from .models import Producto
+
+ENCABEZADOS = ('id', 'nombre', 'codigo', 'descripcion', 'precio', 'stock', 'activo', 'creado_en', 'actualizado_en')
+
+
+def filas_productos(desde=None, hasta=None, activo=None):
+    """
+    Productos creados entre dos días (inclusive), en orden de id.
+    """
+    productos = Producto.objects.filter(**filtro_de_fechas('creado_en', desde, hasta))
+    if activo is not None:
+        productos = productos.filter(activo=activo)
+    filas = productos.order_by('id').values_list(*ENCABEZADOS)
+    for fila in filas.iterator(chunk_size=TAMANIO_BLOQUE):
+        yield fila[:6] + ('si' if fila[6] else 'no',) + fila[7:]
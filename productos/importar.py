@@ -0,0 +1,122 @@
+from django.db.models import Q
+
+from mi_proyecto.importar import (
+    TAMANIO_LOTE, booleano, decimal, entero_positivo, importar, texto, texto_opcional, upsert,
+)
+
+from mi_proyecto.busqueda import indice_en_bloque
+
+from .busqueda import CAMPOS_BUSQUEDA, invalidar_autocompletar
+from .models import MovimientoStock, Producto
+
+# Columnas que se pueden importar. Un archivo exportado (ver exportar.py) se
+# puede volver a importar: `id`, `creado_en` y `actualizado_en` se ignoran.
+CONVERSIONES = {
+    'nombre': texto(100, obligatorio=True),
+    'codigo': texto_opcional(32),
+    'descripcion': texto_opcional(10_000),
+    'precio': decimal(10, 2),
+    'stock': entero_positivo,
+    'activo': booleano,
+}
+OBLIGATORIAS = ('nombre', 'precio')
+
+
+def importar_productos(archivo, lote=TAMANIO_LOTE):
+    """
+    Crea o actualiza productos desde un CSV, usando el código como clave y,
+    en las filas sin código, el nombre. Las columnas que no están en el
+    archivo no se tocan en los productos que ya existen. Devuelve un
+    ResultadoImportacion.
+    """
+    resultado = importar(archivo, CONVERSIONES, OBLIGATORIAS, clave_producto, guardar_productos, lote, modelo=Producto)
+    # Se escribe sin pasar por el modelo y no hay señales: limpiamos el autocompletado a mano.
+    invalidar_autocompletar()
+    return resultado
+
+
+def clave_producto(valores):
+    # Dos filas con el mismo código son el mismo producto aunque cambie el nombre.
+    if valores.get('codigo'):
+        return 'codigo', valores['codigo']
+    return 'nombre', valores['nombre']
+
+
+def guardar_productos(filas, columnas):
+    # Primero se busca el producto por código, que es único. Si la fila no
+    # trae código o el código todavía no existe, se usa el producto más
+    # antiguo con ese nombre (el nombre no es único), salvo que ya tenga
+    # otro código: entonces es un producto nuevo. Así ninguna fila choca con
+    # el índice único de `codigo` ni tira abajo el lote entero.
+    codigos = [valores['codigo'] for _, valores in filas if valores.get('codigo')]
+    nombres = [valores['nombre'] for _, valores in filas]
+    por_codigo = {}
+    por_nombre = {}
+    for producto in (
+        Producto.objects.filter(Q(codigo__in=codigos) | Q(nombre__in=nombres))
+        .order_by('-id').values('id', 'nombre', 'codigo', 'descripcion', 'stock')
+    ):
+        por_nombre[producto['nombre']] = producto
+        if producto['codigo'] is not None:
+            por_codigo[producto['codigo']] = producto
+
+    nuevos = []
+    viejos = []
+    existentes = {}
+    errores = []
+    lineas = {}
+    for linea, valores in sorted(filas, key=lambda fila: fila[0]):
+        codigo = valores.get('codigo')
+        existente = por_codigo.get(codigo)
+        if existente is None:
+            existente = por_nombre.get(valores['nombre'])
+            if existente is not None and codigo and existente['codigo'] is not None:
+                existente = None
+        if existente is None:
+            nuevos.append(valores)
+        elif existente['id'] in lineas:
+            # Por ejemplo una fila con el código y otra con el nombre del mismo producto.
+            errores.append((linea, f'es el mismo producto que la línea {lineas[existente["id"]]}'))
+        else:
+            lineas[existente['id']] = linea
+            existentes[existente['id']] = existente
+            viejos.append({'id': existente['id'], **valores})
+
+    # Solo se reindexan los nuevos y los que cambian de nombre o de
+    # descripción; de los renombrados, con el nombre de antes y el de ahora.
+    a_indexar = [valores['nombre'] for valores in nuevos]
+    for valores in viejos:
+        anterior = existentes[valores['id']]
+        if valores['nombre'] != anterior['nombre'] or (
+            'descripcion' in columnas and valores['descripcion'] != anterior['descripcion']
+        ):
+            a_indexar += [anterior['nombre'], valores['nombre']]
+    with indice_en_bloque(Producto, CAMPOS_BUSQUEDA, 'nombre', a_indexar):
+        upsert(Producto, nuevos)
+        upsert(Producto, viejos, clave='id', actualizar=columnas + ['actualizado_en'])
+    if 'stock' in columnas:
+        registrar_stock_importado(nuevos, viejos, existentes)
+    return len(nuevos), len(viejos), errores
+
+
+def registrar_stock_importado(nuevos, viejos, existentes):
+    # El stock del archivo reemplaza al anterior: queda en el registro de
+    # movimientos como stock inicial (nuevos) o como ajuste (existentes).
+    movimientos = [
+        {'producto_id': valores['id'], 'tipo': MovimientoStock.AJUSTE,
+         'cantidad': valores['stock'] - existentes[valores['id']]['stock'], 'nota': 'Importación'}
+        for valores in viejos
+        if valores['stock'] != existentes[valores['id']]['stock']
+    ]
+    # Los nuevos se buscan por su código, o por el nombre los que no tienen:
+    # ningún producto anterior tenía ese nombre (si no, se habría actualizado).
+    codigos_nuevos = [valores['codigo'] for valores in nuevos if valores['stock'] and valores.get('codigo')]
+    nombres_nuevos = [valores['nombre'] for valores in nuevos if valores['stock'] and not valores.get('codigo')]
+    if codigos_nuevos or nombres_nuevos:
+        movimientos += [
+            {'producto_id': producto_id, 'tipo': MovimientoStock.INICIAL, 'cantidad': stock, 'nota': 'Importación'}
+            for producto_id, stock in Producto.objects.filter(
+                Q(codigo__in=codigos_nuevos) | Q(codigo=None, nombre__in=nombres_nuevos)
+            ).values_list('id', 'stock')
+        ]
+    upsert(MovimientoStock, movimientos)
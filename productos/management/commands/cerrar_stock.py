@@ -0,0 +1,62 @@
+from datetime import date, datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from productos.stock import cerrar_stock, compactar_movimientos, verificar_stock
+
+
+def leer_fecha(texto):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {texto} (se espera AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda el stock de cada producto que se movió desde el último cierre (para consultar rápido el "
+        "stock a una fecha) y opcionalmente compacta los movimientos viejos. Pensado para correr una vez por día."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hasta',
+            help="Día del cierre (AAAA-MM-DD): se cierra al empezar ese día. Por defecto, hoy.",
+        )
+        parser.add_argument(
+            '--conservar-dias',
+            type=int,
+            help="Borra los movimientos de más de N días que ya estén incluidos en un cierre.",
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help="Compara el stock guardado de cada producto con la suma de sus movimientos.",
+        )
+
+    def handle(self, *args, **options):
+        dia = leer_fecha(options['hasta']) if options['hasta'] else timezone.localdate()
+        if dia > timezone.localdate():
+            raise CommandError("--hasta no puede ser posterior a hoy.")
+        # Se cierra al comienzo del día: los movimientos de hoy todavía pueden estar en curso.
+        hasta = timezone.make_aware(datetime.combine(dia, time.min))
+
+        cierres = cerrar_stock(hasta)
+        self.stdout.write(f"{cierres} producto(s) cerrados al {hasta:%d/%m/%Y %H:%M}.")
+
+        if options['conservar_dias'] is not None:
+            if options['conservar_dias'] < 0:
+                raise CommandError("--conservar-dias no puede ser negativo.")
+            limite = hasta - timedelta(days=options['conservar_dias'])
+            borrados = compactar_movimientos(limite)
+            self.stdout.write(f"{borrados} movimiento(s) anteriores al {limite:%d/%m/%Y} compactados.")
+
+        if options['verificar']:
+            diferencias = verificar_stock()
+            for producto_id, guardado, calculado in diferencias:
+                self.stderr.write(f"Producto {producto_id}: stock {guardado}, según los movimientos {calculado}.")
+            if diferencias:
+                raise CommandError(f"{len(diferencias)} producto(s) con el stock distinto de sus movimientos.")
+            self.stdout.write("El stock de todos los productos coincide con sus movimientos.")
+        self.stdout.write(self.style.SUCCESS("Cierre de stock terminado."))
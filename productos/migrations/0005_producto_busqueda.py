@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from mi_proyecto import busqueda
+
+
+def crear_indice(apps, schema_editor):
+    busqueda.crear_indice(schema_editor, 'productos_producto', ['nombre', 'descripcion'])
+
+
+def eliminar_indice(apps, schema_editor):
+    busqueda.eliminar_indice(schema_editor, 'productos_producto')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0004_producto_activo'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
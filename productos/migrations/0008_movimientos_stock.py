@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def stock_inicial(apps, schema_editor):
+    # El stock que ya tenían los productos entra al registro como un movimiento inicial.
+    Producto = apps.get_model('productos', 'Producto')
+    MovimientoStock = apps.get_model('productos', 'MovimientoStock')
+    ahora = timezone.now()
+    MovimientoStock.objects.bulk_create(
+        (
+            MovimientoStock(producto_id=producto_id, fecha=ahora, tipo='inicial', cantidad=stock)
+            for producto_id, stock in Producto.objects.exclude(stock=0).values_list('id', 'stock').iterator()
+        ),
+        batch_size=1_000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0007_producto_producto_nombre_idx'),
+        ('ventas', '0008_totalventadiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CierreStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('stock', models.IntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cierres_stock', to='productos.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('producto', 'fecha'), name='cierre_producto_fecha_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tipo', models.CharField(choices=[('inicial', 'Stock inicial'), ('venta', 'Venta'), ('anulacion', 'Anulación de venta'), ('edicion_venta', 'Edición de venta'), ('reposicion', 'Reposición'), ('ajuste', 'Ajuste manual')], max_length=20)),
+                ('cantidad', models.IntegerField()),
+                ('nota', models.CharField(blank=True, max_length=200)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos', to='productos.producto')),
+                ('venta', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimientos_stock', to='ventas.venta')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(stock_inicial, migrations.RunPython.noop),
+    ]
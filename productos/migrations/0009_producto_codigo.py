@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:39
+
+from django.db import migrations, models
+
+from mi_proyecto import busqueda
+
+
+# SQLite no puede agregar una columna única sin reconstruir la tabla, y al
+# borrar la vieja se pierden los triggers que mantienen el índice de búsqueda
+# (ver 0005). Se vuelven a crear después de cambiar la tabla, en los dos sentidos.
+def recrear_triggers(apps, schema_editor):
+    busqueda.recrear_triggers(schema_editor, 'productos_producto', ['nombre', 'descripcion'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0008_movimientos_stock'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recrear_triggers),
+        migrations.AddField(
+            model_name='producto',
+            name='codigo',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True),
+        ),
+        migrations.RunPython(recrear_triggers, migrations.RunPython.noop),
+    ]
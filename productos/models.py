@@ -1,18 +1,95 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
 
 class Producto(models.Model):
     nombre = models.CharField(max_length=100)
+    # Código de barras o SKU que lee el escáner de la caja (ver `escanear_producto`).
+    codigo = models.CharField(max_length=32, unique=True, null=True, blank=True)
     descripcion = models.TextField(blank=True, null=True)
     precio = models.DecimalField(max_digits=10, decimal_places=2)
     stock = models.PositiveIntegerField(default=0)
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
     activo = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            # Listas de activos e inactivos: filtran por `activo` y paginan por (nombre, id).
+            models.Index(fields=['nombre', 'id'], condition=models.Q(activo=True), name='producto_activo_nombre_idx'),
+            models.Index(fields=['nombre', 'id'], condition=models.Q(activo=False), name='producto_inactivo_nombre_idx'),
+            # La caja solo ofrece productos con stock.
+            models.Index(fields=['nombre', 'id'], condition=models.Q(stock__gt=0), name='producto_con_stock_idx'),
+            # La importación masiva busca los productos existentes por nombre.
+            models.Index(fields=['nombre'], name='producto_nombre_idx'),
+        ]
     
     def __str__(self):
         return self.nombre
-    
-    
-    
\ No newline at end of file
+
+
+class MovimientoStock(models.Model):
+    """
+    Cada entrada o salida de stock de un producto. Solo se agregan filas:
+    `Producto.stock` es el resultado de sumarlas y se actualiza en la misma
+    transacción que las escribe (ver stock.py).
+    """
+    INICIAL = 'inicial'
+    VENTA = 'venta'
+    ANULACION = 'anulacion'
+    EDICION_VENTA = 'edicion_venta'
+    REPOSICION = 'reposicion'
+    AJUSTE = 'ajuste'
+    TIPOS = [
+        (INICIAL, 'Stock inicial'),
+        (VENTA, 'Venta'),
+        (ANULACION, 'Anulación de venta'),
+        (EDICION_VENTA, 'Edición de venta'),
+        (REPOSICION, 'Reposición'),
+        (AJUSTE, 'Ajuste manual'),
+    ]
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='movimientos')
+    fecha = models.DateTimeField(default=timezone.now)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    # Positiva si entra stock, negativa si sale.
+    cantidad = models.IntegerField()
+    venta = models.ForeignKey(
+        'ventas.Venta', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimientos_stock',
+    )
+    nota = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        indexes = [
+            # Historial de un producto y stock a una fecha.
+            models.Index(fields=['producto', 'fecha'], name='movimiento_producto_fecha_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Los movimientos de stock no se modifican: se corrigen con otro movimiento.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} {self.cantidad:+d} ({self.producto_id})"
+
+
+class CierreStock(models.Model):
+    """
+    Stock de un producto en un momento dado, calculado desde los movimientos.
+    Con los cierres, el stock a una fecha se obtiene sumando solo los
+    movimientos posteriores al último cierre (ver stock.stock_al).
+    """
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='cierres_stock')
+    fecha = models.DateTimeField()
+    stock = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'fecha'], name='cierre_producto_fecha_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} al {self.fecha:%d/%m/%Y %H:%M}: {self.stock}"
+
@@ -0,0 +1,183 @@
+"""
+Registro de movimientos de stock.
+
+Cada cambio de stock (venta, anulación, edición de una venta, reposición,
+ajuste manual) agrega una fila a `MovimientoStock`, y `Producto.stock` se
+actualiza en la misma transacción: es una foto del resultado que se lee sin
+sumar nada. Los movimientos nunca se modifican; un error se corrige con
+otro movimiento.
+
+Para saber el stock a una fecha pasada no se recorre todo el historial: un
+cierre periódico (comando `cerrar_stock`) guarda en `CierreStock` el stock de
+cada producto que se movió, y `stock_al` parte del último cierre anterior a
+la fecha y suma solo los movimientos posteriores. Los movimientos ya
+incluidos en un cierre viejo se pueden compactar (borrar) para que la tabla
+no crezca sin límite.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .busqueda import invalidar_autocompletar
+from .models import CierreStock, MovimientoStock, Producto
+
+# Fecha anterior a cualquier movimiento, para los productos sin cierres.
+ORIGEN = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class StockNegativo(ValueError):
+    pass
+
+
+def registrar_movimientos(cantidades, tipo, venta=None, nota=''):
+    """
+    Agrega un movimiento por producto ({id de producto: cantidad con signo})
+    en una sola consulta. Se llama dentro de la transacción que cambia
+    `Producto.stock`.
+    """
+    ahora = timezone.now()
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(producto_id=producto_id, fecha=ahora, tipo=tipo, cantidad=cantidad, venta=venta, nota=nota)
+        for producto_id, cantidad in cantidades.items()
+        if cantidad
+    ])
+
+
+def registrar_movimientos_por_venta(cantidades, tipo, nota=''):
+    """
+    Como `registrar_movimientos` para varias ventas a la vez ({id de venta:
+    {id de producto: cantidad con signo}}), en una sola consulta.
+    """
+    ahora = timezone.now()
+    MovimientoStock.objects.bulk_create([
+        MovimientoStock(
+            producto_id=producto_id, fecha=ahora, tipo=tipo, cantidad=cantidad, venta_id=venta_id, nota=nota,
+        )
+        for venta_id, por_producto in cantidades.items()
+        for producto_id, cantidad in por_producto.items()
+        if cantidad
+    ])
+
+
+def mover_stock(producto, cantidad, tipo, nota=''):
+    """
+    Suma `cantidad` (negativa para sacar) al stock de `producto` y registra
+    el movimiento. Lanza StockNegativo si no alcanza el stock.
+    """
+    with transaction.atomic():
+        movidos = Producto.objects.filter(pk=producto.pk, stock__gte=max(0, -cantidad)).update(
+            stock=F('stock') + cantidad,
+            actualizado_en=timezone.now(),
+        )
+        if not movidos:
+            raise StockNegativo(f'El stock de {producto.nombre} no alcanza para sacar {-cantidad}.')
+        registrar_movimientos({producto.pk: cantidad}, tipo, nota=nota)
+        transaction.on_commit(invalidar_autocompletar)
+    producto.refresh_from_db(fields=['stock', 'actualizado_en'])
+    return producto
+
+
+def fijar_stock(producto, stock, nota=''):
+    """
+    Lleva el stock de `producto` a `stock` (por ejemplo al editarlo) y
+    registra un ajuste por la diferencia.
+    """
+    if stock < 0:
+        raise StockNegativo('El stock no puede ser negativo.')
+    with transaction.atomic():
+        actual = Producto.objects.select_for_update().values_list('stock', flat=True).get(pk=producto.pk)
+        if stock != actual:
+            Producto.objects.filter(pk=producto.pk).update(stock=stock, actualizado_en=timezone.now())
+            registrar_movimientos({producto.pk: stock - actual}, MovimientoStock.AJUSTE, nota=nota)
+            transaction.on_commit(invalidar_autocompletar)
+    producto.stock = stock
+    return producto
+
+
+def _ultimo_cierre(fecha):
+    return CierreStock.objects.filter(producto=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha')
+
+
+def _con_stock_al(queryset, fecha):
+    # Anota en cada producto el stock de su último cierre hasta `fecha`
+    # (`stock_cierre`) y la suma de sus movimientos desde ese cierre hasta
+    # `fecha` (`movido`, NULL si no hubo). Los índices por (producto, fecha)
+    # hacen que cada producto cueste lo mismo sin importar el historial.
+    movido = (
+        MovimientoStock.objects.filter(
+            producto=OuterRef('pk'),
+            fecha__lte=fecha,
+            fecha__gt=Coalesce(OuterRef('fecha_cierre'), Value(ORIGEN)),
+        )
+        .order_by()
+        .values('producto')
+        .annotate(total=Sum('cantidad'))
+        .values('total')
+    )
+    return queryset.annotate(fecha_cierre=Subquery(_ultimo_cierre(fecha).values('fecha')[:1])).annotate(
+        stock_cierre=Coalesce(Subquery(_ultimo_cierre(fecha).values('stock')[:1]), 0),
+        movido=Subquery(movido),
+    )
+
+
+def stock_al(fecha, productos=None):
+    """
+    {id de producto: stock} al momento `fecha`, en una sola consulta: el
+    último cierre anterior de cada producto más sus movimientos desde ese
+    cierre hasta `fecha`. `productos` limita la consulta a esos ids.
+    Antes de la última compactación el stock solo se conoce en los cierres.
+    """
+    queryset = Producto.objects.all() if productos is None else Producto.objects.filter(pk__in=productos)
+    return {
+        producto_id: stock_cierre + (movido or 0)
+        for producto_id, stock_cierre, movido in _con_stock_al(queryset, fecha).values_list(
+            'pk', 'stock_cierre', 'movido',
+        )
+    }
+
+
+def cerrar_stock(hasta, lote=1_000):
+    """
+    Guarda un cierre al momento `hasta` para cada producto con movimientos
+    desde su último cierre. Devuelve la cantidad de cierres creados.
+    """
+    movidos = _con_stock_al(Producto.objects.all(), hasta).filter(movido__isnull=False)
+    cierres = [
+        CierreStock(producto_id=producto_id, fecha=hasta, stock=stock_cierre + movido)
+        for producto_id, stock_cierre, movido in movidos.values_list('pk', 'stock_cierre', 'movido').iterator()
+    ]
+    with transaction.atomic():
+        CierreStock.objects.bulk_create(cierres, batch_size=lote, ignore_conflicts=True)
+    return len(cierres)
+
+
+def compactar_movimientos(antes_de):
+    """
+    Borra los movimientos anteriores a `antes_de` que ya están incluidos en
+    un cierre (el último de cada producto hasta esa fecha). Los cierres se
+    conservan. Devuelve la cantidad de movimientos borrados.
+    """
+    cierre = (
+        CierreStock.objects.filter(producto=OuterRef('producto'), fecha__lte=antes_de)
+        .order_by('-fecha')
+        .values('fecha')[:1]
+    )
+    with transaction.atomic():
+        borrados, _ = MovimientoStock.objects.filter(fecha__lte=Subquery(cierre)).delete()
+    return borrados
+
+
+def verificar_stock():
+    """
+    [(id, stock guardado, stock según los movimientos)] de los productos en
+    los que no coinciden.
+    """
+    segun_movimientos = stock_al(timezone.now())
+    return [
+        (producto_id, stock, segun_movimientos.get(producto_id, 0))
+        for producto_id, stock in Producto.objects.values_list('pk', 'stock').order_by('pk')
+        if stock != segun_movimientos.get(producto_id, 0)
+    ]
@@ -1,3 +1,495 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from clientes.models import Cliente
+from mi_proyecto.busqueda import buscar_icontains
+from ventas.servicios import registrar_venta
+from .busqueda import CAMPOS_BUSQUEDA, buscar_productos, cache_autocompletar, cache_codigos
+from .importar import importar_productos
+from .models import CierreStock, MovimientoStock, Producto
+from .stock import StockNegativo, cerrar_stock, compactar_movimientos, mover_stock, stock_al, verificar_stock
 
 # Create your tests here.
+
+# La búsqueda sin acentos y por relevancia usa FTS5; con otros motores es `icontains`.
+SOLO_FTS5 = skipUnless(connection.vendor == 'sqlite', 'la búsqueda con FTS5 es propia de SQLite')
+
+
+def crear_producto(nombre='Alfajor', precio='100.00', stock=10, **campos):
+    return Producto.objects.create(nombre=nombre, precio=Decimal(precio), stock=stock, **campos)
+
+
+class BusquedaProductosTests(TestCase):
+
+    def setUp(self):
+        self.turron = crear_producto('Turrón de maní', descripcion='Barra dulce')
+        self.alfajor = crear_producto('Alfajor triple', descripcion='Chocolate y dulce de leche')
+        self.chocolate = crear_producto('Chocolate amargo', descripcion='Tableta 100g')
+
+    @SOLO_FTS5
+    def test_busca_por_prefijo_sin_acentos(self):
+        self.assertEqual(list(buscar_productos('turron')), [self.turron])
+        self.assertEqual(list(buscar_productos('ALFA')), [self.alfajor])
+
+    @SOLO_FTS5
+    def test_busca_en_la_descripcion_y_ordena_por_relevancia(self):
+        # "Chocolate" en el nombre pesa más que en la descripción.
+        self.assertEqual(list(buscar_productos('choco')), [self.chocolate, self.alfajor])
+
+    def test_todas_las_palabras_tienen_que_coincidir(self):
+        self.assertEqual(list(buscar_productos('dulce leche')), [self.alfajor])
+
+    @SOLO_FTS5
+    def test_la_sintaxis_de_fts_del_usuario_no_rompe_la_consulta(self):
+        self.assertCountEqual(buscar_productos('"dulce'), [self.turron, self.alfajor])
+        self.assertEqual(list(buscar_productos('dulce NOT')), [])
+
+    def test_respeta_el_queryset_recibido(self):
+        Producto.objects.filter(pk=self.alfajor.pk).update(stock=0)
+        self.assertEqual(list(buscar_productos('dulce', Producto.objects.filter(stock__gt=0))), [self.turron])
+
+    @SOLO_FTS5
+    def test_el_indice_sigue_los_cambios(self):
+        self.turron.nombre = 'Mantecol'
+        self.turron.save()
+        Producto.objects.filter(pk=self.chocolate.pk).update(nombre='Bombón')
+        self.alfajor.delete()
+
+        self.assertEqual(list(buscar_productos('turron')), [])
+        self.assertEqual(list(buscar_productos('mantecol')), [self.turron])
+        self.assertEqual(list(buscar_productos('bombon')), [self.chocolate])
+        self.assertEqual(list(buscar_productos('triple')), [])
+
+    @SOLO_FTS5
+    def test_ordena_despues_de_filtrar(self):
+        # Las más relevantes están agotadas: igual aparecen las que tienen stock.
+        for i in range(30):
+            crear_producto(f'Dulce {i}', stock=0)
+        dulce = crear_producto('Dulce de membrillo')
+        encontrados = list(buscar_productos('dulce', Producto.objects.filter(stock__gt=0)))
+        self.assertEqual(encontrados[0], dulce)
+        self.assertCountEqual(encontrados, [dulce, self.turron, self.alfajor])
+
+    def test_texto_sin_palabras_no_devuelve_nada(self):
+        self.assertEqual(list(buscar_productos('  ¿? ')), [])
+
+    def test_alternativa_para_otros_motores(self):
+        with mock.patch('mi_proyecto.busqueda.connections') as conexiones:
+            conexiones.__getitem__.return_value.vendor = 'postgresql'
+            self.assertEqual(list(buscar_productos('dulce')), [self.alfajor, self.turron])
+        self.assertEqual(
+            list(buscar_icontains(Producto.objects.all(), ['choco', 'leche'], CAMPOS_BUSQUEDA)),
+            [self.alfajor],
+        )
+
+
+@SOLO_FTS5
+class AutocompletarProductosTests(TestCase):
+
+    def setUp(self):
+        cache_autocompletar.limpiar()
+        self.turron = crear_producto('Turrón', precio='150.00', stock=4)
+        crear_producto('Turrón agotado', stock=0)
+        crear_producto('Turrón viejo', activo=False)
+
+    def autocompletar(self, texto, **parametros):
+        return self.client.get(reverse('autocompletar_productos'), {'q': texto, **parametros}).json()['resultados']
+
+    def test_devuelve_solo_lo_que_necesita_la_caja(self):
+        self.assertEqual(self.autocompletar('turron'), [
+            {'id': self.turron.id, 'nombre': 'Turrón', 'precio': '150.00', 'stock': 4},
+        ])
+
+    def test_limite_acotado(self):
+        for i in range(60):
+            crear_producto(f'Turrón {i}')
+        self.assertEqual(len(self.autocompletar('turron')), 10)
+        self.assertEqual(len(self.autocompletar('turron', limite=1000)), 50)
+        for limite in (-5, 0, 'x'):
+            self.assertEqual(len(self.autocompletar('turron', limite=limite)), 10)
+
+    def test_segunda_consulta_sale_del_cache(self):
+        self.autocompletar('turr')
+        with self.assertNumQueries(0):
+            self.autocompletar('  TURR ')
+
+    def test_guardar_un_producto_invalida_el_cache(self):
+        self.autocompletar('turron')
+        self.turron.stock = 9
+        self.turron.save()
+
+        self.assertEqual(self.autocompletar('turron')[0]['stock'], 9)
+
+
+class EscanearProductoTests(TestCase):
+
+    def setUp(self):
+        cache_codigos.limpiar()
+        self.turron = crear_producto('Turrón', precio='150.00', stock=4, codigo='7790001')
+        crear_producto('Turrón viejo', codigo='7790002', activo=False)
+
+    def escanear(self, codigo):
+        return self.client.get(reverse('escanear_producto'), {'codigo': codigo})
+
+    def test_devuelve_lo_que_necesita_la_caja(self):
+        respuesta = self.escanear(' 7790001 ')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json(), {'id': self.turron.id, 'nombre': 'Turrón', 'precio': '150.00', 'stock': 4})
+
+    def test_inactivo_desconocido_o_vacio_da_404(self):
+        for codigo in ('7790002', '0000', ''):
+            with self.subTest(codigo=codigo):
+                respuesta = self.escanear(codigo)
+                self.assertEqual(respuesta.status_code, 404)
+                self.assertIn('error', respuesta.json())
+
+    def test_segunda_lectura_sale_de_la_memoria(self):
+        self.escanear('7790001')
+        self.escanear('0000')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.escanear('7790001').status_code, 200)
+            self.assertEqual(self.escanear('0000').status_code, 404)
+
+    def test_guardar_un_producto_invalida_la_memoria(self):
+        self.escanear('7790001')
+        self.turron.precio = Decimal('175.00')
+        self.turron.save()
+
+        self.assertEqual(self.escanear('7790001').json()['precio'], '175.00')
+
+    def test_codigo_repetido_al_crear_y_al_editar(self):
+        respuesta = self.client.post(reverse('crear_producto'), {
+            'nombre': 'Otro turrón', 'codigo': '7790001', 'precio': '90.00', 'stock': '1',
+        })
+        self.assertContains(respuesta, 'Ya hay un producto con el código 7790001')
+        self.assertFalse(Producto.objects.filter(nombre='Otro turrón').exists())
+
+        otro = crear_producto('Chicle')
+        respuesta = self.client.post(reverse('editar_producto', args=[otro.id]), {
+            'nombre': 'Chicle', 'codigo': '7790002', 'precio': '100.00', 'stock': '10',
+        })
+        self.assertContains(respuesta, 'Ya hay un producto con el código 7790002')
+        otro.refresh_from_db()
+        self.assertIsNone(otro.codigo)
+
+    def test_precio_o_stock_invalidos_no_se_confunden_con_el_codigo(self):
+        for precio, stock, mensaje in (
+            ('90.00', '-1', 'El stock tiene que ser'),
+            ('90.00', '99999999999999999999', 'El stock tiene que ser'),
+            ('-5', '1', 'El precio tiene que ser'),
+            ('1e20', '1', 'El precio tiene que ser'),
+            ('NaN', '1', 'El precio tiene que ser'),
+        ):
+            with self.subTest(precio=precio, stock=stock):
+                respuesta = self.client.post(reverse('crear_producto'), {
+                    'nombre': 'Otro turrón', 'codigo': '', 'precio': precio, 'stock': stock,
+                })
+                self.assertContains(respuesta, mensaje)
+                self.assertNotContains(respuesta, 'Ya hay un producto con el código')
+        self.assertFalse(Producto.objects.filter(nombre='Otro turrón').exists())
+
+        respuesta = self.client.post(reverse('editar_producto', args=[self.turron.id]), {
+            'nombre': 'Turrón blando', 'codigo': '7790001', 'precio': '100.00', 'stock': '-3',
+        })
+        self.assertContains(respuesta, 'El stock tiene que ser')
+        self.turron.refresh_from_db()
+        self.assertEqual(self.turron.nombre, 'Turrón')
+
+    def test_sin_codigo_no_choca(self):
+        for nombre in ('Chicle', 'Caramelo'):
+            self.client.post(reverse('crear_producto'), {'nombre': nombre, 'codigo': ' ', 'precio': '10.00', 'stock': '1'})
+        self.assertEqual(Producto.objects.filter(codigo=None).count(), 2)
+
+
+class ExportarProductosTests(TestCase):
+
+    def test_exporta_csv_filtrando_por_activo(self):
+        crear_producto('Alfajor')
+        crear_producto('Viejo', activo=False)
+
+        respuesta = self.client.get(reverse('exportar_productos'), {'activo': '1'})
+        self.assertEqual(respuesta.status_code, 200)
+        filas = b''.join(respuesta.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(filas), 2)
+        self.assertTrue(filas[0].startswith('id,nombre,'))
+        self.assertIn('Alfajor', filas[1])
+
+
+class ImportarProductosTests(TestCase):
+
+    def importar(self, texto, **opciones):
+        return importar_productos(BytesIO(texto.encode('utf-8')), **opciones)
+
+    def test_crea_y_actualiza_por_nombre(self):
+        turron = crear_producto('Turrón', precio='100.00', stock=7, descripcion='Barra de maní')
+        resultado = self.importar(
+            'nombre,precio\n'
+            'Turrón,120.50\n'
+            'Alfajor,80\n'
+            'Chicle,5\n',
+            lote=2,
+        )
+        self.assertEqual((resultado.leidas, resultado.creadas, resultado.actualizadas), (3, 2, 1))
+        self.assertEqual(resultado.errores, [])
+
+        turron.refresh_from_db()
+        self.assertEqual(turron.precio, Decimal('120.50'))
+        # Las columnas que no trae el archivo no se tocan.
+        self.assertEqual((turron.stock, turron.descripcion), (7, 'Barra de maní'))
+        alfajor = Producto.objects.get(nombre='Alfajor')
+        self.assertEqual((alfajor.precio, alfajor.stock, alfajor.activo), (Decimal('80'), 0, True))
+
+    def test_informa_los_errores_de_cada_fila_y_sigue(self):
+        resultado = self.importar(
+            'nombre;precio;stock\n'
+            ';10;1\n'
+            'Alfajor;diez;-3\n'
+            'Chicle;1.999;2\n'
+            'Turrón;15,50;4\n'
+        )
+        self.assertEqual(resultado.creadas, 1)
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 3, 4])
+        self.assertIn('nombre: es obligatorio', resultado.errores[0][1])
+        self.assertIn('precio:', resultado.errores[1][1])
+        self.assertIn('stock:', resultado.errores[1][1])
+        self.assertIn('decimales', resultado.errores[2][1])
+        self.assertEqual(Producto.objects.get().precio, Decimal('15.50'))
+
+    def test_actualiza_por_codigo_y_si_no_tiene_por_nombre(self):
+        alfajor = crear_producto('Alfajor', stock=5, codigo='7790001')
+        chicle = crear_producto('Chicle', stock=2)
+        resultado = self.importar(
+            'nombre,codigo,precio,stock\n'
+            'Alfajor triple,7790001,12,8\n'
+            'Chicle,7790002,5,2\n'
+            'Caramelo,7790003,1,30\n'
+            'Caramelo de miel,7790003,2,40\n'
+            'Turrón,,9,4\n'
+        )
+        self.assertEqual((resultado.creadas, resultado.actualizadas, resultado.errores), (2, 2, []))
+        alfajor.refresh_from_db()
+        chicle.refresh_from_db()
+        self.assertEqual((alfajor.nombre, alfajor.precio, alfajor.stock), ('Alfajor triple', Decimal('12'), 8))
+        # Sin código todavía: lo toma por el nombre.
+        self.assertEqual(chicle.codigo, '7790002')
+        # El mismo código dos veces en el archivo: gana la última fila.
+        self.assertEqual(Producto.objects.get(codigo='7790003').nombre, 'Caramelo de miel')
+        self.assertCountEqual(MovimientoStock.objects.values_list('producto__nombre', 'tipo', 'cantidad'), [
+            ('Alfajor triple', MovimientoStock.AJUSTE, 3),
+            ('Caramelo de miel', MovimientoStock.INICIAL, 40),
+            ('Turrón', MovimientoStock.INICIAL, 4),
+        ])
+
+        # Vuelto a importar con el código, actualiza en vez de crear otro.
+        resultado = self.importar('nombre,codigo,precio\nAlfajor,7790001,13\n')
+        self.assertEqual((resultado.creadas, resultado.actualizadas), (0, 1))
+        alfajor.refresh_from_db()
+        self.assertEqual((alfajor.nombre, alfajor.precio), ('Alfajor', Decimal('13')))
+
+    def test_el_mismo_producto_por_codigo_y_por_nombre_es_error_de_la_fila(self):
+        crear_producto('Alfajor', codigo='7790001')
+        crear_producto('Turrón', codigo='7790002')
+        resultado = self.importar(
+            'nombre,codigo,precio\n'
+            'Alfajor triple,7790001,12\n'
+            'Alfajor,,10\n'
+            'Turrón,7790009,9\n'
+        )
+        self.assertEqual(resultado.errores, [(3, 'es el mismo producto que la línea 2')])
+        # Otro código con el nombre de un producto que ya tiene código: es otro producto.
+        self.assertEqual((resultado.creadas, resultado.actualizadas), (1, 1))
+        self.assertEqual(
+            list(Producto.objects.order_by('codigo').values_list('nombre', 'codigo')),
+            [('Alfajor triple', '7790001'), ('Turrón', '7790002'), ('Turrón', '7790009')],
+        )
+
+    def test_un_stock_que_no_entra_en_la_base_es_error_de_la_fila(self):
+        resultado = self.importar(
+            'nombre,precio,stock\n'
+            'Alfajor,10,99999999999999999999\n'
+            'Chicle,5,3\n',
+            lote=1,
+        )
+        self.assertEqual(resultado.errores, [(2, 'stock: está fuera del rango que admite la base')])
+        self.assertEqual(list(Producto.objects.values_list('nombre', 'stock')), [('Chicle', 3)])
+
+    @SOLO_FTS5
+    def test_el_indice_de_busqueda_sigue_la_importacion(self):
+        turron = crear_producto('Turrón', descripcion='Barra de maní')
+        self.importar('nombre,descripcion,precio\nTurrón,Barra de almendras,10\nMantecol,Postre de maní,20\n')
+
+        self.assertEqual(list(buscar_productos('almendras')), [turron])
+        self.assertEqual([p.nombre for p in buscar_productos('mani')], ['Mantecol'])
+        # Y los triggers vuelven a funcionar después de la importación.
+        crear_producto('Bon o Bon')
+        self.assertEqual(len(buscar_productos('bon')), 1)
+
+    @SOLO_FTS5
+    def test_renombrar_por_codigo_reindexa_el_nombre(self):
+        alfajor = crear_producto('Alfajor', codigo='7790001')
+        self.importar('nombre,codigo,precio\nTurrón blando,7790001,10\n')
+
+        self.assertEqual(list(buscar_productos('blando')), [alfajor])
+        self.assertEqual(list(buscar_productos('alfajor')), [])
+
+    def test_vista_sube_el_archivo_y_muestra_el_resultado(self):
+        self.assertEqual(self.client.get(reverse('importar_productos')).status_code, 200)
+        archivo = SimpleUploadedFile('lista.csv', '\ufeffnombre,precio\nAlfajor,80\nChicle,x\n'.encode('utf-8'))
+        respuesta = self.client.post(reverse('importar_productos'), {'archivo': archivo})
+        self.assertContains(respuesta, '1 creada(s)')
+        self.assertContains(respuesta, 'precio: &quot;x&quot; no es un número')
+
+        archivo = SimpleUploadedFile('lista.csv', b'nombre,stock\nAlfajor,3\n')
+        respuesta = self.client.post(reverse('importar_productos'), {'archivo': archivo}, follow=True)
+        self.assertContains(respuesta, 'Faltan las columnas: precio')
+
+
+class MovimientosStockTests(TestCase):
+
+    def setUp(self):
+        self.turron = crear_producto('Turrón', stock=0)
+        self.ahora = timezone.now()
+
+    def mover(self, dias_atras, cantidad, producto=None):
+        MovimientoStock.objects.create(
+            producto=producto or self.turron,
+            fecha=self.ahora - timedelta(days=dias_atras),
+            tipo=MovimientoStock.AJUSTE,
+            cantidad=cantidad,
+        )
+
+    def test_crear_editar_y_reponer_quedan_registrados(self):
+        self.client.post(reverse('crear_producto'), {'nombre': 'Alfajor', 'precio': '10', 'stock': '8'})
+        alfajor = Producto.objects.get(nombre='Alfajor')
+        self.client.post(reverse('editar_producto', args=[alfajor.id]), {
+            'nombre': 'Alfajor triple', 'descripcion': '', 'precio': '12', 'stock': '5',
+        })
+        self.client.post(reverse('stock_producto', args=[alfajor.id]), {'tipo': 'reposicion', 'cantidad': '20'})
+
+        alfajor.refresh_from_db()
+        self.assertEqual((alfajor.nombre, alfajor.stock), ('Alfajor triple', 25))
+        self.assertEqual(
+            list(alfajor.movimientos.order_by('id').values_list('tipo', 'cantidad')),
+            [('inicial', 8), ('ajuste', -3), ('reposicion', 20)],
+        )
+        self.assertEqual(verificar_stock(), [])
+
+    def test_un_ajuste_no_puede_dejar_stock_negativo(self):
+        mover_stock(self.turron, 3, MovimientoStock.REPOSICION)
+        with self.assertRaises(StockNegativo):
+            mover_stock(self.turron, -4, MovimientoStock.AJUSTE)
+        respuesta = self.client.post(reverse('stock_producto', args=[self.turron.id]), {'tipo': 'ajuste', 'cantidad': '-4'})
+        self.assertContains(respuesta, 'no alcanza')
+        self.assertEqual(self.turron.movimientos.count(), 1)
+        self.assertEqual(Producto.objects.get(pk=self.turron.pk).stock, 3)
+
+    def test_los_movimientos_no_se_modifican(self):
+        mover_stock(self.turron, 3, MovimientoStock.REPOSICION)
+        movimiento = self.turron.movimientos.get()
+        movimiento.cantidad = 30
+        with self.assertRaises(ValueError):
+            movimiento.save()
+
+    def test_stock_a_una_fecha_con_cierres_y_compactacion(self):
+        alfajor = crear_producto('Alfajor', stock=0)
+        self.mover(30, 10)
+        self.mover(20, -4)
+        self.mover(10, 5)
+        self.mover(1, -2)
+        self.mover(25, 7, alfajor)
+
+        antes = {dias: stock_al(self.ahora - timedelta(days=dias)) for dias in (40, 25, 15, 5, 0)}
+        self.assertEqual(antes[40][self.turron.id], 0)
+        self.assertEqual(antes[25], {self.turron.id: 10, alfajor.id: 7})
+        self.assertEqual(antes[15][self.turron.id], 6)
+        self.assertEqual(antes[0][self.turron.id], 9)
+
+        # El cierre no cambia ningún resultado y solo incluye a los productos que se movieron.
+        self.assertEqual(cerrar_stock(self.ahora - timedelta(days=15)), 2)
+        self.assertEqual(cerrar_stock(self.ahora - timedelta(days=12)), 0)
+        for dias, esperado in antes.items():
+            self.assertEqual(stock_al(self.ahora - timedelta(days=dias)), esperado)
+
+        # Compactar borra lo que ya está en el cierre; después de él todo sigue igual.
+        self.assertEqual(compactar_movimientos(self.ahora - timedelta(days=14)), 3)
+        self.assertEqual(MovimientoStock.objects.count(), 2)
+        self.assertEqual(stock_al(self.ahora - timedelta(days=5)), antes[5])
+        self.assertEqual(stock_al(self.ahora), antes[0])
+
+        with self.assertNumQueries(1):
+            stock_al(self.ahora, [self.turron.id])
+
+    def test_comando_cierra_y_verifica(self):
+        self.mover(2, 3)
+        Producto.objects.filter(pk=self.turron.pk).update(stock=3)
+        salida = StringIO()
+        call_command('cerrar_stock', conservar_dias=0, verificar=True, stdout=salida)
+        self.assertIn('1 producto(s) cerrados', salida.getvalue())
+        self.assertIn('1 movimiento(s)', salida.getvalue())
+        self.assertEqual(CierreStock.objects.get().stock, 3)
+
+        Producto.objects.filter(pk=self.turron.pk).update(stock=99)
+        with self.assertRaises(CommandError):
+            call_command('cerrar_stock', verificar=True, stdout=StringIO(), stderr=StringIO())
+        manana = (timezone.localdate() + timedelta(days=1)).isoformat()
+        with self.assertRaises(CommandError):
+            call_command('cerrar_stock', hasta=manana, stdout=StringIO())
+
+    def test_la_importacion_registra_el_stock(self):
+        mover_stock(self.turron, 3, MovimientoStock.REPOSICION)
+        importar_productos(BytesIO('nombre,precio,stock\nTurrón,10,5\nAlfajor,8,2\nChicle,1,0\n'.encode('utf-8')))
+
+        self.assertEqual(
+            list(MovimientoStock.objects.order_by('id').values_list('producto__nombre', 'tipo', 'cantidad')),
+            [('Turrón', 'reposicion', 3), ('Turrón', 'ajuste', 2), ('Alfajor', 'inicial', 2)],
+        )
+        self.assertEqual(verificar_stock(), [])
+
+
+    def test_el_admin_no_cambia_el_stock_por_fuera_de_los_movimientos(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ejemplo.com', 'clave'))
+        self.client.post(reverse('admin:productos_producto_change', args=[self.turron.id]), {
+            'nombre': 'Turrón blando', 'codigo': '', 'descripcion': '', 'precio': '100', 'stock': '50', 'activo': 'on',
+        })
+        self.turron.refresh_from_db()
+        self.assertEqual((self.turron.nombre, self.turron.stock), ('Turrón blando', 0))
+        self.assertEqual(verificar_stock(), [])
+
+
+class BajaMasivaProductosTests(TestCase):
+
+    def setUp(self):
+        self.alfajor = crear_producto('Alfajor')
+        self.chicle = crear_producto('Chicle')
+        self.caramelo = crear_producto('Caramelo', activo=False)
+        crear_producto('Turrón')
+        cliente = Cliente.objects.create(nombre='Juan', apellido='Pérez', email='juan@ejemplo.com')
+        registrar_venta(cliente, {self.alfajor.id: 1, self.caramelo.id: 1})
+
+    def estado(self):
+        return dict(Producto.objects.values_list('nombre', 'activo'))
+
+    def test_borra_los_que_no_se_vendieron_e_inactiva_el_resto(self):
+        ids = [self.alfajor.id, self.chicle.id, self.caramelo.id]
+        respuesta = self.client.post(reverse('eliminar_productos'), {'ids': ids}, follow=True)
+        self.assertContains(respuesta, '1 producto(s) eliminado(s) y 1 inactivado(s)')
+        self.assertEqual(self.estado(), {'Alfajor': False, 'Caramelo': False, 'Turrón': True})
+        self.assertEqual(self.client.get(reverse('eliminar_productos')).status_code, 405)
+
+    def test_accion_del_admin(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ejemplo.com', 'clave'))
+        self.client.post(reverse('admin:productos_producto_changelist'), {
+            'action': 'eliminar_o_inactivar',
+            '_selected_action': [self.alfajor.id, self.chicle.id],
+        })
+        self.assertEqual(self.estado(), {'Alfajor': False, 'Caramelo': False, 'Turrón': True})
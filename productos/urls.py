@@ -6,5 +6,11 @@ urlpatterns = [
     path('productos/crear/', views.crear_producto, name='crear_producto'),
     path('productos/editar/<int:producto_id>/', views.editar_producto, name='editar_producto'),
     path('productos/eliminar/<int:producto_id>/', views.eliminar_producto, name='eliminar_producto'),
+    path('productos/eliminar/', views.eliminar_productos, name='eliminar_productos'),
+    path('productos/stock/<int:producto_id>/', views.stock_producto, name='stock_producto'),
     path('productos/inactivos/', views.productos_inactivos, name='productos_inactivos'),
+    path('productos/escanear/', views.escanear_producto, name='escanear_producto'),
+    path('productos/autocompletar/', views.autocompletar_productos, name='autocompletar_productos'),
+    path('productos/exportar/', views.exportar_productos, name='exportar_productos'),
+    path('productos/importar/', views.importar_productos, name='importar_productos'),
 ]
\ No newline at end of file
@@ -1,23 +1,42 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Producto
-from django.core.paginator import Paginator
+from django.http import HttpResponseBadRequest, JsonResponse
+from .busqueda import buscar_productos, cache_autocompletar, invalidar_autocompletar, producto_por_codigo
+from .exportar import ENCABEZADOS, filas_productos
+from .importar import CONVERSIONES, OBLIGATORIAS, importar_productos as importar_csv
+from .models import MovimientoStock, Producto
+from .stock import StockNegativo, fijar_stock, mover_stock, registrar_movimientos
+from mi_proyecto.bajas import eliminar_o_desactivar, leer_ids
+from mi_proyecto.cache import arender_lista, contexto_lista, version
+from mi_proyecto.exportar import exportar, leer_booleano, leer_fecha
+from mi_proyecto.importar import vista_importar
+from mi_proyecto.metricas import presupuesto_consultas
+from mi_proyecto.paginacion import paginar
 from django.contrib import messages
 
+# Cantidad de resultados del autocompletado, por defecto y como máximo.
+LIMITE_AUTOCOMPLETAR = 10
+MAXIMO_AUTOCOMPLETAR = 50
+
 # Create your views here.
 # Funcion que muestra la lista de los productos.
-def lista_productos(request):
+@presupuesto_consultas(1)
+async def lista_productos(request):
     """
     Muestra la lista de todos los productos disponibles.
     
     """
-    lista_productos = Producto.objects.filter(activo=True).order_by('nombre')
-    paginator = Paginator(lista_productos, 4)  # Mostrar 4 productos por página
-    num_pagina = request.GET.get('page') or 1  # Obtener el número de página de la solicitud, por defecto es 1
-    pagina_actual = paginator.get_page(num_pagina)
+    lista_productos = Producto.objects.filter(activo=True)
+    pagina_actual = paginar(request, lista_productos, ('nombre', 'id'), 'productos')
     
-    return render(request, 'productos/lista_productos.html', {'pagina_actual': pagina_actual})
+    return await arender_lista(
+        request, 'productos/lista_productos.html', 'lista_productos', {'pagina_actual': pagina_actual}, 'productos',
+    )
 
-# Funcion para crear un nuevo producto.
+# Funcion para crear un nuevo producto (si el código choca, una consulta más para saberlo).
+@presupuesto_consultas(5)
 def crear_producto(request):
     """
     Esta función permite crear un nuevo producto.
@@ -26,22 +45,38 @@ def crear_producto(request):
     if request.method == 'POST':
         nombre = request.POST.get('nombre')
         descripcion = request.POST.get('descripcion')
-        precio = request.POST.get('precio')
-        stock = request.POST.get('stock')
+        codigo = leer_codigo(request)
+        try:
+            precio, stock = leer_precio_y_stock(request)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return render(request, 'productos/crear_producto.html', {'producto': request.POST})
         
-        Producto.objects.create(
-            nombre=nombre,
-            descripcion=descripcion,
-            precio=precio,
-            stock=stock
-        )
+        try:
+            with transaction.atomic():
+                producto = Producto.objects.create(
+                    nombre=nombre,
+                    codigo=codigo,
+                    descripcion=descripcion,
+                    precio=precio,
+                    stock=stock
+                )
+                registrar_movimientos({producto.pk: producto.stock}, MovimientoStock.INICIAL)
+        except IntegrityError:
+            # Casi siempre es el índice único de `codigo`: se pregunta solo
+            # cuando falla, para no sumar una consulta a cada alta.
+            if not codigo_ocupado(codigo):
+                raise
+            messages.error(request, f"Ya hay un producto con el código {codigo}.")
+            return render(request, 'productos/crear_producto.html', {'producto': request.POST})
         messages.success(request, "✅ Producto creado correctamente.")
         return redirect('lista_productos')
         
         
     return render(request, 'productos/crear_producto.html')
         
-# Funcion para editar un producto .
+# Funcion para editar un producto (el punto de guardado del código único suma dos consultas).
+@presupuesto_consultas(9)
 def editar_producto(request, producto_id):
     """
     Permite editar un producto.
@@ -52,9 +87,22 @@ def editar_producto(request, producto_id):
     if request.method == 'POST':
         producto.nombre = request.POST.get('nombre')
         producto.descripcion = request.POST.get('descripcion')
-        producto.precio = request.POST.get('precio')
-        producto.stock = request.POST.get('stock')
-        producto.save()
+        producto.codigo = leer_codigo(request)
+        try:
+            producto.precio, stock = leer_precio_y_stock(request)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return render(request, 'productos/editar_producto.html', {'producto': producto})
+        try:
+            with transaction.atomic():
+                producto.save(update_fields=['nombre', 'codigo', 'descripcion', 'precio', 'actualizado_en'])
+        except IntegrityError:
+            if not codigo_ocupado(producto.codigo, excepto=producto):
+                raise
+            messages.error(request, f"Ya hay un producto con el código {producto.codigo}.")
+            return render(request, 'productos/editar_producto.html', {'producto': producto})
+        # El stock no se pisa: se registra un ajuste por la diferencia.
+        fijar_stock(producto, stock, nota='Edición del producto')
         
         messages.success(request, "✅ Producto editado correctamente.")
         return redirect('lista_productos')
@@ -62,6 +110,7 @@ def editar_producto(request, producto_id):
     return render(request, 'productos/editar_producto.html', {'producto': producto})
 
 # Funcion para eliminar un producto.
+@presupuesto_consultas(3)
 def eliminar_producto(request, producto_id):
     """
     Permite eliminar un producto.
@@ -88,14 +137,166 @@ def eliminar_producto(request, producto_id):
         'se_vendio': se_vendio
     })
     
+# Sin presupuesto de consultas: borrar productos suma unas pocas consultas por
+# cada lote de productos (sus movimientos y resúmenes se borran con ellos).
+@require_POST
+def eliminar_productos(request):
+    """
+    Baja de varios productos a la vez (los `ids` del formulario): se borran
+    los que nunca se vendieron y se inactivan los demás.
+    """
+    borrados, inactivados = eliminar_o_desactivar(Producto.objects.filter(pk__in=leer_ids(request)), 'detalles_venta')
+    # El UPDATE no dispara señales (ver signals.py).
+    invalidar_autocompletar()
+    messages.success(request, f"✅ {borrados} producto(s) eliminado(s) y {inactivados} inactivado(s).")
+    return redirect('lista_productos')
+
+
+@presupuesto_consultas(1)
 def productos_inactivos(request):
     """
     Muestra la lista de productos inactivos.
     
     """
-    lista_productos_inactivos = Producto.objects.filter(activo=False).order_by('nombre')
-    paginator = Paginator(lista_productos_inactivos, 4)  # Mostrar 4 productos por página
-    num_pagina = request.GET.get('page') or 1  # Obtener el número de página de la solicitud, por defecto es 1
-    pagina_actual = paginator.get_page(num_pagina)
+    lista_productos_inactivos = Producto.objects.filter(activo=False)
+    pagina_actual = paginar(request, lista_productos_inactivos, ('nombre', 'id'), 'productos')
     
-    return render(request, 'productos/productos_inactivos.html', {'pagina_actual': pagina_actual})
\ No newline at end of file
+    return render(request, 'productos/productos_inactivos.html', {
+        'pagina_actual': pagina_actual,
+        **contexto_lista('productos'),
+    })
+
+
+def leer_codigo(request):
+    # Vacío -> None: el índice único admite muchos productos sin código.
+    return request.POST.get('codigo', '').strip()[:32] or None
+
+
+def codigo_ocupado(codigo, excepto=None):
+    # Para saber si un IntegrityError fue por el código o por otra cosa.
+    if codigo is None:
+        return False
+    return Producto.objects.filter(codigo=codigo).exclude(pk=getattr(excepto, 'pk', None)).exists()
+
+
+def leer_precio_y_stock(request):
+    """
+    Devuelve el precio y el stock del formulario validados contra sus campos
+    (stock vacío es 0). Lanza ValueError con el mensaje para mostrar si
+    alguno es negativo, no es un número o no entra en la base.
+    """
+    try:
+        precio = Producto._meta.get_field('precio').clean(request.POST.get('precio', '').strip(), None)
+    except ValidationError:
+        precio = None
+    if precio is None or precio < 0:
+        raise ValueError("El precio tiene que ser un número mayor o igual a cero, con hasta 8 enteros y 2 decimales.")
+    try:
+        stock = Producto._meta.get_field('stock').clean(request.POST.get('stock', '').strip() or 0, None)
+    except ValidationError:
+        raise ValueError("El stock tiene que ser un número entero mayor o igual a cero.") from None
+    return precio, stock
+
+
+@presupuesto_consultas(1)
+def escanear_producto(request):
+    """
+    Devuelve en JSON el producto activo con el código de barras o SKU
+    `codigo` (id, nombre, precio y stock), o 404 si no hay ninguno. La caja
+    lo pide en cada lectura del escáner: los códigos más leídos salen de la
+    memoria sin consultar la base, hasta que cambia algún producto.
+    """
+    codigo = request.GET.get('codigo', '').strip()
+    producto = producto_por_codigo(codigo) if codigo else None
+    if producto is None:
+        return JsonResponse({'error': f'No hay ningún producto activo con el código {codigo}.'}, status=404)
+    return JsonResponse(producto)
+
+
+@presupuesto_consultas(1)
+def autocompletar_productos(request):
+    """
+    Devuelve en JSON los productos activos con stock que coinciden con `q`,
+    solo con los datos que necesita la caja (id, nombre, precio y stock).
+    Los resultados se guardan un rato en memoria y se descartan cuando cambia
+    algún producto.
+    """
+    texto = ' '.join(request.GET.get('q', '').lower().split())
+    try:
+        limite = min(int(request.GET.get('limite', LIMITE_AUTOCOMPLETAR)), MAXIMO_AUTOCOMPLETAR)
+    except ValueError:
+        limite = LIMITE_AUTOCOMPLETAR
+    if limite < 1:
+        # Un slice negativo no se puede aplicar a un queryset: como si no fuera un número.
+        limite = LIMITE_AUTOCOMPLETAR
+
+    def calcular():
+        productos = buscar_productos(texto, Producto.objects.filter(activo=True, stock__gt=0))
+        return list(productos.values('id', 'nombre', 'precio', 'stock')[:limite])
+
+    resultados = cache_autocompletar.obtener((version('productos'), texto, limite), calcular) if texto else []
+    return JsonResponse({'resultados': resultados})
+
+
+@presupuesto_consultas(1)
+def exportar_productos(request):
+    """
+    Descarga todos los productos en CSV (por defecto) o XLSX
+    (`?formato=xlsx`). Filtros opcionales: `?desde=` y `?hasta=` (AAAA-MM-DD)
+    y `?activo=1` o `0`.
+    """
+    try:
+        filtros = {
+            'desde': leer_fecha(request.GET.get('desde')),
+            'hasta': leer_fecha(request.GET.get('hasta')),
+            'activo': leer_booleano(request.GET.get('activo')),
+        }
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return exportar(request, 'productos', ENCABEZADOS, filas_productos(**filtros))
+
+
+# Sin presupuesto de consultas: la cantidad depende del tamaño del archivo
+# (unas pocas por cada lote de filas).
+def importar_productos(request):
+    """
+    Importa productos desde un CSV: crea los nuevos y actualiza los que ya
+    existen, usando el código (o el nombre, si no tiene) como clave.
+    """
+    return vista_importar(request, importar_csv, CONVERSIONES, OBLIGATORIAS, 'Importar productos', 'lista_productos')
+
+
+@presupuesto_consultas(6)
+def stock_producto(request, producto_id):
+    """
+    Muestra los movimientos de stock de un producto (del más nuevo al más
+    viejo) y permite registrar una reposición o un ajuste.
+    """
+    producto = get_object_or_404(Producto, id=producto_id)
+
+    if request.method == 'POST':
+        tipo = request.POST.get('tipo')
+        try:
+            cantidad = int(request.POST.get('cantidad', ''))
+        except ValueError:
+            cantidad = 0
+        if tipo not in (MovimientoStock.REPOSICION, MovimientoStock.AJUSTE) or not cantidad:
+            messages.error(request, "Indicá el tipo de movimiento y una cantidad distinta de cero.")
+        elif tipo == MovimientoStock.REPOSICION and cantidad < 0:
+            messages.error(request, "Una reposición no puede sacar stock: usá un ajuste.")
+        else:
+            try:
+                mover_stock(producto, cantidad, tipo, nota=request.POST.get('nota', '')[:200])
+            except StockNegativo as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, "✅ Movimiento registrado correctamente.")
+                return redirect('stock_producto', producto_id=producto.id)
+
+    movimientos = producto.movimientos.select_related('venta')
+    pagina_actual = paginar(request, movimientos, ('-fecha', '-id'), 'movimientos')
+    return render(request, 'productos/stock_producto.html', {
+        'producto': producto,
+        'pagina_actual': pagina_actual,
+    })
+
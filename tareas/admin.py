@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import Tarea
+
+
+# Las fallidas se ven (con su error) y se pueden volver a encolar desde acá.
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre', 'estado', 'intentos', 'disponible_en', 'creada_en')
+    list_filter = ('estado', 'nombre')
+    actions = ['reintentar']
+
+    @admin.action(description="Volver a encolar")
+    def reintentar(self, request, queryset):
+        from .cola import reintentar
+        self.message_user(request, f"{reintentar(queryset)} tarea(s) encolada(s) de nuevo.")
@@ -0,0 +1,201 @@
+"""
+Cola de tareas en la base de datos.
+
+El trabajo que no hace falta para responder una solicitud (por ejemplo
+descontar del resumen diario una venta anulada) se encola con `encolar`
+dentro de la misma transacción que lo origina: si esa transacción se
+deshace, la tarea tampoco existe. El comando `procesar_tareas` las ejecuta en
+otro proceso, de a lotes del mismo tipo, y reintenta las que fallan esperando
+cada vez más. Una tarea se marca hecha en la misma transacción que su
+trabajo, así que un corte a la mitad la deja pendiente y sin efectos.
+
+Las funciones se registran con `@tarea` en el módulo tareas.py de cada
+aplicación. Sin TAREAS_EN_SEGUNDO_PLANO (el valor por defecto, para
+desarrollo o una sola caja sin el comando corriendo) `encolar` ejecuta la
+tarea en el momento, dentro de la transacción, como si no hubiera cola.
+"""
+import logging
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+# Espera antes del primer reintento; se duplica en cada intento fallido.
+ESPERA_REINTENTO = timedelta(seconds=10)
+ESPERA_MAXIMA = timedelta(hours=1)
+# Una tarea tomada hace más que esto se da por abandonada (el trabajador se cortó).
+VENCIMIENTO = timedelta(minutes=10)
+
+_registradas = {}
+
+
+class TareaDesconocida(KeyError):
+    pass
+
+
+class TareaPerdida(Exception):
+    # La tarea se venció mientras corría y la tomó otro trabajador.
+    pass
+
+
+def tarea(nombre, intentos=5, lote=False):
+    """
+    Registra la función decorada como la tarea `nombre`, que se intenta hasta
+    `intentos` veces. Con `lote=True` recibe la lista de argumentos de varias
+    tareas pendientes y las resuelve juntas; si no, recibe los de una sola.
+    """
+    def decorador(funcion):
+        _registradas[nombre] = (funcion, intentos, lote)
+        return funcion
+    return decorador
+
+
+def _registrada(nombre):
+    try:
+        return _registradas[nombre]
+    except KeyError:
+        raise TareaDesconocida(f'No hay ninguna tarea registrada como {nombre}.')
+
+
+def encolar(nombre, **argumentos):
+    """
+    Agrega la tarea `nombre` con `argumentos` (tienen que poder guardarse en
+    JSON). Se confirma junto con la transacción en curso.
+    """
+    funcion, _, lote = _registrada(nombre)
+    if not settings.TAREAS_EN_SEGUNDO_PLANO:
+        if lote:
+            funcion([argumentos])
+        else:
+            funcion(**argumentos)
+        return None
+    return Tarea.objects.create(nombre=nombre, argumentos=argumentos)
+
+
+def encolar_varias(nombre, argumentos):
+    """
+    Como `encolar`, para una lista de `argumentos` del mismo tipo de tarea, en
+    una sola consulta. Sin TAREAS_EN_SEGUNDO_PLANO una tarea de lote se
+    ejecuta una sola vez con todos.
+    """
+    funcion, _, lote = _registrada(nombre)
+    if not settings.TAREAS_EN_SEGUNDO_PLANO:
+        if lote:
+            if argumentos:
+                funcion(argumentos)
+        else:
+            for uno in argumentos:
+                funcion(**uno)
+        return []
+    return Tarea.objects.bulk_create([Tarea(nombre=nombre, argumentos=uno) for uno in argumentos])
+
+
+def _disponibles(ahora):
+    return (
+        Q(estado=Tarea.PENDIENTE, disponible_en__lte=ahora)
+        | Q(estado=Tarea.EN_CURSO, tomada_en__lt=ahora - VENCIMIENTO)
+    )
+
+
+def tomar(lote):
+    """
+    Reserva para este trabajador hasta `lote` tareas disponibles del mismo
+    tipo que la más vieja y las devuelve.
+    """
+    ahora = timezone.now()
+    disponibles = Tarea.objects.filter(_disponibles(ahora)).order_by('disponible_en', 'id')
+    nombre = disponibles.values_list('nombre', flat=True).first()
+    if nombre is None:
+        return []
+    ids = list(disponibles.filter(nombre=nombre).values_list('id', flat=True)[:lote])
+    trabajador = uuid.uuid4().hex
+    # Dos trabajadores pueden elegir las mismas: el UPDATE condicional se las da a uno solo.
+    Tarea.objects.filter(_disponibles(ahora), pk__in=ids).update(
+        estado=Tarea.EN_CURSO, tomada_en=ahora, trabajador=trabajador, intentos=F('intentos') + 1,
+    )
+    return list(Tarea.objects.filter(trabajador=trabajador, estado=Tarea.EN_CURSO).order_by('id'))
+
+
+def procesar(lote=100):
+    """
+    Toma y ejecuta un lote de tareas. Devuelve cuántas tomó (0 si no había).
+    """
+    tareas = tomar(lote)
+    if not tareas:
+        return 0
+    try:
+        funcion, intentos, en_lote = _registrada(tareas[0].nombre)
+    except TareaDesconocida as error:
+        _fallar(tareas, str(error), intentos=0)
+        return len(tareas)
+
+    if en_lote:
+        _ejecutar(tareas, lambda: funcion([t.argumentos for t in tareas]), intentos)
+    else:
+        # Cada una por separado: si falla una, las demás siguen.
+        for t in tareas:
+            _ejecutar([t], lambda t=t: funcion(**t.argumentos), intentos)
+    return len(tareas)
+
+
+def _ejecutar(tareas, llamar, intentos):
+    try:
+        with transaction.atomic():
+            llamar()
+            hechas = Tarea.objects.filter(pk__in=[t.pk for t in tareas], trabajador=tareas[0].trabajador).update(
+                estado=Tarea.HECHA, terminada_en=timezone.now(), error='',
+            )
+            if hechas != len(tareas):
+                # Otro trabajador las va a hacer (o ya las hizo): este trabajo se deshace
+                # para no aplicarlo dos veces. Las que siguen siendo de este vuelven a
+                # estar disponibles cuando se vencen.
+                raise TareaPerdida
+    except TareaPerdida:
+        logger.warning(
+            'La tarea %s se venció mientras corría (%d en el lote) y la tomó otro trabajador: se deshizo.',
+            tareas[0].nombre, len(tareas),
+        )
+    except Exception:
+        logger.exception('Falló la tarea %s (%d en el lote).', tareas[0].nombre, len(tareas))
+        _fallar(tareas, traceback.format_exc(), intentos)
+
+
+def _fallar(tareas, error, intentos):
+    # Las que agotaron sus intentos quedan fallidas; las demás esperan para reintentar.
+    ahora = timezone.now()
+    por_intentos = defaultdict(list)
+    for t in tareas:
+        por_intentos[t.intentos].append(t.pk)
+    for hechos, ids in por_intentos.items():
+        if hechos >= intentos:
+            cambios = {'estado': Tarea.FALLIDA, 'terminada_en': ahora}
+        else:
+            espera = min(ESPERA_REINTENTO * 2 ** (hechos - 1), ESPERA_MAXIMA)
+            cambios = {'estado': Tarea.PENDIENTE, 'disponible_en': ahora + espera}
+        Tarea.objects.filter(pk__in=ids, trabajador=tareas[0].trabajador).update(error=error, **cambios)
+
+
+def reintentar(queryset):
+    """
+    Vuelve a encolar las tareas fallidas de `queryset`, con los intentos en cero.
+    """
+    return queryset.filter(estado=Tarea.FALLIDA).update(
+        estado=Tarea.PENDIENTE, intentos=0, disponible_en=timezone.now(), error='', terminada_en=None,
+    )
+
+
+def purgar(antes_de):
+    """
+    Borra las tareas hechas antes de `antes_de`. Devuelve cuántas borró.
+    """
+    borradas, _ = Tarea.objects.filter(estado=Tarea.HECHA, terminada_en__lt=antes_de).delete()
+    return borradas
@@ -0,0 +1,56 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from tareas.cola import procesar, purgar
+
+
+class Command(BaseCommand):
+    help = (
+        "Trabajador de la cola de tareas (ver tareas/cola.py): ejecuta las pendientes de a lotes y "
+        "espera las nuevas. Se pueden correr varios a la vez. Necesita TAREAS_EN_SEGUNDO_PLANO=True "
+        "en los procesos que atienden las solicitudes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=100, help="Tareas que se toman juntas (100 por defecto).")
+        parser.add_argument(
+            '--espera',
+            type=float,
+            default=1.0,
+            help="Segundos entre una búsqueda y otra cuando no hay tareas (1 por defecto).",
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help="Ejecuta las pendientes y termina, en lugar de quedarse esperando.",
+        )
+        parser.add_argument(
+            '--purgar-dias',
+            type=int,
+            metavar='DIAS',
+            help="Borra las tareas hechas hace más de DIAS días y termina.",
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote tiene que ser mayor que cero.")
+        if options['purgar_dias'] is not None:
+            borradas = purgar(timezone.now() - timedelta(days=options['purgar_dias']))
+            self.stdout.write(self.style.SUCCESS(f"{borradas} tarea(s) borrada(s)."))
+            return
+
+        total = 0
+        try:
+            while True:
+                tomadas = procesar(options['lote'])
+                total += tomadas
+                if not tomadas:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['espera'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f"{total} tarea(s) procesada(s)."))
@@ -0,0 +1,39 @@
+from django.db import models
+from django.utils import timezone
+
+
+# Una tarea de la cola (ver tareas/cola.py): el nombre de la función registrada
+# y sus argumentos en JSON.
+class Tarea(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    HECHA = 'hecha'
+    FALLIDA = 'fallida'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (HECHA, 'Hecha'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    nombre = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    # No se toma antes de esta fecha: así se espera entre un reintento y otro.
+    disponible_en = models.DateTimeField(default=timezone.now)
+    tomada_en = models.DateTimeField(null=True, blank=True)
+    # Quién la tomó, para que dos trabajadores no ejecuten la misma.
+    trabajador = models.CharField(max_length=32, blank=True)
+    error = models.TextField(blank=True)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # El trabajador busca las pendientes más viejas que ya se pueden tomar.
+            models.Index(fields=['estado', 'disponible_en'], name='tarea_estado_disponible_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nombre} #{self.id} ({self.estado})"
@@ -0,0 +1,137 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import cola
+from .cola import encolar, procesar, reintentar, tarea
+from .models import Tarea
+
+ejecutadas = []
+
+
+@tarea('pruebas.anotar')
+def anotar(valor):
+    if valor == 'falla':
+        raise ValueError('falló')
+    ejecutadas.append(valor)
+
+
+@tarea('pruebas.anotar_lote', intentos=2, lote=True)
+def anotar_lote(lote):
+    ejecutadas.append(sorted(argumentos['valor'] for argumentos in lote))
+
+
+@tarea('pruebas.vencida')
+def vencida():
+    # Mientras corre se le vence el plazo y la toma otro trabajador.
+    Tarea.objects.filter(nombre='pruebas.vencida').update(trabajador='otro')
+    Tarea.objects.create(nombre='pruebas.efecto')
+
+
+@override_settings(TAREAS_EN_SEGUNDO_PLANO=True)
+class ColaTareasTests(TestCase):
+
+    def setUp(self):
+        ejecutadas.clear()
+        # Los errores esperados no ensucian la salida de las pruebas.
+        registro = mock.patch.object(cola.logger, 'exception')
+        registro.start()
+        self.addCleanup(registro.stop)
+
+    def test_sin_segundo_plano_se_ejecuta_en_el_momento(self):
+        with override_settings(TAREAS_EN_SEGUNDO_PLANO=False):
+            self.assertIsNone(encolar('pruebas.anotar', valor='ya'))
+        self.assertEqual(ejecutadas, ['ya'])
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_la_tarea_se_deshace_con_su_transaccion(self):
+        try:
+            with transaction.atomic():
+                encolar('pruebas.anotar', valor='a')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_procesar_ejecuta_y_marca_hecha(self):
+        encolar('pruebas.anotar', valor='a')
+        encolar('pruebas.anotar', valor='b')
+
+        self.assertEqual(procesar(), 2)
+        self.assertEqual(ejecutadas, ['a', 'b'])
+        self.assertEqual(set(Tarea.objects.values_list('estado', flat=True)), {Tarea.HECHA})
+        self.assertEqual(procesar(), 0)
+
+    def test_las_de_lote_se_resuelven_juntas(self):
+        for valor in ('c', 'a', 'b'):
+            encolar('pruebas.anotar_lote', valor=valor)
+        encolar('pruebas.anotar', valor='sola')
+
+        procesar()  # Primero el tipo de la más vieja.
+        self.assertEqual(ejecutadas, [['a', 'b', 'c']])
+        procesar()
+        self.assertEqual(ejecutadas, [['a', 'b', 'c'], 'sola'])
+
+    def test_reintenta_esperando_y_despues_falla(self):
+        fallida = encolar('pruebas.anotar', valor='falla')
+        otra = encolar('pruebas.anotar', valor='bien')
+        procesar()
+
+        fallida.refresh_from_db()
+        self.assertEqual(fallida.estado, Tarea.PENDIENTE)
+        self.assertIn('ValueError', fallida.error)
+        self.assertGreater(fallida.disponible_en, timezone.now())
+        # Una que falla no frena a las demás del lote.
+        otra.refresh_from_db()
+        self.assertEqual(otra.estado, Tarea.HECHA)
+
+        for _ in range(4):
+            Tarea.objects.filter(pk=fallida.pk).update(disponible_en=timezone.now())
+            procesar()
+        fallida.refresh_from_db()
+        self.assertEqual((fallida.estado, fallida.intentos), (Tarea.FALLIDA, 5))
+
+        self.assertEqual(reintentar(Tarea.objects.all()), 1)
+        fallida.refresh_from_db()
+        self.assertEqual((fallida.estado, fallida.intentos), (Tarea.PENDIENTE, 0))
+
+    def test_retoma_las_abandonadas(self):
+        abandonada = encolar('pruebas.anotar', valor='a')
+        Tarea.objects.filter(pk=abandonada.pk).update(estado=Tarea.EN_CURSO, tomada_en=timezone.now())
+        self.assertEqual(procesar(), 0)
+
+        Tarea.objects.filter(pk=abandonada.pk).update(tomada_en=timezone.now() - timedelta(hours=1))
+        self.assertEqual(procesar(), 1)
+        self.assertEqual(ejecutadas, ['a'])
+
+    def test_si_la_tomo_otro_trabajador_se_deshace(self):
+        tomada = encolar('pruebas.vencida')
+        with self.assertLogs(cola.logger, 'WARNING'):
+            self.assertEqual(procesar(), 1)
+
+        # Su trabajo se deshizo y no quedó ni hecha ni fallida. (En la prueba el cambio
+        # de trabajador también se deshace: acá no hay otra conexión que lo confirme.)
+        self.assertFalse(Tarea.objects.filter(nombre='pruebas.efecto').exists())
+        tomada.refresh_from_db()
+        self.assertEqual(tomada.estado, Tarea.EN_CURSO)
+
+    def test_tarea_desconocida_queda_fallida(self):
+        desconocida = Tarea.objects.create(nombre='pruebas.no_existe')
+        procesar()
+        desconocida.refresh_from_db()
+        self.assertEqual(desconocida.estado, Tarea.FALLIDA)
+
+    def test_comando_una_vez_y_purgar(self):
+        encolar('pruebas.anotar', valor='a')
+        salida = StringIO()
+        call_command('procesar_tareas', '--una-vez', stdout=salida)
+        self.assertIn('1 tarea(s) procesada(s)', salida.getvalue())
+
+        Tarea.objects.update(terminada_en=timezone.now() - timedelta(days=10))
+        call_command('procesar_tareas', purgar_dias=7, stdout=StringIO())
+        self.assertFalse(Tarea.objects.exists())
@@ -1,3 +1,30 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Venta
+from .servicios import anular_ventas
+
+
+# Las ventas se cargan desde la caja; acá se pueden anular muchas juntas (por
+# ejemplo al cerrar el mes) con el stock y el resumen al día.
+@admin.register(Venta)
+class VentaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'cliente', 'fecha', 'total', 'anulada')
+    list_filter = ('anulada',)
+    list_select_related = ('cliente',)
+    date_hierarchy = 'fecha'
+    actions = ['anular']
+
+    @admin.action(description="Anular y devolver el stock")
+    def anular(self, request, queryset):
+        anuladas = anular_ventas(list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, f"{anuladas} venta(s) anulada(s).")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        # Editarla acá no movería el stock ni el resumen: se edita desde la caja.
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class VentasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ventas'
+
+    def ready(self):
+        # Registramos los receptores de señales de la aplicación.
+        from . import signals  # noqa: F401
@@ -0,0 +1,30 @@
+from mi_proyecto.exportar import TAMANIO_BLOQUE, filtro_de_fechas
+
+from .models import Venta
+
+# Una fila por detalle; las ventas sin detalles salen en una fila sin producto.
+ENCABEZADOS = (
+    'venta_id', 'fecha', 'cliente_id', 'cliente', 'email', 'anulada', 'total_venta',
+    'producto_id', 'producto', 'cantidad', 'precio_unitario', 'subtotal',
+)
+
+
+def filas_ventas(desde=None, hasta=None, anulada=None):
+    """
+    Ventas con sus detalles entre dos días (inclusive), en orden de fecha.
+    """
+    ventas = Venta.objects.filter(**filtro_de_fechas('fecha', desde, hasta))
+    if anulada is not None:
+        ventas = ventas.filter(anulada=anulada)
+    filas = ventas.order_by('fecha', 'id', 'detallesventa__id').values_list(
+        'id', 'fecha', 'cliente_id', 'cliente__nombre', 'cliente__apellido', 'cliente__email',
+        'anulada', 'total', 'detallesventa__producto_id', 'detallesventa__producto__nombre',
+        'detallesventa__cantidad', 'detallesventa__precio_unitario',
+    )
+    for (venta_id, fecha, cliente_id, nombre, apellido, email, es_anulada, total,
+         producto_id, producto, cantidad, precio) in filas.iterator(chunk_size=TAMANIO_BLOQUE):
+        subtotal = cantidad * precio if cantidad is not None else None
+        yield (
+            venta_id, fecha, cliente_id, f'{nombre} {apellido}', email, 'si' if es_anulada else 'no', total,
+            producto_id, producto, cantidad, precio, subtotal,
+        )
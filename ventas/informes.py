@@ -0,0 +1,154 @@
+"""
+Datos del tablero de la página de inicio.
+
+Todo se calcula en la base de datos con `aggregate`/`annotate` y funciones de
+ventana (LAG para comparar con el período anterior, RANK para los puestos),
+sin recorrer ventas en Python. Los ingresos, el ticket promedio y las anuladas
+salen de `TotalVentaDiaria` (una fila por día), los productos de
+`ResumenVentaDiaria` y los clientes de `Venta.total`, filtrando por fecha con
+los índices parciales.
+Los paneles caros se guardan en la cache durante `TABLERO_CACHE_SEGUNDOS`.
+"""
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import Lag, Rank, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import ResumenVentaDiaria, TotalVentaDiaria, Venta
+from .resumen import DINERO, inicio_del_dia, totales_del_periodo
+
+DIAS_PERMITIDOS = (7, 30, 90, 365)
+DIAS_POR_DEFECTO = 30
+LIMITE_DESTACADOS = 10
+
+AGRUPAR_POR = {
+    'dia': TruncDay,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+def en_cache(nombre, calcular, *partes):
+    """
+    Devuelve el panel `nombre` guardado en la cache o lo calcula. La clave
+    incluye el día de hoy, así al cambiar de día nunca se muestra el anterior.
+    """
+    clave = ':'.join(['tablero', nombre, str(timezone.localdate()), *map(str, partes)])
+    return cache.get_or_set(clave, calcular, getattr(settings, 'TABLERO_CACHE_SEGUNDOS', 300))
+
+
+def ingresos_por_periodo(unidad, desde):
+    """
+    Ingresos y unidades por día, semana o mes desde `desde`, con la variación
+    porcentual respecto del período anterior.
+    """
+    filas = list(
+        TotalVentaDiaria.objects.filter(fecha__gte=desde)
+        .annotate(periodo=AGRUPAR_POR[unidad]('fecha'))
+        .values('periodo')
+        .annotate(ingresos=Sum('ingresos', output_field=DINERO), unidades=Sum('unidades'))
+        .annotate(anterior=Window(Lag('ingresos'), order_by=F('periodo').asc()))
+        .order_by('periodo')
+    )
+    for fila in filas:
+        anterior = fila.pop('anterior')
+        fila['variacion'] = round((fila['ingresos'] - anterior) * 100 / anterior, 1) if anterior else None
+    return filas
+
+
+def productos_destacados(desde, hasta):
+    """
+    Los productos con más unidades y los que más facturaron entre dos días,
+    con su puesto en cada lista. Una sola consulta calcula los dos rankings.
+    """
+    filas = list(
+        ResumenVentaDiaria.objects.filter(fecha__range=(desde, hasta))
+        .values('producto_id', 'producto__nombre')
+        .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos', output_field=DINERO))
+        .filter(unidades__gt=0)
+        .annotate(
+            puesto_unidades=Window(Rank(), order_by=[F('unidades').desc(), F('producto_id')]),
+            puesto_ingresos=Window(Rank(), order_by=[F('ingresos').desc(), F('producto_id')]),
+        )
+        .filter(Q(puesto_unidades__lte=LIMITE_DESTACADOS) | Q(puesto_ingresos__lte=LIMITE_DESTACADOS))
+    )
+    return {
+        orden: [
+            dict(fila, puesto=fila[f'puesto_{orden}'])
+            for fila in sorted(filas, key=lambda fila: fila[f'puesto_{orden}'])
+            if fila[f'puesto_{orden}'] <= LIMITE_DESTACADOS
+        ]
+        for orden in ('unidades', 'ingresos')
+    }
+
+
+def ventas_entre(desde, hasta):
+    # Ventas de los días `desde` a `hasta` inclusive, en la zona horaria del sistema.
+    return Venta.objects.filter(fecha__gte=inicio_del_dia(desde), fecha__lt=inicio_del_dia(hasta + timedelta(days=1)))
+
+
+def clientes_destacados(desde, hasta):
+    """
+    Los clientes que más gastaron entre dos días, con sus compras y su puesto.
+    """
+    return list(
+        ventas_entre(desde, hasta).filter(anulada=False)
+        .values('cliente_id', 'cliente__nombre', 'cliente__apellido')
+        .annotate(compras=Count('id'), gastado=Sum('total', output_field=DINERO))
+        .annotate(puesto=Window(Rank(), order_by=F('gastado').desc()))
+        .order_by('puesto', 'cliente_id')[:LIMITE_DESTACADOS]
+    )
+
+
+def ventas_validas_y_anuladas(desde, hasta):
+    """
+    Cantidad, importe y ticket promedio de las ventas válidas, y cantidad e
+    importe de las anuladas, entre dos días.
+    """
+    datos = TotalVentaDiaria.objects.filter(fecha__range=(desde, hasta)).aggregate(
+        validas=Sum('ventas'),
+        ingresos=Sum('ingresos', output_field=DINERO),
+        anuladas=Sum('anuladas'),
+        importe_anulado=Sum('importe_anulado', output_field=DINERO),
+    )
+    validas = datos['validas'] or 0
+    anuladas = datos['anuladas'] or 0
+    ingresos = datos['ingresos'] or 0
+    return {
+        'validas': {
+            'cantidad': validas,
+            'importe': ingresos,
+            'ticket_promedio': round(ingresos / validas, 2) if validas else None,
+        },
+        'anuladas': {'cantidad': anuladas, 'importe': datos['importe_anulado'] or 0},
+        'porcentaje_anuladas': round(anuladas * 100 / (validas + anuladas), 1) if validas + anuladas else 0,
+    }
+
+
+def tablero(dias=DIAS_POR_DEFECTO):
+    """
+    Todos los paneles del tablero para los últimos `dias` días.
+    Lo de hoy se consulta siempre (es una sola fila); el resto sale de la
+    cache si está.
+    """
+    hoy = timezone.localdate()
+    desde = hoy - timedelta(days=dias - 1)
+    inicio_semanas = hoy - timedelta(days=hoy.weekday() + 7 * 11)
+    mes = hoy.month - 11  # Los últimos 12 meses, contando el actual.
+    inicio_meses = date(hoy.year - (mes <= 0), mes + 12 if mes <= 0 else mes, 1)
+    return {
+        'dias': dias,
+        'desde': desde,
+        'hoy': totales_del_periodo(hoy, hoy),
+        'periodo': en_cache('periodo', lambda: totales_del_periodo(desde, hoy), dias),
+        # Por día se muestra como mucho el último mes, aunque el período sea más largo.
+        'por_dia': en_cache('por_dia', lambda: ingresos_por_periodo('dia', max(desde, hoy - timedelta(days=30))), dias),
+        'por_semana': en_cache('por_semana', lambda: ingresos_por_periodo('semana', inicio_semanas)),
+        'por_mes': en_cache('por_mes', lambda: ingresos_por_periodo('mes', inicio_meses)),
+        'productos': en_cache('productos', lambda: productos_destacados(desde, hoy), dias),
+        'clientes': en_cache('clientes', lambda: clientes_destacados(desde, hoy), dias),
+        'ventas': en_cache('ventas', lambda: ventas_validas_y_anuladas(desde, hoy), dias),
+    }
@@ -0,0 +1,200 @@
+import json
+import math
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, reverse
+
+from clientes import urls as urls_clientes
+from clientes.models import Cliente
+from productos import urls as urls_productos
+from productos.models import Producto
+from ventas import urls as urls_ventas
+from ventas.models import DetallesVenta, Venta
+
+# Parámetros de las URLs con argumentos: se usa el registro de id más bajo.
+MODELOS_POR_ARGUMENTO = {
+    'venta_id': Venta,
+    'producto_id': Producto,
+    'cliente_id': Cliente,
+}
+
+
+def _codigo_a_escanear():
+    codigo = Producto.objects.filter(activo=True).exclude(codigo=None).values_list('codigo', flat=True).first()
+    return {'codigo': codigo} if codigo else None
+
+
+# Parámetros de GET para que los buscadores hagan su trabajo. Si es una
+# función, se llama al medir; si devuelve None (no hay datos) no se mide.
+PARAMETROS = {
+    'crear_venta': {'buscar_cliente': 'ma', 'buscar_producto': 'al'},
+    'editar_venta': {'buscar_cliente': 'ma', 'buscar_producto': 'al'},
+    'autocompletar_productos': {'q': 'al'},
+    'autocompletar_clientes': {'q': 'ma'},
+    'escanear_producto': _codigo_a_escanear,
+}
+# Solo aceptan POST y modifican datos: no se miden.
+SIN_MEDIR = ('eliminar_clientes', 'eliminar_productos', 'eliminar_ventas', 'sincronizar_ventas')
+
+
+def percentil(valores, p):
+    # Método del rango más cercano: siempre devuelve un valor medido.
+    ordenados = sorted(valores)
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+def urls_a_medir():
+    """
+    (nombre, url, parámetros) de cada URL de clientes, productos y ventas.
+    """
+    for modulo in (urls_clientes, urls_productos, urls_ventas):
+        for patron in modulo.urlpatterns:
+            if not isinstance(patron, URLPattern) or not patron.name or patron.name in SIN_MEDIR:
+                continue
+            argumentos = {}
+            for argumento in patron.pattern.converters:
+                modelo = MODELOS_POR_ARGUMENTO[argumento]
+                primero = modelo.objects.order_by('pk').values_list('pk', flat=True).first()
+                if primero is None:
+                    break
+                argumentos[argumento] = primero
+            else:
+                parametros = PARAMETROS.get(patron.name, {})
+                if callable(parametros):
+                    parametros = parametros()
+                    if parametros is None:
+                        continue
+                yield patron.name, reverse(patron.name, kwargs=argumentos), parametros
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cada URL de clientes, productos y ventas con el cliente de pruebas de Django: "
+        "latencia p50/p95 y cantidad de consultas. Puede guardar el resultado como base "
+        "y compararlo contra una base guardada. El repositorio no trae ninguna base: los "
+        "tiempos dependen de la máquina y de los datos, así que cada uno genera la suya con "
+        "--guardar antes de usar --comparar."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=20, help="Pedidos medidos por URL (20 por defecto).")
+        parser.add_argument('--guardar', metavar='ARCHIVO', help="Guarda los resultados en este JSON.")
+        parser.add_argument(
+            '--comparar',
+            metavar='ARCHIVO',
+            help="Compara contra una base guardada antes con --guardar (si el archivo no existe, termina con error "
+                 "sin medir).",
+        )
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=0.25,
+            help="Aumento de p95 permitido respecto de la base (0.25 = 25%%).",
+        )
+        parser.add_argument(
+            '--con-cache',
+            action='store_true',
+            help="Mide con las listas cacheadas (por defecto se mide el caso sin cache).",
+        )
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError("--repeticiones tiene que ser mayor que cero.")
+        if options['comparar'] and not Path(options['comparar']).is_file():
+            # Antes de medir, que puede tardar varios minutos.
+            raise CommandError(
+                f"No existe la base {options['comparar']}: generala primero con --guardar {options['comparar']}."
+            )
+
+        resultados = self.medir(options['repeticiones'], options['con_cache'])
+        self.mostrar(resultados)
+
+        informe = {
+            'repeticiones': options['repeticiones'],
+            'con_cache': options['con_cache'],
+            'datos': {
+                'clientes': Cliente.objects.count(),
+                'productos': Producto.objects.count(),
+                'ventas': Venta.objects.count(),
+                'detalles': DetallesVenta.objects.count(),
+            },
+            'resultados': resultados,
+        }
+        if options['guardar']:
+            Path(options['guardar']).write_text(json.dumps(informe, indent=2, ensure_ascii=False), encoding='utf-8')
+            self.stdout.write(f"Resultados guardados en {options['guardar']}.")
+        if options['comparar']:
+            self.comparar(informe, options['comparar'], options['tolerancia'])
+
+    def medir(self, repeticiones, con_cache=False):
+        cliente = Client()
+        resultados = {}
+        # El cliente de pruebas pide todo a "testserver".
+        ajustes = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not con_cache:
+            # Sin esto, después del precalentamiento las listas salen del cache sin consultas.
+            ajustes['LISTAS_CACHE_SEGUNDOS'] = 0
+        with override_settings(**ajustes):
+            for nombre, url, parametros in urls_a_medir():
+                cliente.get(url, parametros)  # Precalentamiento: plantillas, conexiones, caches.
+                tiempos = []
+                consultas = []
+                for _ in range(repeticiones):
+                    inicio = time.perf_counter()
+                    respuesta = cliente.get(url, parametros)
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                    if respuesta.status_code != 200:
+                        raise CommandError(f"{url} respondió {respuesta.status_code}.")
+                    # Lo informa MetricasMiddleware (mi_proyecto/metricas.py).
+                    consultas.append(int(respuesta['X-Consultas-SQL']))
+                resultados[nombre] = {
+                    'url': url,
+                    'p50_ms': round(percentil(tiempos, 50), 2),
+                    'p95_ms': round(percentil(tiempos, 95), 2),
+                    'consultas': max(consultas),
+                }
+        return resultados
+
+    def mostrar(self, resultados):
+        self.stdout.write(f"{'URL':<26}{'p50 ms':>10}{'p95 ms':>10}{'consultas':>11}")
+        for nombre, datos in resultados.items():
+            self.stdout.write(f"{nombre:<26}{datos['p50_ms']:>10.2f}{datos['p95_ms']:>10.2f}{datos['consultas']:>11}")
+
+    def comparar(self, informe, archivo, tolerancia):
+        try:
+            base = json.loads(Path(archivo).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as error:
+            raise CommandError(f"No se pudo leer la base {archivo}: {error}")
+
+        if base.get('datos') != informe['datos']:
+            self.stdout.write(self.style.WARNING(
+                "La base se midió con otra cantidad de datos; los tiempos pueden no ser comparables."
+            ))
+        if base.get('con_cache', False) != informe['con_cache']:
+            self.stdout.write(self.style.WARNING(
+                "La base se midió con otro uso del cache (--con-cache); las consultas no son comparables."
+            ))
+
+        regresiones = []
+        for nombre, actual in informe['resultados'].items():
+            anterior = base.get('resultados', {}).get(nombre)
+            if anterior is None:
+                self.stdout.write(f"{nombre}: sin datos en la base.")
+                continue
+            if actual['consultas'] > anterior['consultas']:
+                regresiones.append(f"{nombre}: {anterior['consultas']} -> {actual['consultas']} consultas")
+            # Menos de 1 ms de diferencia es ruido de la medición.
+            limite = max(anterior['p95_ms'] * (1 + tolerancia), anterior['p95_ms'] + 1)
+            if actual['p95_ms'] > limite:
+                regresiones.append(f"{nombre}: p95 {anterior['p95_ms']} ms -> {actual['p95_ms']} ms")
+
+        for regresion in regresiones:
+            self.stdout.write(self.style.ERROR(regresion))
+        if regresiones:
+            raise CommandError(f"{len(regresiones)} regresión(es) respecto de {archivo}.")
+        self.stdout.write(self.style.SUCCESS(f"Sin regresiones respecto de {archivo}."))
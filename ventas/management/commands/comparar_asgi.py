@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+from asgiref.sync import ThreadSensitiveContext
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from ventas.management.commands.benchmark import PARAMETROS, percentil
+
+# Las vistas async: las que más se piden en la caja.
+VISTAS = ('lista_ventas', 'crear_venta', 'lista_productos', 'lista_clientes')
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara cuántos pedidos por segundo atienden las vistas async por ASGI y por WSGI, con "
+        "varios pedidos a la vez. Por defecto usa los manejadores de Django dentro del proceso; con "
+        "--asgi y --wsgi mide dos servidores ya levantados (por ejemplo uvicorn y gunicorn)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=200, help="Pedidos por URL y por modo (200 por defecto).")
+        parser.add_argument('--concurrencia', type=int, default=16, help="Pedidos a la vez (16 por defecto).")
+        parser.add_argument('--asgi', metavar='URL', help="Servidor ASGI, por ejemplo http://127.0.0.1:8001.")
+        parser.add_argument('--wsgi', metavar='URL', help="Servidor WSGI, por ejemplo http://127.0.0.1:8000.")
+        parser.add_argument(
+            '--con-cache',
+            action='store_true',
+            help="Dentro del proceso, mide con las listas cacheadas (por defecto se mide el caso sin cache).",
+        )
+
+    def handle(self, *args, **options):
+        if min(options['pedidos'], options['concurrencia']) < 1:
+            raise CommandError("--pedidos y --concurrencia tienen que ser mayores que cero.")
+        if bool(options['asgi']) != bool(options['wsgi']):
+            raise CommandError("--asgi y --wsgi van juntos.")
+
+        pedidos, concurrencia = options['pedidos'], options['concurrencia']
+        self.stdout.write(f"{pedidos} pedidos por URL, {concurrencia} a la vez.")
+        self.stdout.write(f"{'URL':<18}{'modo':<6}{'pedidos/s':>11}{'p50 ms':>10}{'p95 ms':>10}{'errores':>9}")
+        # El cliente de pruebas pide todo a "testserver".
+        ajustes = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver']}
+        if not options['con_cache']:
+            # Sin esto, casi todos los pedidos a las listas salen del cache.
+            ajustes['LISTAS_CACHE_SEGUNDOS'] = 0
+        with override_settings(**ajustes):
+            for nombre in VISTAS:
+                url, parametros = reverse(nombre), PARAMETROS.get(nombre, {})
+                if options['asgi']:
+                    modos = {
+                        modo: self.medir_hilos(
+                            self.pedir_servidor(options[modo], url, parametros), pedidos, concurrencia,
+                        )
+                        for modo in ('asgi', 'wsgi')
+                    }
+                else:
+                    modos = {
+                        'asgi': asyncio.run(self.medir_asgi(url, parametros, pedidos, concurrencia)),
+                        'wsgi': self.medir_hilos(self.pedir_wsgi(url, parametros), pedidos, concurrencia),
+                    }
+                for modo, datos in modos.items():
+                    self.stdout.write(
+                        f"{nombre:<18}{modo:<6}{datos['pedidos_por_segundo']:>11.1f}"
+                        f"{datos['p50_ms']:>10.1f}{datos['p95_ms']:>10.1f}{datos['errores']:>9}"
+                    )
+
+    def pedir_wsgi(self, url, parametros):
+        locales = threading.local()
+
+        def pedir():
+            # Un cliente por hilo: cada uno guarda sus cookies.
+            if not hasattr(locales, 'cliente'):
+                locales.cliente = Client(raise_request_exception=False)
+            return locales.cliente.get(url, parametros).status_code
+        return pedir
+
+    def pedir_servidor(self, servidor, url, parametros):
+        direccion = f"{servidor.rstrip('/')}{url}?{urlencode(parametros)}"
+
+        def pedir():
+            try:
+                with urlopen(direccion, timeout=30) as respuesta:
+                    respuesta.read()
+                    return respuesta.status
+            except URLError:
+                return None
+        return pedir
+
+    def medir_hilos(self, pedir, pedidos, concurrencia):
+        tiempos = []
+        errores = 0
+        cerrojo = threading.Lock()
+
+        def trabajador(cantidad):
+            nonlocal errores
+            try:
+                for _ in range(cantidad):
+                    inicio = time.perf_counter()
+                    estado = pedir()
+                    with cerrojo:
+                        if estado == 200:
+                            tiempos.append((time.perf_counter() - inicio) * 1000)
+                        else:
+                            errores += 1
+            finally:
+                # Las conexiones son de cada hilo: las persistentes quedarían abiertas.
+                connections.close_all()
+
+        hilos = [threading.Thread(target=trabajador, args=(cantidad,)) for cantidad in repartir(pedidos, concurrencia)]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return resumir(tiempos, errores, time.perf_counter() - inicio)
+
+    async def medir_asgi(self, url, parametros, pedidos, concurrencia):
+        tiempos = []
+        errores = 0
+
+        async def trabajador(cantidad):
+            nonlocal errores
+            cliente = AsyncClient(raise_request_exception=False)
+            for _ in range(cantidad):
+                inicio = time.perf_counter()
+                # Como el ASGIHandler de un servidor: cada pedido tiene su hilo
+                # para el ORM y sus conexiones (el cliente de pruebas no lo hace).
+                async with ThreadSensitiveContext():
+                    respuesta = await cliente.get(url, parametros)
+                if respuesta.status_code == 200:
+                    tiempos.append((time.perf_counter() - inicio) * 1000)
+                else:
+                    errores += 1
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabajador(cantidad) for cantidad in repartir(pedidos, concurrencia)))
+        return resumir(tiempos, errores, time.perf_counter() - inicio)
+
+
+def repartir(pedidos, trabajadores):
+    """
+    Reparte `pedidos` entre `trabajadores` lo más parejo posible.
+    """
+    trabajadores = min(pedidos, trabajadores)
+    return [pedidos // trabajadores + (numero < pedidos % trabajadores) for numero in range(trabajadores)]
+
+
+def resumir(tiempos, errores, duracion):
+    return {
+        'pedidos_por_segundo': len(tiempos) / duracion,
+        'p50_ms': percentil(tiempos, 50) if tiempos else 0,
+        'p95_ms': percentil(tiempos, 95) if tiempos else 0,
+        'errores': errores,
+    }
@@ -0,0 +1,140 @@
+import time
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+
+from mi_proyecto.basedatos import base_sqlite
+from mi_proyecto.cache import invalidar
+from mi_proyecto.importar import upsert
+
+APLICACIONES = ('clientes', 'productos', 'ventas')
+ORIGEN = 'origen'
+
+
+def ordenar_por_referencias(modelos):
+    """
+    `modelos` con cada uno después de los que referencia con claves foráneas,
+    para que al copiarlos en ese orden las referencias ya existan.
+    """
+    ordenados = []
+    pendientes = list(modelos)
+    while pendientes:
+        for modelo in pendientes:
+            referencias = {
+                campo.related_model
+                for campo in modelo._meta.concrete_fields
+                if campo.is_relation and campo.related_model is not modelo
+            }
+            if not referencias & set(pendientes):
+                ordenados.append(modelo)
+                pendientes.remove(modelo)
+                break
+        else:
+            raise CommandError(f"Referencias circulares entre: {', '.join(modelo._meta.label for modelo in pendientes)}.")
+    return ordenados
+
+
+class Command(BaseCommand):
+    help = (
+        "Copia clientes, productos y ventas (con sus detalles, movimientos y resúmenes) de un "
+        "archivo SQLite a la base configurada, por lotes, conservando los ids. La base de "
+        "destino tiene que tener las migraciones aplicadas y esas tablas vacías."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'origen',
+            nargs='?',
+            default=str(Path(settings.BASE_DIR) / 'db.sqlite3'),
+            help="Archivo SQLite de origen (db.sqlite3 por defecto).",
+        )
+        parser.add_argument('--lote', type=int, default=2_000, help="Filas por transacción (2.000 por defecto).")
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help="Borra antes esas tablas en la base de destino, por ejemplo tras una copia interrumpida.",
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote tiene que ser mayor que cero.")
+        origen = Path(options['origen'])
+        if not origen.is_file():
+            raise CommandError(f"No existe el archivo {origen}.")
+        if connection.vendor == 'sqlite' and Path(connection.settings_dict['NAME']).resolve() == origen.resolve():
+            raise CommandError("El origen es la misma base configurada: elegí otro motor con DB_MOTOR.")
+
+        connections.settings[ORIGEN] = connections.configure_settings(
+            {'default': base_sqlite('desarrollo', str(origen))}
+        )['default']
+        try:
+            self.comprobar_migraciones()
+            modelos = ordenar_por_referencias(
+                [modelo for app in APLICACIONES for modelo in apps.get_app_config(app).get_models()]
+            )
+            if options['limpiar']:
+                with transaction.atomic():
+                    for modelo in reversed(modelos):
+                        modelo._base_manager.all().delete()
+            ocupados = [modelo._meta.label for modelo in modelos if modelo._base_manager.exists()]
+            if ocupados:
+                raise CommandError(f"La base de destino ya tiene datos en: {', '.join(ocupados)} (ver --limpiar).")
+
+            for modelo in modelos:
+                inicio = time.perf_counter()
+                copiadas = self.copiar(modelo, options['lote'])
+                self.stdout.write(f"{modelo._meta.label}: {copiadas} fila(s) en {time.perf_counter() - inicio:.1f} s.")
+        finally:
+            connections[ORIGEN].close()
+            del connections[ORIGEN]
+            del connections.settings[ORIGEN]
+
+        # Los ids se copiaron tal cual: las secuencias (PostgreSQL) tienen que seguir desde el mayor.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+                cursor.execute(sql)
+        # Las filas se cargaron sin pasar por save(): las listas cacheadas se invalidan a mano.
+        invalidar(*APLICACIONES)
+        self.stdout.write(self.style.SUCCESS(f"Datos copiados de {origen}."))
+
+    def comprobar_migraciones(self):
+        # Las columnas se copian por nombre: las dos bases tienen que estar en la misma versión.
+        def aplicadas(alias):
+            return {
+                (app, nombre)
+                for app, nombre in MigrationRecorder(connections[alias]).applied_migrations()
+                if app in APLICACIONES
+            }
+        faltantes = aplicadas(ORIGEN) ^ aplicadas('default')
+        if faltantes:
+            raise CommandError(
+                "Las migraciones de origen y destino no coinciden: "
+                + ", ".join(f"{app}.{nombre}" for app, nombre in sorted(faltantes))
+                + ". Aplicá las mismas con migrate en las dos bases."
+            )
+
+    def copiar(self, modelo, lote):
+        campos = modelo._meta.concrete_fields
+        columnas = [campo.attname for campo in campos]
+        filas = modelo._base_manager.using(ORIGEN).order_by('pk').values_list(*columnas).iterator(chunk_size=lote)
+        copiadas = 0
+        pendientes = []
+        for fila in filas:
+            # Los valores se preparan para el motor de destino (fechas, decimales, JSON...).
+            pendientes.append({
+                campo.attname: campo.get_db_prep_save(valor, connection) for campo, valor in zip(campos, fila)
+            })
+            if len(pendientes) >= lote:
+                copiadas += self.guardar(modelo, pendientes)
+                pendientes = []
+        return copiadas + self.guardar(modelo, pendientes)
+
+    def guardar(self, modelo, filas):
+        with transaction.atomic():
+            upsert(modelo, filas)
+        return len(filas)
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.exportar import ENCABEZADOS as ENCABEZADOS_CLIENTES, filas_clientes
+from mi_proyecto.exportar import FORMATOS, FormatoNoDisponible, escribir_csv, escribir_xlsx, leer_booleano, leer_fecha
+from productos.exportar import ENCABEZADOS as ENCABEZADOS_PRODUCTOS, filas_productos
+from ventas.exportar import ENCABEZADOS as ENCABEZADOS_VENTAS, filas_ventas
+
+LISTADOS = {
+    'ventas': (ENCABEZADOS_VENTAS, filas_ventas, 'anulada'),
+    'productos': (ENCABEZADOS_PRODUCTOS, filas_productos, 'activo'),
+    'clientes': (ENCABEZADOS_CLIENTES, filas_clientes, 'activo'),
+}
+
+
+class Command(BaseCommand):
+    help = "Exporta ventas, productos o clientes a CSV o XLSX sin cargar todas las filas en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument('listado', choices=sorted(LISTADOS))
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--salida', help="Archivo de salida (por defecto la salida estándar, solo CSV).")
+        parser.add_argument('--desde', help="Primer día a exportar (AAAA-MM-DD).")
+        parser.add_argument('--hasta', help="Último día a exportar (AAAA-MM-DD).")
+        parser.add_argument('--anulada', help="Solo ventas anuladas (1) o válidas (0).")
+        parser.add_argument('--activo', help="Solo productos o clientes activos (1) o inactivos (0).")
+
+    def handle(self, *args, **options):
+        encabezados, filas, campo = LISTADOS[options['listado']]
+        try:
+            filtros = {
+                'desde': leer_fecha(options['desde']),
+                'hasta': leer_fecha(options['hasta']),
+                campo: leer_booleano(options[campo]),
+            }
+        except ValueError as error:
+            raise CommandError(str(error))
+        if options['formato'] == 'xlsx' and not options['salida']:
+            raise CommandError("Para exportar a XLSX hay que indicar --salida.")
+
+        if not options['salida']:
+            escribir_csv(self.stdout, encabezados, filas(**filtros))
+            return
+        try:
+            if options['formato'] == 'csv':
+                with open(options['salida'], 'w', encoding='utf-8', newline='') as archivo:
+                    escribir_csv(archivo, encabezados, filas(**filtros))
+            else:
+                with open(options['salida'], 'wb') as archivo:
+                    escribir_xlsx(archivo, encabezados, filas(**filtros), hoja=options['listado'])
+        except FormatoNoDisponible as error:
+            raise CommandError(str(error))
+        self.stderr.write(self.style.SUCCESS(f"Exportado a {options['salida']}."))
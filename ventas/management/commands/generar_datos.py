@@ -0,0 +1,176 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from clientes.models import Cliente
+from mi_proyecto.cache import invalidar
+from productos.models import CierreStock, MovimientoStock, Producto
+from ventas.models import DetallesVenta, ResumenVentaDiaria, TotalVentaDiaria, Venta
+from ventas.resumen import reconstruir_resumen
+
+NOMBRES = [
+    'Juan', 'María', 'José', 'Ana', 'Carlos', 'Lucía', 'Diego', 'Sofía', 'Martín', 'Valentina',
+    'Pablo', 'Camila', 'Jorge', 'Florencia', 'Luis', 'Agustina', 'Miguel', 'Julieta', 'Tomás', 'Paula',
+]
+APELLIDOS = [
+    'González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez', 'García', 'Sánchez',
+    'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores', 'Benítez', 'Acosta', 'Medina',
+]
+TIPOS = [
+    'Alfajor', 'Galletitas', 'Yerba', 'Café', 'Té', 'Azúcar', 'Harina', 'Fideos', 'Arroz', 'Aceite',
+    'Leche', 'Yogur', 'Queso', 'Jugo', 'Gaseosa', 'Agua', 'Chocolate', 'Caramelos', 'Mermelada', 'Dulce de leche',
+]
+MARCAS = ['Del Valle', 'La Serena', 'Don Pedro', 'El Ombú', 'Santa Rosa', 'Los Andes', 'Río Claro', 'La Pampa']
+VARIANTES = ['clásico', 'light', 'integral', 'familiar', 'x 500 g', 'x 1 kg', 'sin TACC', 'premium']
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga un conjunto de datos sintético (clientes, productos, ventas y sus detalles) "
+        "para medir el rendimiento. Con la misma semilla genera siempre los mismos datos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=50_000, help="Cantidad de clientes (50.000 por defecto).")
+        parser.add_argument('--productos', type=int, default=20_000, help="Cantidad de productos (20.000 por defecto).")
+        parser.add_argument('--detalles', type=int, default=2_000_000, help="Cantidad total de detalles de venta (2.000.000 por defecto).")
+        parser.add_argument('--max-lineas', type=int, default=10, help="Máximo de productos distintos por venta.")
+        parser.add_argument('--dias', type=int, default=365, help="Las ventas se reparten en los últimos N días.")
+        parser.add_argument('--anuladas', type=float, default=0.02, help="Proporción de ventas anuladas (0 a 1).")
+        parser.add_argument('--semilla', type=int, default=1, help="Semilla del generador aleatorio.")
+        parser.add_argument('--lote', type=int, default=2_000, help="Ventas que se escriben por transacción.")
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help="Borra antes TODAS las ventas, productos y clientes existentes.",
+        )
+
+    def handle(self, *args, **options):
+        if options['clientes'] < 1 or options['productos'] < 1:
+            raise CommandError("Hacen falta al menos un cliente y un producto.")
+        if options['max_lineas'] < 1 or options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError("--max-lineas, --dias y --lote tienen que ser mayores que cero.")
+
+        azar = random.Random(options['semilla'])
+
+        if options['limpiar']:
+            with transaction.atomic():
+                MovimientoStock.objects.all().delete()
+                CierreStock.objects.all().delete()
+                ResumenVentaDiaria.objects.all().delete()
+                TotalVentaDiaria.objects.all().delete()
+                DetallesVenta.objects.all().delete()
+                Venta.objects.all().delete()
+                Producto.objects.all().delete()
+                Cliente.objects.all().delete()
+            self.stdout.write("Datos anteriores borrados.")
+
+        clientes_ids = self.crear_clientes(azar, options['clientes'])
+        productos = self.crear_productos(azar, options['productos'])
+        ventas, detalles = self.crear_ventas(azar, clientes_ids, productos, options)
+        # Las ventas se cargaron sin pasar por los servicios: armamos el resumen de una vez.
+        reconstruir_resumen()
+        # bulk_create no dispara post_save: las listas cacheadas se invalidan a mano.
+        invalidar('clientes', 'productos', 'ventas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(clientes_ids)} clientes, {len(productos)} productos, "
+            f"{ventas} ventas y {detalles} detalles creados."
+        ))
+
+    def crear_clientes(self, azar, cantidad):
+        # El correo es único: se numera a partir del último id para poder cargar más de una vez.
+        inicio = (Cliente.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0) + 1
+        clientes = [
+            Cliente(
+                nombre=azar.choice(NOMBRES),
+                apellido=azar.choice(APELLIDOS),
+                email=f'cliente{inicio + i}@sintetico.test',
+                telefono=f'11{azar.randrange(10**8):08d}',
+                activo=azar.random() > 0.05,
+            )
+            for i in range(cantidad)
+        ]
+        with transaction.atomic():
+            creados = Cliente.objects.bulk_create(clientes, batch_size=1_000)
+        self.stdout.write(f"{cantidad} clientes creados.")
+        return [cliente.id for cliente in creados if cliente.activo]
+
+    def crear_productos(self, azar, cantidad):
+        # El código es único: como los correos, se numera a partir del último id.
+        inicio = (Producto.objects.aggregate(ultimo=Max('id'))['ultimo'] or 0) + 1
+        productos = [
+            Producto(
+                nombre=f'{azar.choice(TIPOS)} {azar.choice(MARCAS)} {azar.choice(VARIANTES)} {i + 1}',
+                codigo=f'779{inicio + i:010d}',
+                descripcion=f'{azar.choice(TIPOS)} de {azar.choice(MARCAS)}, {azar.choice(VARIANTES)}.',
+                precio=Decimal(azar.randrange(100, 500_000)) / 100,
+                stock=0 if azar.random() < 0.05 else azar.randrange(1, 1_000),
+                activo=azar.random() > 0.03,
+            )
+            for i in range(cantidad)
+        ]
+        with transaction.atomic():
+            creados = Producto.objects.bulk_create(productos, batch_size=1_000)
+            # Las ventas sintéticas no descuentan stock: alcanza con el movimiento inicial.
+            MovimientoStock.objects.bulk_create(
+                [
+                    MovimientoStock(producto=producto, tipo=MovimientoStock.INICIAL, cantidad=producto.stock)
+                    for producto in creados
+                    if producto.stock
+                ],
+                batch_size=1_000,
+            )
+        self.stdout.write(f"{cantidad} productos creados.")
+        return [(producto.id, producto.precio) for producto in creados]
+
+    def crear_ventas(self, azar, clientes_ids, productos, options):
+        if not clientes_ids:
+            raise CommandError("No quedó ningún cliente activo para asignarle ventas.")
+
+        restantes = options['detalles']
+        max_lineas = min(options['max_lineas'], len(productos))
+        ahora = timezone.now()
+        desde = ahora - timedelta(days=options['dias'])
+        segundos = options['dias'] * 24 * 60 * 60
+        total_ventas = total_detalles = 0
+
+        while restantes > 0:
+            # Cada venta lleva de 1 a `max_lineas` productos distintos.
+            lote = []
+            while restantes > 0 and len(lote) < options['lote']:
+                lineas = azar.sample(productos, min(azar.randint(1, max_lineas), restantes))
+                lote.append([(producto, azar.randint(1, 5)) for producto in lineas])
+                restantes -= len(lineas)
+
+            fechas = sorted(desde + timedelta(seconds=azar.randrange(segundos)) for _ in lote)
+            ventas = [
+                Venta(
+                    cliente_id=azar.choice(clientes_ids),
+                    fecha=fecha,
+                    anulada=azar.random() < options['anuladas'],
+                    total=sum(precio * cantidad for (_, precio), cantidad in lineas),
+                )
+                for lineas, fecha in zip(lote, fechas)
+            ]
+            with transaction.atomic():
+                Venta.objects.bulk_create(ventas)
+                DetallesVenta.objects.bulk_create(
+                    [
+                        DetallesVenta(venta=venta, producto_id=producto_id, cantidad=cantidad, precio_unitario=precio)
+                        for venta, lineas in zip(ventas, lote)
+                        for (producto_id, precio), cantidad in lineas
+                    ],
+                    batch_size=2_000,
+                )
+
+            total_ventas += len(ventas)
+            total_detalles += sum(len(lineas) for lineas in lote)
+            self.stdout.write(f"{total_detalles} de {options['detalles']} detalles...")
+
+        return total_ventas, total_detalles
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from clientes.importar import importar_clientes
+from mi_proyecto.importar import TAMANIO_LOTE, ArchivoInvalido, escribir_errores
+from productos.importar import importar_productos
+
+IMPORTADORES = {
+    'productos': importar_productos,
+    'clientes': importar_clientes,
+}
+
+
+class Command(BaseCommand):
+    help = "Crea o actualiza productos (por código o nombre) o clientes (por email) desde un CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('listado', choices=sorted(IMPORTADORES))
+        parser.add_argument('archivo', help="CSV en UTF-8 con una fila de encabezados.")
+        parser.add_argument('--lote', type=int, default=TAMANIO_LOTE, help="Filas por transacción.")
+        parser.add_argument('--errores', help="Archivo CSV donde escribir las filas rechazadas.")
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError("--lote tiene que ser mayor que cero.")
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resultado = IMPORTADORES[options['listado']](archivo, lote=options['lote'])
+        except (OSError, ArchivoInvalido, UnicodeDecodeError) as error:
+            raise CommandError(str(error))
+        duracion = time.perf_counter() - inicio
+
+        if options['errores']:
+            with open(options['errores'], 'w', encoding='utf-8', newline='') as archivo:
+                escribir_errores(archivo, resultado)
+        else:
+            for linea, mensaje in sorted(resultado.errores):
+                self.stderr.write(f"Línea {linea}: {mensaje}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado} ({duracion:.1f} s, {resultado.leidas / duracion if duracion else 0:,.0f} filas/s)"
+        ))
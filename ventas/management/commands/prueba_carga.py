@@ -0,0 +1,151 @@
+import logging
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from clientes.models import Cliente
+from mi_proyecto.basedatos import PERFILES, base_sqlite
+from productos.models import Producto
+from ventas.management.commands.benchmark import percentil
+
+# Clientes y productos entre los que se eligen las ventas.
+MUESTRA = 1_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: varios escritores registran ventas a la vez con crear_venta sobre una "
+        "copia de la base SQLite, una vez por cada perfil de base de datos, e informa ventas por "
+        "segundo, latencia y errores por bloqueo. La base configurada no se modifica."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escritores', type=int, default=8, help="Escritores simultáneos (8 por defecto).")
+        parser.add_argument('--ventas', type=int, default=25, help="Ventas que registra cada escritor (25 por defecto).")
+        parser.add_argument('--lineas', type=int, default=3, help="Productos por venta (3 por defecto).")
+        parser.add_argument(
+            '--perfiles',
+            nargs='+',
+            choices=list(PERFILES),
+            default=list(PERFILES),
+            help="Perfiles a comparar (todos por defecto).",
+        )
+        parser.add_argument('--semilla', type=int, default=1, help="Semilla del generador aleatorio.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("La prueba de carga compara perfiles de SQLite.")
+        if min(options['escritores'], options['ventas'], options['lineas']) < 1:
+            raise CommandError("--escritores, --ventas y --lineas tienen que ser mayores que cero.")
+
+        # Cada venta saca una unidad de cada producto: se eligen los que alcanzan para todas.
+        maximo = options['escritores'] * options['ventas']
+        clientes = list(Cliente.objects.order_by('pk').values_list('pk', flat=True)[:MUESTRA])
+        productos = list(
+            Producto.objects.filter(stock__gte=maximo).order_by('pk').values_list('pk', flat=True)[:MUESTRA]
+        )
+        if not clientes or len(productos) < options['lineas']:
+            raise CommandError(
+                f"Hacen falta clientes y al menos {options['lineas']} productos con {maximo} unidades en stock "
+                "(ver el comando generar_datos)."
+            )
+
+        self.stdout.write(
+            f"{options['escritores']} escritores x {options['ventas']} ventas de {options['lineas']} productos."
+        )
+        self.stdout.write(
+            f"{'perfil':<12}{'ventas':>8}{'ventas/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'bloqueos':>10}{'otros':>7}"
+        )
+        with tempfile.TemporaryDirectory() as carpeta:
+            for perfil in options['perfiles']:
+                copia = Path(carpeta) / f'{perfil}.sqlite3'
+                self.copiar_base(copia)
+                datos = self.medir(perfil, copia, clientes, productos, options)
+                self.stdout.write(
+                    f"{perfil:<12}{datos['ventas']:>8}{datos['ventas_por_segundo']:>10.1f}"
+                    f"{datos['p50_ms']:>10.1f}{datos['p95_ms']:>10.1f}{datos['bloqueos']:>10}{datos['otros']:>7}"
+                )
+
+    def copiar_base(self, destino):
+        connection.ensure_connection()
+        copia = sqlite3.connect(destino)
+        try:
+            connection.connection.backup(copia)
+            # Cada perfil arranca del diario que trae SQLite; `produccion` pasa a WAL al conectarse.
+            copia.execute('PRAGMA journal_mode = delete')
+        finally:
+            copia.close()
+
+    def medir(self, perfil, copia, clientes, productos, options):
+        original = connections.settings['default']
+        connections.settings['default'] = {**original, **base_sqlite(perfil, str(copia))}
+        url = reverse('crear_venta')
+        tiempos = []
+        errores = Counter()
+        cerrojo = threading.Lock()
+        barrera = threading.Barrier(options['escritores'] + 1)
+
+        def escritor(numero):
+            azar = random.Random(options['semilla'] + numero)
+            navegador = Client()
+            barrera.wait()
+            try:
+                for _ in range(options['ventas']):
+                    elegidos = azar.sample(productos, options['lineas'])
+                    datos = {'cliente': azar.choice(clientes), 'productos': elegidos}
+                    datos.update({f'cantidad_{producto}': 1 for producto in elegidos})
+                    inicio = time.perf_counter()
+                    try:
+                        respuesta = navegador.post(url, datos)
+                        error = None if respuesta.status_code == 302 else 'otros'
+                    except OperationalError as excepcion:
+                        error = 'bloqueos' if 'locked' in str(excepcion) else 'otros'
+                    except DatabaseError:
+                        error = 'otros'
+                    with cerrojo:
+                        if error:
+                            errores[error] += 1
+                        else:
+                            tiempos.append((time.perf_counter() - inicio) * 1000)
+            finally:
+                # Las conexiones son de cada hilo: las persistentes quedarían abiertas.
+                connections.close_all()
+
+        hilos = [threading.Thread(target=escritor, args=(numero,)) for numero in range(options['escritores'])]
+        # Los errores se cuentan: sin esto cada bloqueo escribe su traza completa.
+        registro_solicitudes = logging.getLogger('django.request')
+        nivel = registro_solicitudes.level
+        registro_solicitudes.setLevel(logging.CRITICAL)
+        try:
+            # El cliente de pruebas pide todo a "testserver".
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                for hilo in hilos:
+                    hilo.start()
+                barrera.wait()
+                inicio = time.perf_counter()
+                for hilo in hilos:
+                    hilo.join()
+                duracion = time.perf_counter() - inicio
+        finally:
+            connections.settings['default'] = original
+            registro_solicitudes.setLevel(nivel)
+
+        return {
+            'ventas': len(tiempos),
+            'ventas_por_segundo': len(tiempos) / duracion,
+            'p50_ms': percentil(tiempos, 50) if tiempos else 0,
+            'p95_ms': percentil(tiempos, 95) if tiempos else 0,
+            'bloqueos': errores['bloqueos'],
+            'otros': errores['otros'],
+        }
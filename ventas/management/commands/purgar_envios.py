@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ventas.servicios import purgar_envios
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las claves de idempotencia de los formularios de venta con más de "
+        "VENTAS_VIGENCIA_CLAVE_HORAS horas. Pensado para correr periódicamente (cron)."
+    )
+
+    def handle(self, *args, **options):
+        borradas = purgar_envios()
+        self.stdout.write(self.style.SUCCESS(
+            f"{borradas} clave(s) con más de {settings.VENTAS_VIGENCIA_CLAVE_HORAS} hora(s) borrada(s)."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from ventas.models import Venta, total_segun_detalles
+
+
+class Command(BaseCommand):
+    help = "Reconstruye (o solo verifica) el total guardado de cada venta a partir de sus detalles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help="No modifica nada, solo informa las ventas cuyo total no coincide con sus detalles.",
+        )
+
+    def handle(self, *args, **options):
+        if options['verificar']:
+            desfasadas = list(
+                Venta.objects.annotate(calculado=total_segun_detalles())
+                .exclude(total=F('calculado'))
+                .values_list('id', 'total', 'calculado')
+            )
+            for venta_id, total, calculado in desfasadas:
+                self.stdout.write(f"Venta {venta_id}: guardado ${total}, según detalles ${calculado}.")
+            if desfasadas:
+                raise CommandError(f"{len(desfasadas)} venta(s) con el total desactualizado.")
+            self.stdout.write(self.style.SUCCESS("Todos los totales coinciden con sus detalles."))
+            return
+
+        # Una sola sentencia UPDATE, sin traer ninguna venta a Python.
+        actualizadas = Venta.objects.update(total=total_segun_detalles())
+        self.stdout.write(self.style.SUCCESS(f"{actualizadas} venta(s) recalculadas."))
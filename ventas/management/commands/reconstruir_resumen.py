@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ventas.resumen import reconstruir_resumen
+
+
+def leer_fecha(texto):
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        raise CommandError(f"Fecha inválida: {texto} (se espera AAAA-MM-DD).")
+
+
+class Command(BaseCommand):
+    help = "Recalcula el resumen diario de ventas desde las ventas y sus detalles, para todo el historial o un rango de días."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help="Primer día a recalcular (AAAA-MM-DD).")
+        parser.add_argument('--hasta', help="Último día a recalcular (AAAA-MM-DD).")
+
+    def handle(self, *args, **options):
+        desde = leer_fecha(options['desde']) if options['desde'] else None
+        hasta = leer_fecha(options['hasta']) if options['hasta'] else None
+        if desde and hasta and desde > hasta:
+            raise CommandError("--desde no puede ser posterior a --hasta.")
+
+        escritas = reconstruir_resumen(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f"Resumen recalculado: {escritas} fila(s) por día y producto."))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:05
+
+from django.db import migrations, models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    DetallesVenta = apps.get_model('ventas', 'DetallesVenta')
+    subtotales = (
+        DetallesVenta.objects.filter(venta=OuterRef('pk'))
+        .order_by()
+        .values('venta')
+        .annotate(suma=Sum(F('cantidad') * F('precio_unitario')))
+        .values('suma')
+    )
+    Venta.objects.update(total=Coalesce(
+        Subquery(subtotales),
+        Value(0),
+        output_field=DecimalField(max_digits=12, decimal_places=2),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0004_alter_detallesventa_producto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='total',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
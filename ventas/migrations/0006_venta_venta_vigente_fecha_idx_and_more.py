@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0004_cliente_cliente_activo_nombre_idx_and_more'),
+        ('productos', '0006_producto_producto_activo_nombre_idx_and_more'),
+        ('ventas', '0005_venta_total'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('anulada', False)), fields=['-fecha', '-id'], name='venta_vigente_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venta',
+            index=models.Index(condition=models.Q(('anulada', True)), fields=['-fecha', '-id'], name='venta_anulada_fecha_idx'),
+        ),
+    ]
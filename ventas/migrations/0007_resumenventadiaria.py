@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Round, TruncDate
+
+
+def armar_resumen(apps, schema_editor):
+    DetallesVenta = apps.get_model('ventas', 'DetallesVenta')
+    ResumenVentaDiaria = apps.get_model('ventas', 'ResumenVentaDiaria')
+    filas = (
+        DetallesVenta.objects.filter(venta__anulada=False)
+        .annotate(dia=TruncDate('venta__fecha'))
+        .order_by()
+        .values('dia', 'producto_id')
+        .annotate(
+            total_unidades=Sum('cantidad'),
+            total_ingresos=Round(
+                Sum(F('cantidad') * F('precio_unitario')), 2,
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+            total_ventas=Count('id'),
+        )
+    )
+    ResumenVentaDiaria.objects.bulk_create(
+        (
+            ResumenVentaDiaria(
+                fecha=fila['dia'],
+                producto_id=fila['producto_id'],
+                unidades=fila['total_unidades'],
+                ingresos=fila['total_ingresos'],
+                ventas=fila['total_ventas'],
+            )
+            for fila in filas.iterator()
+        ),
+        batch_size=1_000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0006_producto_producto_activo_nombre_idx_and_more'),
+        ('ventas', '0006_venta_venta_vigente_fecha_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenVentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('ventas', models.IntegerField(default=0)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='productos.producto')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'producto'), name='resumen_fecha_producto_unico')],
+            },
+        ),
+        migrations.RunPython(armar_resumen, migrations.RunPython.noop),
+    ]
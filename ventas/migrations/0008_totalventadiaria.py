@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:26
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def armar_totales(apps, schema_editor):
+    Venta = apps.get_model('ventas', 'Venta')
+    ResumenVentaDiaria = apps.get_model('ventas', 'ResumenVentaDiaria')
+    TotalVentaDiaria = apps.get_model('ventas', 'TotalVentaDiaria')
+    dinero = DecimalField(max_digits=14, decimal_places=2)
+    vendido = {
+        fila['fecha']: fila
+        for fila in ResumenVentaDiaria.objects.values('fecha')
+        .annotate(total_unidades=Sum('unidades'), total_ingresos=Sum('ingresos', output_field=dinero))
+        .order_by()
+    }
+    por_dia = (
+        Venta.objects.annotate(dia=TruncDate('fecha'))
+        .order_by()
+        .values('dia')
+        .annotate(
+            total_ventas=Count('id', filter=Q(anulada=False)),
+            total_anuladas=Count('id', filter=Q(anulada=True)),
+            total_anulado=Sum('total', filter=Q(anulada=True), output_field=dinero),
+        )
+    )
+    TotalVentaDiaria.objects.bulk_create(
+        (
+            TotalVentaDiaria(
+                fecha=fila['dia'],
+                ventas=fila['total_ventas'],
+                unidades=vendido.get(fila['dia'], {}).get('total_unidades', 0),
+                ingresos=vendido.get(fila['dia'], {}).get('total_ingresos', 0),
+                anuladas=fila['total_anuladas'],
+                importe_anulado=fila['total_anulado'] or 0,
+            )
+            for fila in por_dia.iterator()
+        ),
+        batch_size=1_000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0007_resumenventadiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TotalVentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('ventas', models.IntegerField(default=0)),
+                ('unidades', models.IntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('anuladas', models.IntegerField(default=0)),
+                ('importe_anulado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.RunPython(armar_totales, migrations.RunPython.noop),
+    ]
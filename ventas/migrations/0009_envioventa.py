@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0008_totalventadiaria'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EnvioVenta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True)),
+                ('creado_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('venta', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='envios', to='ventas.venta')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ventas', '0009_envioventa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venta',
+            name='id_caja',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        # De auto_now_add a un valor por defecto: no cambia nada en la base, y
+        # así SQLite no vuelve a copiar la tabla de ventas entera.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='venta',
+                    name='fecha',
+                    field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+                ),
+            ],
+        ),
+    ]
@@ -1,23 +1,59 @@
 from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+from django.utils import timezone
 from clientes.models import Cliente  
 from productos.models import Producto  
 
+
+def total_segun_detalles():
+    """
+    Expresión que calcula en la base de datos el total de cada venta a partir
+    de sus detalles. Se usa para reconstruir y verificar la columna `total`.
+    """
+    subtotales = (
+        DetallesVenta.objects.filter(venta=OuterRef('pk'))
+        .order_by()
+        .values('venta')
+        .annotate(suma=Sum(F('cantidad') * F('precio_unitario')))
+        .values('suma')
+    )
+    # Se redondea a 2 decimales: SQLite suma en punto flotante (3475.2499999...).
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    return Round(Coalesce(Subquery(subtotales), Value(0), output_field=decimal), 2, output_field=decimal)
+
 # Create your models here.
 
 # Modelo para representar la venta
 class Venta(models.Model):
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='compras')  # Relación con el cliente
     productos = models.ManyToManyField(Producto, through= 'DetallesVenta')  # Relación con los productos vendidos
-    fecha = models.DateTimeField(auto_now_add=True)  # Fecha de la venta
+    # Fecha de la venta: la hora del servidor, o la de la caja si se registró sin conexión.
+    fecha = models.DateTimeField(default=timezone.now, editable=False)
     anulada = models.BooleanField(default=False)  # Indica si la venta ha sido anulada
+    # Total guardado de la venta, se actualiza cada vez que se escriben sus detalles.
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0, db_index=True)
+    # Id que le dio la caja a una venta registrada sin conexión (ver
+    # ventas/sincronizacion.py): si la caja la vuelve a mandar no se duplica.
+    id_caja = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Listas de ventas y de anuladas: filtran por `anulada` y paginan por (fecha, id).
+            # Son índices parciales porque SQLite no usa un índice sobre un booleano
+            # para `WHERE "anulada"` / `WHERE NOT "anulada"`.
+            models.Index(fields=['-fecha', '-id'], condition=models.Q(anulada=False), name='venta_vigente_fecha_idx'),
+            models.Index(fields=['-fecha', '-id'], condition=models.Q(anulada=True), name='venta_anulada_fecha_idx'),
+        ]
     
     @property
     def calcular_total(self):
-        return sum(detalle.subtotal for detalle in self.detallesventa_set.all())
+        # Recalcula el total desde los detalles, sumando en la base de datos.
+        return Venta.objects.filter(pk=self.pk).values_list(total_segun_detalles(), flat=True).get()
 
     def __str__(self):
         cliente_str = f"{self.cliente.nombre} {self.cliente.apellido}" 
-        return f"Venta {self.id} - {cliente_str} - Fecha: {self.fecha} - Total: ${self.calcular_total:.2f}."
+        return f"Venta {self.id} - {cliente_str} - Fecha: {self.fecha} - Total: ${self.total:.2f}."
 
     
 # Modelo para representar los detalles de la venta
@@ -32,4 +68,51 @@ class DetallesVenta(models.Model):
         return self.cantidad * self.precio_unitario  # Método para calcular el subtotal de la venta
     
     def __str__(self):
-        return f"{self.cantidad} x {self.producto.nombre}. ${self.precio_unitario} c.u. = ${self.subtotal}."
\ No newline at end of file
+        return f"{self.cantidad} x {self.producto.nombre}. ${self.precio_unitario} c.u. = ${self.subtotal}."
+
+
+# Resumen de ventas por día y producto (solo ventas no anuladas). Se mantiene al
+# registrar, editar o anular una venta (ver ventas/resumen.py) y se puede
+# reconstruir con el comando `reconstruir_resumen`.
+class ResumenVentaDiaria(models.Model):
+    fecha = models.DateField()  # Día de la venta, en la zona horaria del sistema
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    unidades = models.IntegerField(default=0)  # Unidades vendidas
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # Suma de cantidad x precio
+    ventas = models.IntegerField(default=0)  # Ventas en las que aparece el producto
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'producto'], name='resumen_fecha_producto_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} - {self.producto.nombre}: {self.unidades} u. ${self.ingresos}."
+
+
+# Totales de cada día: una sola fila por día, para los informes por día, semana
+# o mes sin importar cuántos productos se vendieron. Se mantiene junto con
+# ResumenVentaDiaria.
+class TotalVentaDiaria(models.Model):
+    fecha = models.DateField(unique=True)
+    ventas = models.IntegerField(default=0)  # Ventas válidas
+    unidades = models.IntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    anuladas = models.IntegerField(default=0)  # Ventas anuladas
+    importe_anulado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.fecha}: {self.ventas} ventas, ${self.ingresos}."
+
+
+# Clave de idempotencia de cada formulario de venta enviado (ver
+# `registrar_venta`): si la caja reenvía el mismo formulario, la clave ya existe
+# y se devuelve la venta registrada en lugar de crear otra. Las claves vencen a
+# las VENTAS_VIGENCIA_CLAVE_HORAS y el comando `purgar_envios` las borra.
+class EnvioVenta(models.Model):
+    clave = models.CharField(max_length=64, unique=True)
+    venta = models.ForeignKey(Venta, on_delete=models.CASCADE, related_name='envios')
+    creado_en = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.clave} -> venta {self.venta_id}"
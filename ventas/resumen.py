@@ -0,0 +1,270 @@
+"""
+Resumen diario de ventas: `ResumenVentaDiaria` tiene una fila por día y
+producto con unidades, ingresos y cantidad de ventas (solo ventas no
+anuladas) y `TotalVentaDiaria` una fila por día con los totales, incluidas
+las anuladas.
+
+Los servicios de ventas lo actualizan dentro de la misma transacción en la que
+registran, editan o anulan una venta, sumando solo la diferencia. Los informes
+leen estas filas en lugar de recorrer todas las ventas y sus detalles, así que
+cuestan lo mismo sin importar cuánta historia haya.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Round, TruncDate
+from django.utils import timezone
+
+from .models import DetallesVenta, ResumenVentaDiaria, TotalVentaDiaria, Venta
+
+DINERO = DecimalField(max_digits=14, decimal_places=2)
+
+
+def lineas_de(detalles):
+    """
+    {id de producto: (cantidad, precio unitario)} de los detalles de una venta.
+    """
+    return {detalle.producto_id: (detalle.cantidad, detalle.precio_unitario) for detalle in detalles}
+
+
+def actualizar_resumen(venta, antes, despues, ventas=0, anuladas=0):
+    """
+    Suma al resumen del día de `venta` la diferencia entre sus líneas `antes`
+    y `despues` (ver `lineas_de`). Para una venta nueva `antes` es {} y
+    `ventas` es 1; para una anulación `despues` es {}, `ventas` es -1 y
+    `anuladas` es 1.
+    Se llama dentro de la transacción que escribe la venta. Son cuatro
+    consultas sin importar cuántos productos cambien.
+    """
+    cambios = {}
+    for producto_id in antes.keys() | despues.keys():
+        cantidad_antes, precio_antes = antes.get(producto_id, (0, 0))
+        cantidad, precio = despues.get(producto_id, (0, 0))
+        cambio = (
+            cantidad - cantidad_antes,
+            cantidad * precio - cantidad_antes * precio_antes,
+            (producto_id in despues) - (producto_id in antes),
+        )
+        if any(cambio):
+            cambios[producto_id] = cambio
+
+    _sumar_al_resumen(timezone.localdate(venta.fecha), cambios, {
+        'ventas': ventas,
+        'unidades': sum(cambio[0] for cambio in cambios.values()),
+        'ingresos': sum(cambio[1] for cambio in cambios.values()),
+        'anuladas': anuladas,
+        'importe_anulado': venta.total if anuladas else 0,
+    })
+
+
+def sumar_ventas(ventas):
+    """
+    Suma al resumen varias ventas nuevas juntas, dadas como [(día, total,
+    líneas)] con las líneas como en `lineas_de`. Son cuatro consultas por día,
+    sin importar cuántas ventas sean.
+    """
+    _sumar_por_dia(ventas, 1)
+
+
+def descontar_anuladas(anuladas):
+    """
+    Como `sumar_ventas`, para descontar del resumen varias ventas anuladas.
+    """
+    _sumar_por_dia(anuladas, -1)
+
+
+def _sumar_por_dia(ventas, signo):
+    por_dia = {}
+    for dia, importe, lineas in ventas:
+        cambios, cantidad_importe = por_dia.setdefault(dia, ({}, [0, 0]))
+        for producto_id, (cantidad, precio) in lineas.items():
+            unidades, ingresos, cuantas = cambios.get(producto_id, (0, 0, 0))
+            cambios[producto_id] = (
+                unidades + signo * cantidad, ingresos + signo * cantidad * precio, cuantas + signo,
+            )
+        cantidad_importe[0] += 1
+        cantidad_importe[1] += importe
+    for dia, (cambios, (cantidad, importe)) in por_dia.items():
+        _sumar_al_resumen(dia, cambios, {
+            'ventas': signo * cantidad,
+            'unidades': sum(cambio[0] for cambio in cambios.values()),
+            'ingresos': sum(cambio[1] for cambio in cambios.values()),
+            # Las anuladas se cuentan aparte, con su importe.
+            'anuladas': cantidad if signo < 0 else 0,
+            'importe_anulado': importe if signo < 0 else 0,
+        })
+
+
+def _sumar_al_resumen(dia, cambios, total):
+    # `cambios` es {id de producto: (unidades, ingresos, ventas)} y `total` los
+    # campos de TotalVentaDiaria, todo como diferencias.
+    if cambios:
+        # Primero nos aseguramos de que existan las filas y después sumamos en
+        # la base de datos: dos ventas simultáneas no se pisan el resultado.
+        ResumenVentaDiaria.objects.bulk_create(
+            [ResumenVentaDiaria(fecha=dia, producto_id=producto_id) for producto_id in cambios],
+            ignore_conflicts=True,
+        )
+        ResumenVentaDiaria.objects.filter(fecha=dia, producto_id__in=list(cambios)).update(
+            unidades=F('unidades') + _por_producto(cambios, 0, IntegerField()),
+            ingresos=F('ingresos') + _por_producto(cambios, 1, DINERO),
+            ventas=F('ventas') + _por_producto(cambios, 2, IntegerField()),
+        )
+
+    if any(total.values()):
+        TotalVentaDiaria.objects.bulk_create([TotalVentaDiaria(fecha=dia)], ignore_conflicts=True)
+        TotalVentaDiaria.objects.filter(fecha=dia).update(
+            **{campo: F(campo) + Value(valor) for campo, valor in total.items()}
+        )
+
+
+def _por_producto(cambios, posicion, campo):
+    return Case(
+        *[When(producto_id=producto_id, then=Value(cambio[posicion])) for producto_id, cambio in cambios.items()],
+        default=Value(0),
+        output_field=campo,
+    )
+
+
+def inicio_del_dia(dia):
+    # Primer instante del día `dia` en la zona horaria del sistema.
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def _rango(desde, hasta):
+    # Días locales -> [inicio de `desde`, inicio del día siguiente a `hasta`).
+    filtros = {}
+    if desde:
+        filtros['venta__fecha__gte'] = inicio_del_dia(desde)
+    if hasta:
+        filtros['venta__fecha__lt'] = inicio_del_dia(hasta + timedelta(days=1))
+    return filtros
+
+
+def _por_dias(queryset, campo, desde, hasta):
+    if desde:
+        queryset = queryset.filter(**{f'{campo}__gte': desde})
+    if hasta:
+        queryset = queryset.filter(**{f'{campo}__lte': hasta})
+    return queryset
+
+
+def _escribir_en_lotes(modelo, filas, lote):
+    escritas = 0
+    pendientes = []
+    for fila in filas:
+        pendientes.append(fila)
+        if len(pendientes) >= lote:
+            modelo.objects.bulk_create(pendientes)
+            escritas += len(pendientes)
+            pendientes = []
+    modelo.objects.bulk_create(pendientes)
+    return escritas + len(pendientes)
+
+
+def reconstruir_resumen(desde=None, hasta=None, lote=1_000):
+    """
+    Recalcula el resumen (por producto y total) de los días entre `desde` y
+    `hasta` (inclusive; sin límite si son None) a partir de las ventas y sus
+    detalles. Devuelve la cantidad de filas por día y producto escritas.
+    """
+    por_producto = (
+        DetallesVenta.objects.filter(venta__anulada=False, **_rango(desde, hasta))
+        .annotate(dia=TruncDate('venta__fecha'))
+        .order_by()
+        .values('dia', 'producto_id')
+        .annotate(
+            total_unidades=Sum('cantidad'),
+            total_ingresos=Round(Sum(F('cantidad') * F('precio_unitario')), 2, output_field=DINERO),
+            total_ventas=Count('id'),
+        )
+    )
+    filtros_ventas = {campo.replace('venta__', ''): valor for campo, valor in _rango(desde, hasta).items()}
+    por_dia = (
+        Venta.objects.filter(**filtros_ventas)
+        .annotate(dia=TruncDate('fecha'))
+        .order_by()
+        .values('dia')
+        .annotate(
+            total_ventas=Count('id', filter=Q(anulada=False)),
+            total_anuladas=Count('id', filter=Q(anulada=True)),
+            total_anulado=Sum('total', filter=Q(anulada=True), output_field=DINERO),
+        )
+    )
+
+    with transaction.atomic():
+        _por_dias(ResumenVentaDiaria.objects.all(), 'fecha', desde, hasta).delete()
+        _por_dias(TotalVentaDiaria.objects.all(), 'fecha', desde, hasta).delete()
+        escritas = _escribir_en_lotes(ResumenVentaDiaria, (
+            ResumenVentaDiaria(
+                fecha=fila['dia'],
+                producto_id=fila['producto_id'],
+                unidades=fila['total_unidades'],
+                ingresos=fila['total_ingresos'],
+                ventas=fila['total_ventas'],
+            )
+            for fila in por_producto.iterator(chunk_size=lote)
+        ), lote)
+
+        # Unidades e ingresos de cada día salen de las filas recién escritas.
+        vendido = {
+            fila['fecha']: fila
+            for fila in _por_dias(ResumenVentaDiaria.objects.all(), 'fecha', desde, hasta)
+            .values('fecha')
+            .annotate(total_unidades=Sum('unidades'), total_ingresos=Sum('ingresos', output_field=DINERO))
+            .order_by()
+        }
+        _escribir_en_lotes(TotalVentaDiaria, (
+            TotalVentaDiaria(
+                fecha=fila['dia'],
+                ventas=fila['total_ventas'],
+                unidades=vendido.get(fila['dia'], {}).get('total_unidades', 0),
+                ingresos=vendido.get(fila['dia'], {}).get('total_ingresos', 0),
+                anuladas=fila['total_anuladas'],
+                importe_anulado=fila['total_anulado'] or 0,
+            )
+            for fila in por_dia.iterator(chunk_size=lote)
+        ), lote)
+    return escritas
+
+
+def totales_del_periodo(desde, hasta):
+    """
+    Unidades e ingresos vendidos entre `desde` y `hasta` (días, inclusive).
+    """
+    totales = TotalVentaDiaria.objects.filter(fecha__range=(desde, hasta)).aggregate(
+        unidades=Sum('unidades'),
+        ingresos=Sum('ingresos', output_field=DINERO),
+    )
+    return {
+        'unidades': totales['unidades'] or 0,
+        'ingresos': Decimal(totales['ingresos'] or 0).quantize(Decimal('0.01')),
+    }
+
+
+def totales_por_dia(desde, hasta):
+    """
+    [{fecha, unidades, ingresos}] de cada día con ventas entre `desde` y `hasta`.
+    """
+    return list(
+        TotalVentaDiaria.objects.filter(fecha__range=(desde, hasta), ventas__gt=0)
+        .values('fecha', 'unidades', 'ingresos')
+        .order_by('fecha')
+    )
+
+
+def totales_por_producto(desde, hasta, limite=None):
+    """
+    [{producto_id, producto__nombre, unidades, ingresos, ventas}] entre
+    `desde` y `hasta`, de los que más facturaron a los que menos.
+    """
+    filas = (
+        ResumenVentaDiaria.objects.filter(fecha__range=(desde, hasta))
+        .values('producto_id', 'producto__nombre')
+        .annotate(unidades=Sum('unidades'), ingresos=Sum('ingresos', output_field=DINERO), ventas=Sum('ventas'))
+        .filter(unidades__gt=0)
+        .order_by('-ingresos', 'producto_id')
+    )
+    return list(filas[:limite] if limite else filas)
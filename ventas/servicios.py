@@ -0,0 +1,319 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from mi_proyecto.cache import invalidar
+from productos.busqueda import invalidar_autocompletar
+from productos.models import MovimientoStock, Producto
+from productos.stock import registrar_movimientos, registrar_movimientos_por_venta
+from tareas.cola import encolar, encolar_varias
+from .models import EnvioVenta, Venta, DetallesVenta
+from .resumen import actualizar_resumen, lineas_de
+
+
+class StockInsuficiente(Exception):
+    """
+    Se lanza cuando un producto no tiene stock suficiente para la cantidad pedida.
+    Como se lanza dentro de la transacción, la venta completa se deshace.
+    """
+
+    def __init__(self, producto, disponible):
+        self.producto = producto
+        self.disponible = disponible
+        super().__init__(f'Stock insuficiente para el producto {producto.nombre}.')
+
+
+class VentaAnulada(Exception):
+    """
+    Se lanza al editar una venta que ya está anulada (por ejemplo si otro
+    pedido la anuló mientras se editaba): su stock ya se devolvió.
+    """
+
+
+class _DescuentoIncompleto(Exception):
+    pass
+
+
+def _por_producto(cantidades):
+    # CASE WHEN id = ... THEN cantidad ... END, para mover el stock de varios
+    # productos en una sola sentencia.
+    return Case(*[When(pk=producto_id, then=Value(cantidad)) for producto_id, cantidad in cantidades.items()])
+
+
+def descontar_stock(productos, cantidades):
+    """
+    Descuenta stock de varios productos con un único UPDATE condicional
+    (`stock >= cantidad` para cada uno), así dos ventas simultáneas nunca
+    pueden dejar el stock en negativo.
+    `productos` es el diccionario {id: Producto} ya cargado y `cantidades`
+    es {id de producto: cantidad a descontar}.
+    """
+    if not cantidades:
+        return
+    condicion = Q()
+    for producto_id, cantidad in cantidades.items():
+        condicion |= Q(pk=producto_id, stock__gte=cantidad)
+
+    try:
+        with transaction.atomic():
+            descontados = Producto.objects.filter(condicion).update(
+                stock=F('stock') - _por_producto(cantidades),
+                actualizado_en=timezone.now(),
+            )
+            if descontados != len(cantidades):
+                # Deshacemos el descuento parcial para poder ver el stock original.
+                raise _DescuentoIncompleto
+            # update() no dispara señales: el autocompletado mostraría stock viejo.
+            transaction.on_commit(invalidar_autocompletar)
+    except _DescuentoIncompleto:
+        stocks = dict(Producto.objects.filter(pk__in=list(cantidades)).values_list('pk', 'stock'))
+        for producto_id, cantidad in cantidades.items():
+            if stocks.get(producto_id, 0) < cantidad:
+                raise StockInsuficiente(productos[producto_id], stocks.get(producto_id, 0))
+        raise Producto.DoesNotExist('Uno de los productos seleccionados no existe.')
+
+
+def reponer_stock(cantidades):
+    """
+    Devuelve stock a varios productos ({id de producto: cantidad}) sumando
+    directamente en la base de datos, en una sola sentencia.
+    """
+    if not cantidades:
+        return
+    Producto.objects.filter(pk__in=list(cantidades)).update(
+        stock=F('stock') + _por_producto(cantidades),
+        actualizado_en=timezone.now(),
+    )
+    transaction.on_commit(invalidar_autocompletar)
+
+
+def _vigentes_desde():
+    return timezone.now() - timedelta(hours=settings.VENTAS_VIGENCIA_CLAVE_HORAS)
+
+
+def venta_enviada(clave):
+    """
+    Venta registrada con la clave de idempotencia `clave`, o None si no hay
+    ninguna vigente.
+    """
+    envio = EnvioVenta.objects.select_related('venta').filter(clave=clave, creado_en__gte=_vigentes_desde()).first()
+    return envio.venta if envio else None
+
+
+def purgar_envios():
+    """
+    Borra las claves de idempotencia vencidas. Devuelve cuántas borró.
+    """
+    borradas, _ = EnvioVenta.objects.filter(creado_en__lt=_vigentes_desde()).delete()
+    return borradas
+
+
+def registrar_venta(cliente, cantidades, clave=None):
+    """
+    Registra una venta completa en una sola transacción.
+    `cantidades` es un diccionario {id de producto: cantidad}. Si algún producto
+    no existe o no tiene stock, no se guarda nada.
+    La cantidad de consultas es la misma para una venta de 1 o de 100 productos.
+
+    `clave` es la clave de idempotencia del formulario: si ya se registró una
+    venta con esa clave (un doble clic, un reintento de la red) se devuelve esa
+    venta y no se escribe nada.
+    """
+    if clave:
+        anterior = venta_enviada(clave)
+        if anterior is not None:
+            return anterior
+    try:
+        return _registrar_venta(cliente, cantidades, clave)
+    except (IntegrityError, StockInsuficiente):
+        if not clave:
+            raise
+        # Un envío simultáneo con la misma clave se registró primero (y el stock
+        # que faltó puede ser el que se llevó): esta transacción ya se deshizo.
+        anterior = venta_enviada(clave)
+        if anterior is not None:
+            return anterior
+        # La clave existía pero estaba vencida: desde ahora es una venta nueva.
+        if EnvioVenta.objects.filter(clave=clave, creado_en__lt=_vigentes_desde()).delete()[0]:
+            return _registrar_venta(cliente, cantidades, clave)
+        raise
+
+
+def _registrar_venta(cliente, cantidades, clave):
+    with transaction.atomic():
+        # Traemos todos los productos en una sola consulta (id IN ...), bloqueando
+        # sus filas en los motores que lo soportan.
+        productos = Producto.objects.select_for_update().in_bulk(list(cantidades))
+        if len(productos) != len(cantidades):
+            raise Producto.DoesNotExist('Uno de los productos seleccionados no existe.')
+
+        descontar_stock(productos, cantidades)
+
+        detalles = [
+            DetallesVenta(producto=productos[producto_id], cantidad=cantidad, precio_unitario=productos[producto_id].precio)
+            for producto_id, cantidad in cantidades.items()
+        ]
+        venta = Venta.objects.create(cliente=cliente, total=sum(detalle.subtotal for detalle in detalles))
+        if clave:
+            # Índice único: un reenvío simultáneo con la misma clave falla acá.
+            EnvioVenta.objects.create(clave=clave, venta=venta)
+        for detalle in detalles:
+            detalle.venta = venta
+        DetallesVenta.objects.bulk_create(detalles)
+        registrar_movimientos(
+            {producto_id: -cantidad for producto_id, cantidad in cantidades.items()},
+            MovimientoStock.VENTA,
+            venta=venta,
+        )
+        actualizar_resumen(venta, {}, lineas_de(detalles), ventas=1)
+    return venta
+
+
+def actualizar_venta(venta, cliente, cantidades):
+    """
+    Actualiza una venta existente comparando sus detalles actuales con las
+    nuevas `cantidades` ({id de producto: cantidad}).
+    Solo se insertan, modifican o borran los detalles que cambiaron, y el stock
+    de cada producto se ajusta una sola vez por la diferencia. Los detalles que
+    se mantienen conservan el precio con el que se vendieron. Lanza
+    VentaAnulada si la venta está anulada.
+    """
+    with transaction.atomic():
+        # Se bloquea la venta y la diferencia se calcula con sus detalles de ahora,
+        # no con los que leyó la vista: así una anulación o una edición a la vez
+        # no devuelve ni descuenta el stock dos veces.
+        if Venta.objects.select_for_update().values_list('anulada', flat=True).get(pk=venta.pk):
+            venta.anulada = True
+            raise VentaAnulada(f'La venta {venta.pk} está anulada: no se puede editar.')
+        anteriores = {detalle.producto_id: detalle for detalle in DetallesVenta.objects.filter(venta_id=venta.pk)}
+        lineas_anteriores = lineas_de(anteriores.values())
+
+        diferencias = {}
+        for producto_id in anteriores.keys() | cantidades.keys():
+            anterior = anteriores[producto_id].cantidad if producto_id in anteriores else 0
+            diferencia = cantidades.get(producto_id, 0) - anterior
+            if diferencia:
+                diferencias[producto_id] = diferencia
+
+        # Solo traemos (y bloqueamos) los productos cuyo stock cambia.
+        productos = Producto.objects.select_for_update().in_bulk(list(diferencias))
+        if len(productos) != len(diferencias):
+            raise Producto.DoesNotExist('Uno de los productos seleccionados no existe.')
+
+        try:
+            descontar_stock(productos, {pid: dif for pid, dif in diferencias.items() if dif > 0})
+        except StockInsuficiente as error:
+            # Lo que ya tenía la venta también está disponible para ella.
+            anterior = anteriores.get(error.producto.pk)
+            error.disponible += anterior.cantidad if anterior else 0
+            raise
+        reponer_stock({pid: -dif for pid, dif in diferencias.items() if dif < 0})
+        registrar_movimientos(
+            {pid: -dif for pid, dif in diferencias.items()}, MovimientoStock.EDICION_VENTA, venta=venta,
+        )
+
+        borrar = [anteriores[pid].pk for pid in anteriores if pid not in cantidades]
+        modificar = []
+        nuevos = []
+        for producto_id, cantidad in cantidades.items():
+            if producto_id not in anteriores:
+                nuevos.append(DetallesVenta(
+                    venta=venta,
+                    producto=productos[producto_id],
+                    cantidad=cantidad,
+                    precio_unitario=productos[producto_id].precio,
+                ))
+            elif anteriores[producto_id].cantidad != cantidad:
+                detalle = anteriores[producto_id]
+                detalle.cantidad = cantidad
+                modificar.append(detalle)
+
+        if borrar:
+            DetallesVenta.objects.filter(pk__in=borrar).delete()
+        if modificar:
+            DetallesVenta.objects.bulk_update(modificar, ['cantidad'])
+        if nuevos:
+            DetallesVenta.objects.bulk_create(nuevos)
+
+        detalles = [anteriores[pid] for pid in anteriores if pid in cantidades] + nuevos
+        venta.cliente = cliente
+        venta.total = sum(detalle.subtotal for detalle in detalles)
+        venta.save(update_fields=['cliente', 'total'])
+        actualizar_resumen(venta, lineas_anteriores, lineas_de(detalles))
+    return venta
+
+
+def anular_venta(venta):
+    """
+    Marca la venta como anulada y devuelve su stock. El descuento del resumen
+    diario se encola (ver ventas/tareas.py): con TAREAS_EN_SEGUNDO_PLANO lo
+    hace el trabajador de la cola, fuera de la solicitud. Anular una venta ya
+    anulada no cambia nada.
+    """
+    with transaction.atomic():
+        # UPDATE condicional: si dos pedidos anulan a la vez, solo uno descuenta.
+        if Venta.objects.filter(pk=venta.pk, anulada=False).update(anulada=True):
+            detalles = list(venta.detallesventa_set.all())
+            devueltas = {}
+            for detalle in detalles:
+                devueltas[detalle.producto_id] = devueltas.get(detalle.producto_id, 0) + detalle.cantidad
+            reponer_stock(devueltas)
+            registrar_movimientos(devueltas, MovimientoStock.ANULACION, venta=venta)
+            encolar('ventas.descontar_anuladas', **_descuento(venta.pk, venta.fecha, venta.total, lineas_de(detalles)))
+            # update() no dispara post_save (ver ventas/signals.py).
+            invalidar('ventas')
+        venta.anulada = True
+    return venta
+
+
+def anular_ventas(ids):
+    """
+    Anula de una vez las ventas `ids` que no estaban anuladas y devuelve
+    cuántas anuló. Son unas pocas consultas sin importar cuántas ventas
+    sean: un solo UPDATE para marcarlas, otro para devolver el stock sumado
+    por producto y una sola tanda de movimientos y de tareas del resumen.
+    """
+    with transaction.atomic():
+        # Se bloquean para que otro pedido no las anule a la vez y se devuelva el stock dos veces.
+        ventas = {
+            venta_id: (fecha, total)
+            for venta_id, fecha, total in Venta.objects.select_for_update()
+            .filter(pk__in=ids, anulada=False).values_list('pk', 'fecha', 'total')
+        }
+        if not ventas:
+            return 0
+        Venta.objects.filter(pk__in=list(ventas)).update(anulada=True)
+
+        detalles = {venta_id: [] for venta_id in ventas}
+        for detalle in DetallesVenta.objects.filter(venta_id__in=list(ventas)):
+            detalles[detalle.venta_id].append(detalle)
+        devueltas = {}
+        por_venta = {}
+        for venta_id, lineas in detalles.items():
+            por_venta[venta_id] = {}
+            for detalle in lineas:
+                devueltas[detalle.producto_id] = devueltas.get(detalle.producto_id, 0) + detalle.cantidad
+                por_venta[venta_id][detalle.producto_id] = (
+                    por_venta[venta_id].get(detalle.producto_id, 0) + detalle.cantidad
+                )
+        reponer_stock(devueltas)
+        registrar_movimientos_por_venta(por_venta, MovimientoStock.ANULACION)
+        encolar_varias('ventas.descontar_anuladas', [
+            _descuento(venta_id, *ventas[venta_id], lineas_de(lineas)) for venta_id, lineas in detalles.items()
+        ])
+        invalidar('ventas')
+    return len(ventas)
+
+
+def _descuento(venta_id, fecha, total, lineas):
+    # Argumentos de la tarea ventas.descontar_anuladas: lo que hace falta de
+    # la venta tal como estaba al anularla (ver ventas/tareas.py).
+    return {
+        'venta': venta_id,
+        'dia': timezone.localdate(fecha).isoformat(),
+        'total': str(total),
+        'lineas': [[producto_id, cantidad, str(precio)] for producto_id, (cantidad, precio) in lineas.items()],
+    }
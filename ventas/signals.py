@@ -0,0 +1,14 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from mi_proyecto.cache import invalidar
+from .models import DetallesVenta, Venta
+
+
+@receiver(post_save, sender=Venta)
+@receiver(post_delete, sender=Venta)
+@receiver(post_save, sender=DetallesVenta)
+@receiver(post_delete, sender=DetallesVenta)
+def ventas_cambiaron(sender, **kwargs):
+    # Una venta también mueve el stock que muestran las listas de productos.
+    invalidar('ventas', 'productos')
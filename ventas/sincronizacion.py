@@ -0,0 +1,279 @@
+"""
+Ventas registradas en una caja sin conexión.
+
+Si se corta la conexión o el servidor tarda, la caja no pierde la venta: la
+guarda en su cola local con un id propio (un UUID) y la hora en que se hizo,
+y después manda las pendientes de a lotes a `sincronizar` (la vista
+`sincronizar_ventas`). La caja no espera al servidor para seguir cobrando.
+
+- Cada venta del lote se valida por separado: las que tienen errores se
+  rechazan con el motivo y no frenan a las demás. Las válidas se guardan
+  juntas en una sola transacción, con unas pocas consultas por lote más
+  cuatro por día en el resumen diario.
+- El id de la caja queda en `Venta.id_caja`, que es único: reenviar un lote
+  entero o en parte (por ejemplo porque no llegó la respuesta) devuelve las
+  ventas ya registradas sin duplicarlas.
+- Dentro del lote las ventas se aplican por hora, y por id si coinciden: el
+  resultado no depende del orden en que la caja las mandó.
+- La mercadería ya se entregó, así que una venta sin conexión no se rechaza
+  por falta de stock. El producto queda con stock cero y lo que faltó se
+  registra como un ajuste de esa misma venta (así los movimientos siguen
+  cuadrando con el stock) y se informa en el resultado para revisar el
+  inventario.
+"""
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from clientes.models import Cliente
+from mi_proyecto.cache import invalidar
+from productos.models import MovimientoStock, Producto
+from productos.stock import registrar_movimientos_por_venta
+from .models import DetallesVenta, Venta
+from .resumen import sumar_ventas
+from .servicios import StockInsuficiente, descontar_stock
+
+# Ventas que se aceptan en un lote.
+MAXIMO_POR_LOTE = 500
+# Diferencia aceptada entre el reloj de la caja y el del servidor.
+TOLERANCIA_RELOJ = timedelta(minutes=5)
+
+# Las columnas donde terminan los números que manda la caja.
+CANTIDAD = DetallesVenta._meta.get_field('cantidad')
+PRECIO = DetallesVenta._meta.get_field('precio_unitario')
+TOTAL = Venta._meta.get_field('total')
+
+REGISTRADA = 'registrada'
+REPETIDA = 'repetida'
+RECHAZADA = 'rechazada'
+
+
+class VentaInvalida(ValueError):
+    pass
+
+
+def leer_venta(datos, ahora):
+    """
+    Valida una venta tal como la manda la caja:
+    {"id": UUID, "fecha": ISO 8601, "cliente": id, "lineas": [{"producto": id,
+    "cantidad": n, "precio": "12.50"}]}; el precio es opcional (si falta se
+    usa el actual). Devuelve (id, fecha, id de cliente, {id de producto:
+    (cantidad, precio o None)}). Lanza VentaInvalida.
+    """
+    if not isinstance(datos, dict):
+        raise VentaInvalida('Cada venta tiene que ser un objeto.')
+    try:
+        id_caja = uuid.UUID(str(datos.get('id')))
+    except ValueError:
+        raise VentaInvalida('El id tiene que ser un UUID.')
+
+    try:
+        fecha = parse_datetime(str(datos.get('fecha', '')))
+    except ValueError:
+        fecha = None
+    if fecha is None:
+        raise VentaInvalida('La fecha tiene que estar en formato ISO 8601.')
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    if fecha > ahora + TOLERANCIA_RELOJ:
+        raise VentaInvalida('La fecha es posterior a la hora del servidor: revisá el reloj de la caja.')
+
+    cliente_id = datos.get('cliente')
+    if not _entero_positivo(cliente_id):
+        raise VentaInvalida('Falta el cliente.')
+
+    lineas = {}
+    if not isinstance(datos.get('lineas'), list) or not datos['lineas']:
+        raise VentaInvalida('La venta no tiene productos.')
+    for linea in datos['lineas']:
+        if not isinstance(linea, dict) or not _entero_positivo(linea.get('producto')):
+            raise VentaInvalida('Cada línea necesita un producto.')
+        if not _entero_positivo(linea.get('cantidad')):
+            raise VentaInvalida(f"La cantidad del producto {linea['producto']} tiene que ser mayor que cero.")
+        precio = None
+        if linea.get('precio') is not None:
+            precio = _leer_precio(linea['precio'])
+            if precio is None or precio < 0 or not _cabe(PRECIO, precio):
+                raise VentaInvalida(f"El precio del producto {linea['producto']} no es válido.")
+        # El mismo producto escaneado dos veces: se suman, con el primer precio.
+        cantidad, precio_anterior = lineas.get(linea['producto'], (0, precio))
+        if not _cabe(CANTIDAD, cantidad + linea['cantidad']):
+            raise VentaInvalida(f"La cantidad del producto {linea['producto']} es demasiado grande.")
+        lineas[linea['producto']] = (cantidad + linea['cantidad'], precio_anterior)
+    return id_caja, fecha, cliente_id, lineas
+
+
+def _leer_precio(valor):
+    # El precio con dos decimales, o None si no es un número finito con a lo
+    # sumo dos decimales. Uno enorme ("1e30") no se puede redondear.
+    try:
+        precio = Decimal(str(valor))
+        if precio.is_finite() and precio == round(precio, 2):
+            return round(precio, 2)
+    except InvalidOperation:
+        pass
+    return None
+
+
+def _cabe(campo, valor):
+    # Si `valor` entra en la columna de `campo`: el rango de los enteros en
+    # este motor, los dígitos de un decimal.
+    try:
+        campo.run_validators(valor)
+    except ValidationError:
+        return False
+    return True
+
+
+def _entero_positivo(valor):
+    return isinstance(valor, int) and not isinstance(valor, bool) and valor > 0
+
+
+def sincronizar(lote):
+    """
+    Registra las ventas de `lote` (la lista que manda la caja) y devuelve un
+    resultado por venta, en el mismo orden: {"id", "estado"} más "venta" (el
+    id en el servidor) si se registró o ya estaba, "faltantes" si se registró
+    ahora y "error" si se rechazó.
+    """
+    try:
+        return _sincronizar(lote)
+    except (IntegrityError, StockInsuficiente):
+        # Otro envío del mismo lote se registró a la vez (el índice único de
+        # `id_caja`), o una venta de otra caja movió el stock en un motor que no
+        # bloquea las filas: esta transacción se deshizo y se vuelve a intentar.
+        return _sincronizar(lote)
+
+
+def _sincronizar(lote):
+    ahora = timezone.now()
+    resultados = [None] * len(lote)
+    leidas = {}
+    for posicion, datos in enumerate(lote):
+        try:
+            id_caja, fecha, cliente_id, lineas = leer_venta(datos, ahora)
+        except VentaInvalida as error:
+            resultados[posicion] = {'id': datos.get('id') if isinstance(datos, dict) else None,
+                                    'estado': RECHAZADA, 'error': str(error)}
+            continue
+        leidas.setdefault(id_caja, (fecha, cliente_id, lineas, []))[3].append(posicion)
+
+    with transaction.atomic():
+        anteriores = dict(Venta.objects.filter(id_caja__in=list(leidas)).values_list('id_caja', 'pk'))
+        nuevas = {id_caja: venta for id_caja, venta in leidas.items() if id_caja not in anteriores}
+        clientes = set(Cliente.objects.filter(pk__in={venta[1] for venta in nuevas.values()}).values_list('pk', flat=True))
+        # Se bloquean para que el stock que se reparte no cambie mientras tanto.
+        productos = Producto.objects.select_for_update().in_bulk(
+            list({producto_id for venta in nuevas.values() for producto_id in venta[2]})
+        )
+
+        validas = []
+        for id_caja, (fecha, cliente_id, lineas, posiciones) in nuevas.items():
+            error = None
+            if cliente_id not in clientes:
+                error = f'No existe el cliente {cliente_id}.'
+            else:
+                faltan = sorted(producto_id for producto_id in lineas if producto_id not in productos)
+                if faltan:
+                    error = f"No existe el producto {', '.join(map(str, faltan))}."
+                elif not _cabe(TOTAL, sum(
+                    cantidad * (productos[producto_id].precio if precio is None else precio)
+                    for producto_id, (cantidad, precio) in lineas.items()
+                )):
+                    error = 'El total de la venta es demasiado grande.'
+            if error:
+                for posicion in posiciones:
+                    resultados[posicion] = {'id': str(id_caja), 'estado': RECHAZADA, 'error': error}
+            else:
+                validas.append((fecha, id_caja))
+
+        registradas = _registrar(sorted(validas), nuevas, productos)
+
+    for id_caja, venta_id in anteriores.items():
+        for posicion in leidas[id_caja][3]:
+            resultados[posicion] = {'id': str(id_caja), 'estado': REPETIDA, 'venta': venta_id}
+    for id_caja, (venta_id, faltantes) in registradas.items():
+        # Si vino dos veces en el mismo lote, la segunda es repetida.
+        primera, *repetidas = nuevas[id_caja][3]
+        resultados[primera] = {'id': str(id_caja), 'estado': REGISTRADA, 'venta': venta_id, 'faltantes': faltantes}
+        for posicion in repetidas:
+            resultados[posicion] = {'id': str(id_caja), 'estado': REPETIDA, 'venta': venta_id}
+    return resultados
+
+
+def _registrar(orden, nuevas, productos):
+    # Guarda las ventas válidas (`orden`: [(fecha, id de la caja)] ya ordenado)
+    # y devuelve {id de la caja: (id de la venta, faltantes)}.
+    if not orden:
+        return {}
+    disponible = {producto_id: producto.stock for producto_id, producto in productos.items()}
+    ventas = []
+    lineas_de_venta = []
+    faltantes = []
+    for fecha, id_caja in orden:
+        _, cliente_id, lineas, _ = nuevas[id_caja]
+        lineas = {
+            producto_id: (cantidad, productos[producto_id].precio if precio is None else precio)
+            for producto_id, (cantidad, precio) in lineas.items()
+        }
+        faltante = {}
+        for producto_id, (cantidad, _) in lineas.items():
+            tomado = min(cantidad, disponible[producto_id])
+            disponible[producto_id] -= tomado
+            if tomado < cantidad:
+                faltante[producto_id] = cantidad - tomado
+        ventas.append(Venta(
+            cliente_id=cliente_id,
+            fecha=fecha,
+            id_caja=id_caja,
+            total=sum(cantidad * precio for cantidad, precio in lineas.values()),
+        ))
+        lineas_de_venta.append(lineas)
+        faltantes.append(faltante)
+
+    descontar_stock(productos, {
+        producto_id: productos[producto_id].stock - restante
+        for producto_id, restante in disponible.items()
+        if productos[producto_id].stock != restante
+    })
+    Venta.objects.bulk_create(ventas)
+    if any(venta.pk is None for venta in ventas):
+        # MySQL no devuelve los ids de un INSERT de varias filas: se buscan por `id_caja`.
+        ids = dict(Venta.objects.filter(id_caja__in=[venta.id_caja for venta in ventas]).values_list('id_caja', 'pk'))
+        for venta in ventas:
+            venta.pk = ids[venta.id_caja]
+    DetallesVenta.objects.bulk_create([
+        DetallesVenta(venta=venta, producto_id=producto_id, cantidad=cantidad, precio_unitario=precio)
+        for venta, lineas in zip(ventas, lineas_de_venta)
+        for producto_id, (cantidad, precio) in lineas.items()
+    ])
+    registrar_movimientos_por_venta(
+        {
+            venta.pk: {producto_id: -cantidad for producto_id, (cantidad, _) in lineas.items()}
+            for venta, lineas in zip(ventas, lineas_de_venta)
+        },
+        MovimientoStock.VENTA,
+    )
+    registrar_movimientos_por_venta(
+        {venta.pk: faltante for venta, faltante in zip(ventas, faltantes) if faltante},
+        MovimientoStock.AJUSTE,
+        nota='Venta sin conexión sin stock suficiente',
+    )
+    sumar_ventas([
+        (timezone.localdate(venta.fecha), venta.total, lineas)
+        for venta, lineas in zip(ventas, lineas_de_venta)
+    ])
+    # bulk_create no dispara post_save (ver ventas/signals.py).
+    invalidar('ventas')
+    return {
+        venta.id_caja: (
+            venta.pk,
+            [{'producto': producto_id, 'cantidad': cantidad} for producto_id, cantidad in faltante.items()],
+        )
+        for venta, faltante in zip(ventas, faltantes)
+    }
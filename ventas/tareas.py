@@ -0,0 +1,26 @@
+"""
+Tareas de ventas que pueden correr fuera de la solicitud (ver tareas/cola.py).
+"""
+from datetime import date
+from decimal import Decimal
+
+from tareas.cola import tarea
+
+from .resumen import descontar_anuladas
+
+
+@tarea('ventas.descontar_anuladas', lote=True)
+def descontar_del_resumen(lote):
+    """
+    Descuenta del resumen diario las ventas anuladas del lote. Cada tarea
+    lleva el día, el total y las líneas de la venta tal como estaban al
+    anularla, así no hace falta volver a leerla.
+    """
+    descontar_anuladas([
+        (
+            date.fromisoformat(argumentos['dia']),
+            Decimal(argumentos['total']),
+            {producto_id: (cantidad, Decimal(precio)) for producto_id, cantidad, precio in argumentos['lineas']},
+        )
+        for argumentos in lote
+    ])
@@ -1,3 +1,1376 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from importlib.util import find_spec
+from io import BytesIO, StringIO
+from itertools import count
+from unittest import mock, skipUnless
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.models import Sum, Value
+from django.db.models.functions import Concat
+from django.template import Template
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime as datetime_de
+
+from clientes.models import Cliente
+from mi_proyecto.basedatos import ESPERA_MS, base_servidor, base_sqlite
+from mi_proyecto.cache import configurar_cache, version
+from mi_proyecto.metricas import PresupuestoExcedido, registro
+from productos.busqueda import buscar_productos
+from productos.models import MovimientoStock, Producto
+from tareas.models import Tarea
+from .management.commands.copiar_datos import ORIGEN
+from .informes import ingresos_por_periodo
+from .models import EnvioVenta, Venta, DetallesVenta, ResumenVentaDiaria, TotalVentaDiaria
+from .resumen import totales_del_periodo, totales_por_producto
+from .sincronizacion import sincronizar
+from .servicios import (
+    StockInsuficiente, VentaAnulada, actualizar_venta, anular_venta, anular_ventas, registrar_venta,
+)
+from .views import lista_ventas
 
 # Create your tests here.
+
+_secuencia = count(1)
+
+
+def crear_cliente(nombre='Juan', email=None):
+    return Cliente.objects.create(
+        nombre=nombre,
+        apellido='Pérez',
+        email=email or f'{nombre.lower()}{next(_secuencia)}@ejemplo.com',
+    )
+
+
+def crear_producto(nombre='Alfajor', precio='100.00', stock=10):
+    return Producto.objects.create(nombre=nombre, precio=Decimal(precio), stock=stock)
+
+
+def crear_venta(cliente, lineas, anulada=False):
+    venta = Venta.objects.create(cliente=cliente, anulada=anulada)
+    for producto, cantidad in lineas:
+        DetallesVenta.objects.create(
+            venta=venta,
+            producto=producto,
+            cantidad=cantidad,
+            precio_unitario=producto.precio,
+        )
+    venta.total = sum(producto.precio * cantidad for producto, cantidad in lineas)
+    venta.save(update_fields=['total'])
+    return venta
+
+
+class ListaVentasTests(TestCase):
+
+    def cargar_ventas(self, cantidad, anulada=False):
+        productos = [crear_producto(f'Producto {i}', precio='10.00') for i in range(5)]
+        for i in range(cantidad):
+            cliente = crear_cliente(f'Cliente{i}')
+            crear_venta(cliente, [(producto, 2) for producto in productos], anulada=anulada)
+
+    def test_lista_ventas_muestra_el_total_calculado_en_la_base(self):
+        cliente = crear_cliente()
+        crear_venta(cliente, [(crear_producto(precio='12.50'), 2), (crear_producto('Chicle', '3.00'), 1)])
+
+        respuesta = self.client.get(reverse('lista_ventas'))
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['pagina_actual'][0].total, Decimal('28.00'))
+        self.assertContains(respuesta, '$28.00')
+
+    def test_lista_ventas_cantidad_de_consultas_constante(self):
+        self.cargar_ventas(2)
+        with self.assertNumQueries(2):  # ventas + clientes, detalles + productos
+            self.client.get(reverse('lista_ventas'))
+
+        self.cargar_ventas(20)
+        with self.assertNumQueries(2):
+            self.client.get(reverse('lista_ventas'))
+
+    def test_ventas_anuladas_cantidad_de_consultas_constante(self):
+        self.cargar_ventas(20, anulada=True)
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(reverse('ventas_anuladas'))
+        self.assertEqual(respuesta.context['pagina_actual'][0].total, Decimal('100.00'))
+
+    @override_settings(TAMANIO_PAGINA={'ventas': 3})
+    def test_paginas_por_cursor_de_la_mas_nueva_a_la_mas_vieja(self):
+        cliente = crear_cliente()
+        ventas = [crear_venta(cliente, []) for _ in range(7)]
+        # Dos ventas con la misma fecha: desempata el id.
+        Venta.objects.filter(pk__in=[ventas[3].pk, ventas[4].pk]).update(fecha=ventas[3].fecha)
+
+        vistas = []
+        pagina = self.client.get(reverse('lista_ventas')).context['pagina_actual']
+        vistas += pagina.object_list
+        while pagina.has_next:
+            pagina = self.client.get(reverse('lista_ventas'), {'cursor': pagina.cursor_siguiente}).context['pagina_actual']
+            vistas += pagina.object_list
+
+        self.assertEqual([v.pk for v in vistas], [v.pk for v in reversed(ventas)])
+
+        anterior = self.client.get(reverse('lista_ventas'), {'cursor': pagina.cursor_anterior}).context['pagina_actual']
+        self.assertEqual([v.pk for v in anterior], [ventas[3].pk, ventas[2].pk, ventas[1].pk])
+        self.assertTrue(anterior.has_next)
+
+
+class CacheListasTests(TestCase):
+    """
+    Las listas se cachean por página y filtros, y se vuelven a armar en
+    cuanto cambian los datos que muestran.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = crear_cliente()
+        self.productos = [crear_producto(f'Producto {i}', stock=20) for i in range(2)]
+        self.venta = registrar_venta(self.cliente, {self.productos[0].id: 1})
+
+    def stock_en_lista(self, producto):
+        html = self.client.get(reverse('lista_productos')).content.decode()
+        return int(re.search(rf'{producto.nombre}</strong>.*?text-center">(\d+)<', html, re.S).group(1))
+
+    def stock_en_caja(self, producto):
+        resultados = self.client.get(reverse('autocompletar_productos'), {'q': 'producto'}).json()['resultados']
+        return next(resultado['stock'] for resultado in resultados if resultado['id'] == producto.id)
+
+    def test_segunda_visita_sale_del_cache(self):
+        self.client.get(reverse('lista_ventas'))
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(reverse('lista_ventas'))
+        self.assertContains(respuesta, 'Producto 0')
+
+    @override_settings(TAMANIO_PAGINA={'productos': 1})
+    def test_cada_pagina_se_cachea_aparte(self):
+        primera = self.client.get(reverse('lista_productos'))
+        cursor = primera.context['pagina_actual'].cursor_siguiente
+        segunda = self.client.get(reverse('lista_productos'), {'cursor': cursor})
+
+        self.assertNotContains(primera, 'Producto 1')
+        self.assertContains(segunda, 'Producto 1')
+
+    def test_una_venta_invalida_las_ventas_y_el_stock(self):
+        producto = self.productos[1]
+        self.client.get(reverse('lista_ventas'))
+        self.assertEqual(self.stock_en_lista(producto), 20)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('crear_venta'), {
+                'cliente': self.cliente.id, 'productos': [producto.id], f'cantidad_{producto.id}': 3,
+            })
+
+        self.assertContains(self.client.get(reverse('lista_ventas')), 'Producto 1')
+        self.assertEqual(self.stock_en_lista(producto), 17)
+
+    def test_anular_invalida_las_dos_listas(self):
+        self.assertContains(self.client.get(reverse('lista_ventas')), 'Producto 0')
+        self.client.get(reverse('ventas_anuladas'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('eliminar_venta', args=[self.venta.id]))
+
+        self.assertNotContains(self.client.get(reverse('lista_ventas')), 'Producto 0')
+        self.assertContains(self.client.get(reverse('ventas_anuladas')), 'Producto 0')
+        self.assertEqual(self.stock_en_lista(self.productos[0]), 20)
+
+    def test_la_caja_no_ve_stock_viejo(self):
+        producto = self.productos[1]
+        self.assertEqual(self.stock_en_caja(producto), 20)
+        anterior = version('productos')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venta(self.cliente, {producto.id: 5})
+
+        self.assertNotEqual(version('productos'), anterior)
+        self.assertEqual(self.stock_en_caja(producto), 15)
+
+    def test_motores_de_cache(self):
+        self.assertEqual(configurar_cache('memoria')['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(configurar_cache('redis', 'redis://cache:6379/0')['LOCATION'], 'redis://cache:6379/0')
+        with self.assertRaises(ImproperlyConfigured):
+            configurar_cache('memcached')
+
+
+class VistasAsyncTests(TestCase):
+    """
+    Las listas y la caja atienden por ASGI sin bloquear el hilo del servidor:
+    el middleware de métricas las mide igual y la venta se registra igual.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.cliente = crear_cliente('Marta')
+        self.producto = crear_producto('Turrón', stock=5)
+        crear_venta(self.cliente, [(self.producto, 1)])
+
+    async def test_listas_por_asgi(self):
+        for nombre, texto in (('lista_ventas', 'Turrón'), ('lista_productos', 'Turrón'), ('lista_clientes', 'Marta')):
+            respuesta = await self.async_client.get(reverse(nombre))
+            self.assertContains(respuesta, texto)
+            self.assertNotEqual(respuesta['X-Consultas-SQL'], '0')
+            # La segunda vez sale del cache sin consultas.
+            respuesta = await self.async_client.get(reverse(nombre))
+            self.assertEqual(respuesta['X-Consultas-SQL'], '0')
+
+    @override_settings(LISTAS_CACHE_SEGUNDOS=0, METRICAS_PRESUPUESTO_ESTRICTO=True)
+    async def test_pedidos_simultaneos_se_miden_por_separado(self):
+        # Comparten la conexión del hilo del ORM: cada uno cuenta solo sus consultas.
+        url = reverse('lista_productos')
+        sola = await self.async_client.get(url)
+        respuestas = await asyncio.gather(*(AsyncClient().get(url) for _ in range(5)))
+        for respuesta in respuestas:
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertEqual(respuesta['X-Consultas-SQL'], sola['X-Consultas-SQL'])
+
+    async def test_busquedas_de_la_caja(self):
+        respuesta = await self.async_client.get(
+            reverse('crear_venta'), {'buscar_cliente': 'mar', 'buscar_producto': 'turr'},
+        )
+        self.assertEqual([c.id for c in respuesta.context['clientes']], [self.cliente.id])
+        self.assertEqual([p.id for p in respuesta.context['productos']], [self.producto.id])
+
+    async def test_registrar_venta_por_asgi(self):
+        respuesta = await self.async_client.post(reverse('crear_venta'), {
+            'cliente': self.cliente.id, 'productos': [self.producto.id], f'cantidad_{self.producto.id}': 2,
+        })
+        self.assertRedirects(respuesta, reverse('lista_ventas'), fetch_redirect_response=False)
+        await self.producto.arefresh_from_db()
+        self.assertEqual(self.producto.stock, 3)
+
+    async def test_sin_stock_vuelve_al_formulario(self):
+        respuesta = await self.async_client.post(reverse('crear_venta'), {
+            'cliente': self.cliente.id, 'productos': [self.producto.id], f'cantidad_{self.producto.id}': 9,
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['productos_seleccionados'], [str(self.producto.id)])
+        self.assertEqual(await Venta.objects.acount(), 1)
+
+
+class TotalVentaTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(precio='12.50', stock=10)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=10)
+
+    def test_crear_venta_guarda_el_total(self):
+        self.client.post(reverse('crear_venta'), {
+            'cliente': self.cliente.id,
+            'productos': [self.alfajor.id, self.chicle.id],
+            f'cantidad_{self.alfajor.id}': 2,
+            f'cantidad_{self.chicle.id}': 3,
+        })
+
+        venta = Venta.objects.get()
+        self.assertEqual(venta.total, Decimal('34.00'))
+        self.assertEqual(venta.total, venta.calcular_total)
+
+    def test_editar_venta_actualiza_el_total(self):
+        venta = crear_venta(self.cliente, [(self.alfajor, 2)])
+
+        self.client.post(reverse('editar_venta', args=[venta.id]), {
+            'cliente': self.cliente.id,
+            'productos': [self.chicle.id],
+            f'cantidad_{self.chicle.id}': 1,
+        })
+
+        venta.refresh_from_db()
+        self.assertEqual(venta.total, Decimal('3.00'))
+
+    def test_str_no_carga_los_detalles(self):
+        venta = Venta.objects.select_related('cliente').get(pk=crear_venta(self.cliente, [(self.alfajor, 2)]).pk)
+        with self.assertNumQueries(0):
+            self.assertIn('Total: $25.00', str(venta))
+
+    def test_recalcular_totales_verifica_y_reconstruye(self):
+        venta = crear_venta(self.cliente, [(self.alfajor, 2), (self.chicle, 1)])
+        Venta.objects.filter(pk=venta.pk).update(total=0)
+
+        with self.assertRaises(CommandError):
+            call_command('recalcular_totales', '--verificar', stdout=StringIO())
+
+        call_command('recalcular_totales', stdout=StringIO())
+        venta.refresh_from_db()
+        self.assertEqual(venta.total, Decimal('28.00'))
+        call_command('recalcular_totales', '--verificar', stdout=StringIO())
+
+
+class RegistrarVentaTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(stock=5)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=1)
+
+    def test_descuenta_stock_y_guarda_detalles(self):
+        venta = registrar_venta(self.cliente, {self.alfajor.id: 2, self.chicle.id: 1})
+
+        self.alfajor.refresh_from_db()
+        self.chicle.refresh_from_db()
+        self.assertEqual((self.alfajor.stock, self.chicle.stock), (3, 0))
+        self.assertEqual(venta.detallesventa_set.count(), 2)
+        self.assertEqual(venta.total, Decimal('203.00'))
+
+    def test_sin_stock_no_guarda_nada(self):
+        with self.assertRaises(StockInsuficiente):
+            registrar_venta(self.cliente, {self.alfajor.id: 2, self.chicle.id: 2})
+
+        self.alfajor.refresh_from_db()
+        self.assertEqual(self.alfajor.stock, 5)
+        self.assertFalse(Venta.objects.exists())
+        self.assertFalse(DetallesVenta.objects.exists())
+
+    def test_vista_informa_el_stock_insuficiente(self):
+        respuesta = self.client.post(reverse('crear_venta'), {
+            'cliente': self.cliente.id,
+            'productos': [self.chicle.id],
+            f'cantidad_{self.chicle.id}': 3,
+        })
+
+        self.assertContains(respuesta, 'Stock insuficiente para el producto Chicle.')
+        self.assertFalse(Venta.objects.exists())
+
+
+class VentaIdempotenteTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(stock=5)
+
+    def test_un_reenvio_devuelve_la_venta_sin_escribir(self):
+        venta = registrar_venta(self.cliente, {self.alfajor.id: 2}, clave='abc')
+        with self.assertNumQueries(1):
+            repetida = registrar_venta(self.cliente, {self.alfajor.id: 2}, clave='abc')
+
+        self.assertEqual(repetida, venta)
+        self.alfajor.refresh_from_db()
+        self.assertEqual(self.alfajor.stock, 3)
+        self.assertEqual(Venta.objects.count(), 1)
+        # Sin clave (o con otra) es otra venta.
+        registrar_venta(self.cliente, {self.alfajor.id: 1}, clave='def')
+        registrar_venta(self.cliente, {self.alfajor.id: 1})
+        self.assertEqual(Venta.objects.count(), 3)
+
+    def test_doble_envio_del_formulario(self):
+        clave = self.client.get(reverse('crear_venta')).context['clave']
+        datos = {
+            'clave': clave,
+            'cliente': self.cliente.id,
+            'productos': [self.alfajor.id],
+            f'cantidad_{self.alfajor.id}': 5,
+        }
+        for _ in range(2):
+            self.assertRedirects(self.client.post(reverse('crear_venta'), datos), reverse('lista_ventas'))
+
+        self.assertEqual(Venta.objects.count(), 1)
+        self.assertEqual(MovimientoStock.objects.filter(tipo=MovimientoStock.VENTA).count(), 1)
+        self.assertNotEqual(self.client.get(reverse('crear_venta')).context['clave'], clave)
+
+    @override_settings(VENTAS_VIGENCIA_CLAVE_HORAS=24)
+    def test_las_claves_vencen(self):
+        registrar_venta(self.cliente, {self.alfajor.id: 1}, clave='abc')
+        registrar_venta(self.cliente, {self.alfajor.id: 1}, clave='vieja')
+        EnvioVenta.objects.update(creado_en=timezone.now() - timedelta(hours=25))
+
+        # Vencida, la misma clave registra una venta nueva.
+        registrar_venta(self.cliente, {self.alfajor.id: 1}, clave='abc')
+        self.assertEqual(Venta.objects.count(), 3)
+        salida = StringIO()
+        call_command('purgar_envios', stdout=salida)
+        self.assertIn('1 clave(s)', salida.getvalue())
+        self.assertEqual(list(EnvioVenta.objects.values_list('clave', flat=True)), ['abc'])
+
+
+class VentasGrandesTests(TestCase):
+    """
+    La cantidad de idas y vueltas a la base no debe crecer con la cantidad de
+    productos de la venta (ventas mayoristas de 100+ líneas).
+    """
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.productos = [crear_producto(f'Producto {i}', stock=1000) for i in range(150)]
+
+    def consultas_para(self, lineas):
+        cantidades = {producto.id: 2 for producto in self.productos[:lineas]}
+        with CaptureQueriesContext(connection) as consultas:
+            registrar_venta(self.cliente, cantidades)
+        return len(consultas)
+
+    def test_consultas_constantes_al_crecer_la_venta(self):
+        consultas = {lineas: self.consultas_para(lineas) for lineas in (1, 10, 50, 150)}
+
+        self.assertEqual(len(set(consultas.values())), 1, consultas)
+        self.assertEqual(DetallesVenta.objects.count(), 1 + 10 + 50 + 150)
+
+    def test_vista_crear_venta_consultas_constantes(self):
+        def postear(productos):
+            datos = {'cliente': self.cliente.id, 'productos': [p.id for p in productos]}
+            datos.update({f'cantidad_{p.id}': 1 for p in productos})
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.post(reverse('crear_venta'), datos)
+            return len(consultas)
+
+        self.assertEqual(postear(self.productos[:2]), postear(self.productos[:120]))
+
+    def test_sin_stock_informa_el_producto_correcto(self):
+        Producto.objects.filter(pk=self.productos[7].pk).update(stock=1)
+
+        with self.assertRaises(StockInsuficiente) as contexto:
+            registrar_venta(self.cliente, {producto.id: 2 for producto in self.productos[:10]})
+
+        self.assertEqual(contexto.exception.producto, self.productos[7])
+        self.assertEqual(contexto.exception.disponible, 1)
+        self.assertEqual(Producto.objects.filter(stock=1000).count(), 149)
+
+
+class ActualizarVentaTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(stock=10)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=10)
+        self.turron = crear_producto('Turrón', precio='50.00', stock=10)
+        self.venta = registrar_venta(self.cliente, {self.alfajor.id: 2, self.chicle.id: 4})
+
+    def stock(self, producto):
+        producto.refresh_from_db()
+        return producto.stock
+
+    def test_ajusta_solo_lo_que_cambio(self):
+        chicle_original = self.venta.detallesventa_set.get(producto=self.chicle)
+
+        actualizar_venta(self.venta, self.cliente, {self.chicle.id: 1, self.turron.id: 3})
+
+        self.assertEqual(self.stock(self.alfajor), 10)  # se quitó de la venta, vuelve el stock
+        self.assertEqual(self.stock(self.chicle), 9)
+        self.assertEqual(self.stock(self.turron), 7)
+        chicle = self.venta.detallesventa_set.get(producto=self.chicle)
+        self.assertEqual((chicle.pk, chicle.cantidad), (chicle_original.pk, 1))
+        self.venta.refresh_from_db()
+        self.assertEqual(self.venta.total, Decimal('153.00'))
+        self.assertEqual(self.venta.total, self.venta.calcular_total)
+
+    def test_sin_cambios_no_toca_productos_ni_detalles(self):
+        # savepoint, bloquear la venta, detalles actuales, guardar la venta, liberar savepoint
+        with self.assertNumQueries(5):
+            actualizar_venta(self.venta, self.cliente, {self.alfajor.id: 2, self.chicle.id: 4})
+
+    def test_anulada_mientras_se_editaba(self):
+        # La vista la leyó activa y otro pedido la anuló antes de guardar.
+        leida = Venta.objects.get(pk=self.venta.pk)
+        anular_venta(self.venta)
+        with self.assertRaises(VentaAnulada):
+            actualizar_venta(leida, self.cliente, {self.alfajor.id: 5})
+        # El stock quedó como lo dejó la anulación: no se descontó de nuevo.
+        self.assertEqual(self.stock(self.alfajor), 10)
+        self.assertEqual(self.venta.detallesventa_set.get(producto=self.alfajor).cantidad, 2)
+
+    def test_stock_disponible_incluye_lo_ya_vendido(self):
+        with self.assertRaises(StockInsuficiente) as contexto:
+            actualizar_venta(self.venta, self.cliente, {self.alfajor.id: 11})
+
+        self.assertEqual(contexto.exception.disponible, 10)
+        self.assertEqual(self.stock(self.alfajor), 8)
+        self.assertEqual(self.venta.detallesventa_set.count(), 2)
+
+
+class MovimientosDeVentaTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(stock=10)
+        self.chicle = crear_producto('Chicle', stock=10)
+
+    def movimientos(self):
+        return list(MovimientoStock.objects.order_by('id').values_list('tipo', 'producto_id', 'cantidad'))
+
+    def stock(self):
+        return dict(Producto.objects.values_list('id', 'stock'))
+
+    def test_vender_editar_y_anular_quedan_registrados(self):
+        a, c = self.alfajor.id, self.chicle.id
+        venta = registrar_venta(self.cliente, {a: 2, c: 1})
+        actualizar_venta(venta, self.cliente, {a: 3})
+        anular_venta(venta)
+        anular_venta(venta)  # La segunda vez no devuelve de nuevo.
+
+        self.assertEqual(self.movimientos(), [
+            ('venta', a, -2), ('venta', c, -1),
+            ('edicion_venta', a, -1), ('edicion_venta', c, 1),
+            ('anulacion', a, 3),
+        ])
+        self.assertEqual(set(MovimientoStock.objects.values_list('venta_id', flat=True)), {venta.id})
+        # Anular devuelve el stock.
+        self.assertEqual(self.stock(), {a: 10, c: 10})
+
+        # Una venta anulada ya no se edita: su stock ya se devolvió.
+        with self.assertRaises(VentaAnulada):
+            actualizar_venta(venta, self.cliente, {c: 4})
+        self.assertEqual(self.stock(), {a: 10, c: 10})
+        self.assertEqual(len(self.movimientos()), 5)
+
+    def test_una_venta_sin_stock_no_registra_movimientos(self):
+        with self.assertRaises(StockInsuficiente):
+            registrar_venta(self.cliente, {self.alfajor.id: 1, self.chicle.id: 11})
+        self.assertEqual(self.movimientos(), [])
+
+
+class ResumenDiarioTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(precio='12.50', stock=50)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=50)
+        self.hoy = timezone.localdate()
+
+    def resumen(self):
+        return {
+            fila.producto_id: (fila.unidades, fila.ingresos, fila.ventas)
+            for fila in ResumenVentaDiaria.objects.order_by('fecha', 'producto_id')
+            if fila.unidades or fila.ventas
+        }
+
+    def totales(self):
+        return list(TotalVentaDiaria.objects.values_list(
+            'fecha', 'ventas', 'unidades', 'ingresos', 'anuladas', 'importe_anulado',
+        ))
+
+    def test_registrar_editar_y_anular_actualizan_el_resumen(self):
+        a, c = self.alfajor.id, self.chicle.id
+        venta = registrar_venta(self.cliente, {a: 2, c: 1})
+        registrar_venta(self.cliente, {a: 1})
+        self.assertEqual(self.resumen(), {a: (3, Decimal('37.50'), 2), c: (1, Decimal('3.00'), 1)})
+
+        actualizar_venta(venta, self.cliente, {c: 4})
+        self.assertEqual(self.resumen(), {a: (1, Decimal('12.50'), 1), c: (4, Decimal('12.00'), 1)})
+
+        anular_venta(venta)
+        anular_venta(venta)  # La segunda vez no descuenta de nuevo.
+        self.assertEqual(self.resumen(), {a: (1, Decimal('12.50'), 1)})
+
+    def test_la_vista_de_anular_descuenta_del_resumen(self):
+        venta = registrar_venta(self.cliente, {self.alfajor.id: 2})
+        self.client.post(reverse('eliminar_venta', args=[venta.id]))
+        venta.refresh_from_db()
+        self.assertTrue(venta.anulada)
+        self.assertEqual(self.resumen(), {})
+
+    @override_settings(TAREAS_EN_SEGUNDO_PLANO=True)
+    def test_con_la_cola_el_trabajador_descuenta_las_anuladas(self):
+        primera = registrar_venta(self.cliente, {self.alfajor.id: 2})
+        segunda = registrar_venta(self.cliente, {self.alfajor.id: 1, self.chicle.id: 3})
+        self.client.post(reverse('eliminar_venta', args=[primera.id]))
+        self.client.post(reverse('eliminar_venta', args=[segunda.id]))
+        # El stock vuelve enseguida; el resumen espera al trabajador.
+        self.alfajor.refresh_from_db()
+        self.assertEqual(self.alfajor.stock, 50)
+        self.assertEqual(len(self.resumen()), 2)
+
+        # Las dos son del mismo día: se descuentan juntas, con las consultas de una.
+        with self.assertNumQueries(12):  # Tomar 4 + savepoint 2 + resumen 4 + marcarlas 1 + buscar más 1.
+            call_command('procesar_tareas', '--una-vez', stdout=StringIO())
+        self.assertEqual(self.resumen(), {})
+        self.assertEqual(self.totales()[0][4], 2)
+
+    def test_el_resumen_incremental_coincide_con_la_reconstruccion(self):
+        a, c = self.alfajor.id, self.chicle.id
+        primera = registrar_venta(self.cliente, {a: 2, c: 5})
+        segunda = registrar_venta(self.cliente, {c: 1})
+        actualizar_venta(primera, self.cliente, {a: 1, c: 5})
+        actualizar_venta(segunda, self.cliente, {a: 3})
+        anular_venta(registrar_venta(self.cliente, {a: 7}))
+        incremental = self.resumen()
+        totales = self.totales()
+        self.assertEqual(totales, [(self.hoy, 2, 9, Decimal('65.00'), 1, Decimal('87.50'))])
+
+        call_command('reconstruir_resumen', stdout=StringIO())
+        self.assertEqual(self.resumen(), incremental)
+        self.assertEqual(self.totales(), totales)
+
+    def test_reconstruir_un_rango_no_toca_los_demas_dias(self):
+        venta = registrar_venta(self.cliente, {self.alfajor.id: 2})
+        hace_diez_dias = self.hoy - timedelta(days=10)
+        # La venta se mueve "a mano": el resumen de hoy queda desactualizado.
+        Venta.objects.filter(pk=venta.pk).update(fecha=venta.fecha - timedelta(days=10))
+
+        call_command('reconstruir_resumen', desde=str(hace_diez_dias), hasta=str(hace_diez_dias), stdout=StringIO())
+        self.assertEqual(
+            list(ResumenVentaDiaria.objects.order_by('fecha').values_list('fecha', 'unidades')),
+            [(hace_diez_dias, 2), (self.hoy, 2)],
+        )
+
+        call_command('reconstruir_resumen', stdout=StringIO())
+        self.assertEqual(list(ResumenVentaDiaria.objects.values_list('fecha', 'unidades')), [(hace_diez_dias, 2)])
+
+        with self.assertRaises(CommandError):
+            call_command('reconstruir_resumen', desde='2024-02-30', stdout=StringIO())
+
+    def test_informes_leen_solo_el_resumen(self):
+        registrar_venta(self.cliente, {self.alfajor.id: 2, self.chicle.id: 1})
+        registrar_venta(self.cliente, {self.chicle.id: 10})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                totales_del_periodo(self.hoy, self.hoy),
+                {'unidades': 13, 'ingresos': Decimal('58.00')},
+            )
+        with self.assertNumQueries(1):
+            por_producto = totales_por_producto(self.hoy - timedelta(days=30), self.hoy)
+        self.assertEqual(
+            [(fila['producto__nombre'], fila['unidades'], fila['ventas']) for fila in por_producto],
+            [('Chicle', 11, 2), ('Alfajor', 2, 1)],
+        )
+
+
+class AnulacionMasivaTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(precio='12.50', stock=50)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=50)
+
+    def vender(self, cantidad):
+        return [
+            registrar_venta(self.cliente, {self.alfajor.id: 1 + numero % 2, self.chicle.id: 2}).pk
+            for numero in range(cantidad)
+        ]
+
+    def test_anula_todas_juntas_y_devuelve_el_stock_sumado(self):
+        ids = self.vender(4)
+        anular_venta(Venta.objects.get(pk=ids[0]))
+        respuesta = self.client.post(reverse('eliminar_ventas'), {'ids': [*ids, 'x', 9999]})
+        self.assertRedirects(respuesta, reverse('lista_ventas'))
+
+        self.assertEqual(Venta.objects.filter(anulada=False).count(), 0)
+        self.assertEqual(dict(Producto.objects.values_list('nombre', 'stock')), {'Alfajor': 50, 'Chicle': 50})
+        # Cada venta tiene su movimiento, y la que ya estaba anulada no devuelve dos veces.
+        anulaciones = MovimientoStock.objects.filter(tipo=MovimientoStock.ANULACION)
+        self.assertEqual(sorted(anulaciones.values_list('venta_id', flat=True).distinct()), ids)
+        self.assertEqual(anulaciones.aggregate(total=Sum('cantidad'))['total'], 6 + 8)
+        self.assertEqual(
+            list(TotalVentaDiaria.objects.values_list('ventas', 'unidades', 'anuladas')), [(0, 0, 4)],
+        )
+        self.assertFalse(ResumenVentaDiaria.objects.exclude(unidades=0).exists())
+        self.assertEqual(anular_ventas(ids), 0)
+
+    def test_las_consultas_no_crecen_con_la_cantidad(self):
+        pocas, muchas = self.vender(2), self.vender(20)
+        with CaptureQueriesContext(connection) as con_pocas:
+            self.assertEqual(anular_ventas(pocas), 2)
+        with CaptureQueriesContext(connection) as con_muchas:
+            self.assertEqual(anular_ventas(muchas), 20)
+        self.assertEqual(len(con_pocas), len(con_muchas))
+
+    @override_settings(TAREAS_EN_SEGUNDO_PLANO=True)
+    def test_con_la_cola_encola_una_tarea_por_venta(self):
+        ids = self.vender(3)
+        anular_ventas(ids)
+        self.assertEqual(Tarea.objects.filter(nombre='ventas.descontar_anuladas').count(), 3)
+        call_command('procesar_tareas', '--una-vez', stdout=StringIO())
+        self.assertEqual(list(TotalVentaDiaria.objects.values_list('ventas', 'anuladas')), [(0, 3)])
+
+
+class SincronizacionTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto(precio='12.50', stock=3)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=50)
+        self.ahora = timezone.now()
+
+    def venta(self, minutos_atras, productos, **datos):
+        return {
+            'id': str(uuid.uuid4()),
+            'fecha': (self.ahora - timedelta(minutes=minutos_atras)).isoformat(),
+            'cliente': self.cliente.id,
+            'lineas': [{'producto': producto.id, 'cantidad': cantidad} for producto, cantidad in productos],
+            **datos,
+        }
+
+    def sincronizar(self, ventas):
+        respuesta = self.client.post(
+            reverse('sincronizar_ventas'), json.dumps({'ventas': ventas}), content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()['resultados']
+
+    def test_registra_por_hora_y_el_faltante_queda_como_ajuste(self):
+        # La más vieja llega última, pero se aplica primero y se lleva el stock.
+        despues = self.venta(5, [(self.alfajor, 2), (self.chicle, 1)])
+        antes = self.venta(30, [(self.alfajor, 2)])
+        antes['lineas'][0]['precio'] = '11.00'  # El precio que cobró la caja.
+        resultados = self.sincronizar([despues, antes])
+
+        self.assertEqual([r['estado'] for r in resultados], ['registrada', 'registrada'])
+        self.assertEqual(resultados[1]['faltantes'], [])
+        self.assertEqual(resultados[0]['faltantes'], [{'producto': self.alfajor.id, 'cantidad': 1}])
+        primera = Venta.objects.get(pk=resultados[1]['venta'])
+        self.assertEqual((primera.fecha, primera.total), (datetime_de(antes['fecha']), Decimal('22.00')))
+        self.assertEqual(Venta.objects.get(pk=resultados[0]['venta']).total, Decimal('28.00'))
+
+        self.alfajor.refresh_from_db()
+        self.assertEqual(self.alfajor.stock, 0)
+        # Los movimientos cuadran con lo que bajó el stock: -2, -2 y el ajuste de +1.
+        self.assertEqual(
+            sorted(self.alfajor.movimientos.values_list('tipo', 'cantidad')),
+            [('ajuste', 1), ('venta', -2), ('venta', -2)],
+        )
+        self.assertEqual(list(TotalVentaDiaria.objects.values_list('ventas', 'unidades')), [(2, 5)])
+
+    def test_reenviar_el_lote_no_duplica(self):
+        lote = [self.venta(10, [(self.chicle, 1)]), self.venta(5, [(self.chicle, 2)])]
+        primeros = self.sincronizar(lote)
+        with self.assertNumQueries(3):  # Buscarlas por id, dentro de un savepoint.
+            repetidos = sincronizar([*lote, lote[0]])
+        self.assertEqual([r['estado'] for r in repetidos], ['repetida'] * 3)
+        self.assertEqual([r['venta'] for r in repetidos], [primeros[0]['venta'], primeros[1]['venta'], primeros[0]['venta']])
+        self.assertEqual(Venta.objects.count(), 2)
+        self.assertEqual(Producto.objects.get(pk=self.chicle.pk).stock, 47)
+
+    def test_rechaza_las_invalidas_sin_frenar_las_demas(self):
+        valida = self.venta(1, [(self.chicle, 1)])
+        resultados = self.sincronizar([
+            self.venta(1, [(self.chicle, 1)], id='no-es-un-uuid'),
+            self.venta(-60, [(self.chicle, 1)]),
+            self.venta(1, [(self.chicle, 0)]),
+            self.venta(1, [(self.chicle, 1)], cliente=9999),
+            self.venta(1, [(self.chicle, 1)], lineas=[{'producto': 9999, 'cantidad': 1}]),
+            valida,
+        ])
+        self.assertEqual([r['estado'] for r in resultados], ['rechazada'] * 5 + ['registrada'])
+        self.assertIn('reloj', resultados[1]['error'])
+        self.assertIn('9999', resultados[4]['error'])
+        self.assertEqual(list(Venta.objects.values_list('id_caja', flat=True)), [uuid.UUID(valida['id'])])
+
+        respuesta = self.client.post(reverse('sincronizar_ventas'), 'no es json', content_type='application/json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_numeros_que_no_entran_en_la_base_se_rechazan_sin_frenar_las_demas(self):
+        def con_precio(precio, cantidad=1):
+            return self.venta(1, [], lineas=[{'producto': self.chicle.id, 'cantidad': cantidad, 'precio': precio}])
+
+        valida = con_precio('2.500')  # Ceros de más: es 2.50.
+        resultados = self.sincronizar([
+            con_precio('1e30'),
+            con_precio('1e20'),
+            con_precio('NaN'),
+            con_precio('2.505'),
+            self.venta(1, [(self.chicle, 10**20)]),
+            # Cada una entra, pero el total no.
+            self.venta(1, [(self.chicle, 1)], lineas=[
+                {'producto': self.chicle.id, 'cantidad': 10**9, 'precio': '99999999.99'},
+            ]),
+            valida,
+        ])
+        self.assertEqual([r['estado'] for r in resultados], ['rechazada'] * 6 + ['registrada'])
+        self.assertIn('demasiado grande', resultados[4]['error'])
+        self.assertIn('total', resultados[5]['error'])
+        detalle = DetallesVenta.objects.get()
+        self.assertEqual((detalle.venta.id_caja, detalle.precio_unitario), (uuid.UUID(valida['id']), Decimal('2.50')))
+
+    def test_las_consultas_no_crecen_con_el_lote(self):
+        with CaptureQueriesContext(connection) as con_pocas:
+            sincronizar([self.venta(1, [(self.chicle, 1)]) for _ in range(2)])
+        with CaptureQueriesContext(connection) as con_muchas:
+            sincronizar([self.venta(1, [(self.chicle, 2)]) for _ in range(20)])
+        self.assertEqual(len(con_pocas), len(con_muchas))
+
+
+class TableroTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hoy = timezone.localdate()
+        self.ana = crear_cliente('Ana')
+        self.beto = crear_cliente('Beto')
+        self.alfajor = crear_producto(precio='12.50', stock=100)
+        self.chicle = crear_producto('Chicle', precio='3.00', stock=100)
+        registrar_venta(self.ana, {self.alfajor.id: 4})                     # 50.00
+        registrar_venta(self.beto, {self.chicle.id: 10, self.alfajor.id: 1})  # 42.50
+        anular_venta(registrar_venta(self.beto, {self.chicle.id: 1}))
+
+    def test_tablero_con_paneles_calculados_en_la_base(self):
+        respuesta = self.client.get(reverse('index'))
+        self.assertEqual(respuesta.status_code, 200)
+        tablero = respuesta.context['tablero']
+
+        self.assertEqual(tablero['hoy'], {'unidades': 15, 'ingresos': Decimal('92.50')})
+        self.assertEqual(tablero['ventas']['validas']['cantidad'], 2)
+        self.assertEqual(tablero['ventas']['validas']['ticket_promedio'], Decimal('46.25'))
+        self.assertEqual(tablero['ventas']['anuladas']['cantidad'], 1)
+        self.assertEqual(tablero['ventas']['porcentaje_anuladas'], 33.3)
+        self.assertEqual([fila['producto__nombre'] for fila in tablero['productos']['unidades']], ['Chicle', 'Alfajor'])
+        self.assertEqual([fila['producto__nombre'] for fila in tablero['productos']['ingresos']], ['Alfajor', 'Chicle'])
+        self.assertEqual(
+            [(fila['puesto'], fila['cliente__nombre'], fila['gastado']) for fila in tablero['clientes']],
+            [(1, 'Ana', Decimal('50.00')), (2, 'Beto', Decimal('42.50'))],
+        )
+        self.assertEqual(tablero['por_dia'][-1]['periodo'], self.hoy)
+        self.assertEqual(tablero['por_mes'][-1]['ingresos'], Decimal('92.50'))
+        self.assertContains(respuesta, '$92.50')
+
+    def test_variacion_respecto_del_periodo_anterior(self):
+        ayer = self.hoy - timedelta(days=1)
+        TotalVentaDiaria.objects.create(fecha=ayer, ventas=1, unidades=1, ingresos=Decimal('50.00'))
+        por_dia = ingresos_por_periodo('dia', ayer)
+        self.assertEqual([fila['variacion'] for fila in por_dia], [None, Decimal('85.0')])
+
+    def test_paneles_en_cache(self):
+        self.client.get(reverse('index'))
+        with self.assertNumQueries(1):  # Solo los totales de hoy.
+            respuesta = self.client.get(reverse('index'))
+        self.assertEqual(respuesta.context['tablero']['ventas']['validas']['cantidad'], 2)
+
+        # Otro período se calcula aparte.
+        respuesta = self.client.get(reverse('index'), {'dias': 7})
+        self.assertEqual(respuesta.context['tablero']['dias'], 7)
+
+    @override_settings(TABLERO_CACHE_SEGUNDOS=0)
+    def test_sin_cache_se_recalcula(self):
+        self.client.get(reverse('index'))
+        registrar_venta(self.ana, {self.chicle.id: 1})
+        respuesta = self.client.get(reverse('index'))
+        self.assertEqual(respuesta.context['tablero']['ventas']['validas']['cantidad'], 3)
+
+    def test_periodo_invalido_usa_el_predeterminado(self):
+        for dias in ('abc', '3'):
+            with self.subTest(dias=dias):
+                respuesta = self.client.get(reverse('index'), {'dias': dias})
+                self.assertEqual(respuesta.context['tablero']['dias'], 30)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'la búsqueda con FTS5 es propia de SQLite')
+class BuscadoresVentaTests(TestCase):
+
+    def test_crear_venta_busca_sin_acentos_y_por_apellido(self):
+        crear_cliente('María')
+        crear_producto('Turrón', stock=3)
+        crear_producto('Turrón agotado', stock=0)
+
+        respuesta = self.client.get(reverse('crear_venta'), {'buscar_cliente': 'perez', 'buscar_producto': 'turron'})
+
+        self.assertEqual([c.nombre for c in respuesta.context['clientes']], ['María'])
+        self.assertEqual([p.nombre for p in respuesta.context['productos']], ['Turrón'])
+
+    def test_vender_invalida_el_autocompletado_de_productos(self):
+        cliente = crear_cliente()
+        turron = crear_producto('Turrón', stock=3)
+        url = reverse('autocompletar_productos')
+        self.assertEqual(self.client.get(url, {'q': 'turron'}).json()['resultados'][0]['stock'], 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            registrar_venta(cliente, {turron.id: 2})
+
+        self.assertEqual(self.client.get(url, {'q': 'turron'}).json()['resultados'][0]['stock'], 1)
+
+
+@override_settings(TAMANIO_PAGINA={'default': 2})
+class PlanesDeConsultaTests(TestCase):
+    """
+    Cada lista y buscador tiene que resolverse con un índice, sin recorrer
+    la tabla completa (SQLite: EXPLAIN QUERY PLAN sin "SCAN <tabla>").
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            cliente = crear_cliente(f'Cliente{i}')
+            producto = crear_producto(f'Producto {i}', stock=i)
+            crear_venta(cliente, [(producto, 1)], anulada=i % 2 == 0)
+        Cliente.objects.filter(nombre='Cliente0').update(activo=False)
+        Producto.objects.filter(nombre='Producto 0').update(activo=False)
+
+    def recorridos_completos(self, url, parametros=None):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, parametros or {})
+        self.assertEqual(respuesta.status_code, 200)
+        recorridos = []
+        with connection.cursor() as cursor:
+            for consulta in consultas.captured_queries:
+                if not consulta['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + consulta['sql'])
+                for *_, detalle in cursor.fetchall():
+                    # "SCAN tabla" sin índice; las tablas FTS se recorren con su propio índice.
+                    if re.match(r'SCAN \w+$', detalle):
+                        recorridos.append((consulta['sql'], detalle))
+        return respuesta, recorridos
+
+    def test_listas_y_buscadores_usan_indices(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN es propio de SQLite.')
+        urls = [
+            'lista_ventas', 'ventas_anuladas',
+            'lista_productos', 'productos_inactivos',
+            'lista_clientes', 'clientes_inactivos',
+        ]
+        for nombre in urls:
+            with self.subTest(nombre):
+                respuesta, recorridos = self.recorridos_completos(reverse(nombre))
+                self.assertEqual(recorridos, [])
+                cursor = respuesta.context['pagina_actual'].cursor_siguiente
+                if cursor:
+                    _, recorridos = self.recorridos_completos(reverse(nombre), {'cursor': cursor})
+                    self.assertEqual(recorridos, [])
+
+        busquedas = [
+            (reverse('crear_venta'), {'buscar_cliente': 'cliente', 'buscar_producto': 'producto'}),
+            (reverse('autocompletar_productos'), {'q': 'prod'}),
+            (reverse('autocompletar_clientes'), {'q': 'cli'}),
+        ]
+        for url, parametros in busquedas:
+            with self.subTest(url):
+                _, recorridos = self.recorridos_completos(url, parametros)
+                self.assertEqual(recorridos, [])
+
+
+@override_settings(METRICAS_PRESUPUESTO_ESTRICTO=True)
+# Los presupuestos valen para el caso sin cache: las listas se arman siempre.
+@override_settings(LISTAS_CACHE_SEGUNDOS=0)
+class MetricasTests(TestCase):
+    """
+    El middleware de métricas informa consultas y tiempos, y cada vista
+    respeta su presupuesto de consultas (en modo estricto se pasa de largo
+    con una excepción).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = crear_cliente()
+        cls.productos = [crear_producto(f'Producto {i}', stock=50) for i in range(3)]
+        cls.venta = crear_venta(cls.cliente, [(producto, 1) for producto in cls.productos])
+
+    def setUp(self):
+        registro.limpiar()
+
+    def test_encabezados_de_metricas(self):
+        respuesta = self.client.get(reverse('lista_ventas'))
+        self.assertEqual(respuesta['X-Consultas-SQL'], '2')
+        for encabezado in ('X-Tiempo-SQL-ms', 'X-Tiempo-Render-ms', 'X-Tiempo-Total-ms'):
+            self.assertGreaterEqual(float(respuesta[encabezado]), 0)
+        self.assertNotIn('X-Memoria-Pico-KB', respuesta)
+
+    def test_render_medido_sin_tocar_django(self):
+        # Lo mide el motor de plantillas configurado, no un reemplazo de Template.render.
+        self.assertEqual(Template.render.__module__, 'django.template.base')
+        respuesta = self.client.get(reverse('lista_productos'))
+        self.assertGreater(float(respuesta['X-Tiempo-Render-ms']), 0)
+
+    @override_settings(METRICAS_MEMORIA=True)
+    def test_pico_de_memoria_opcional(self):
+        respuesta = self.client.get(reverse('lista_ventas'))
+        self.assertGreaterEqual(int(respuesta['X-Memoria-Pico-KB']), 0)
+
+    def test_resumen_por_vista(self):
+        self.client.get(reverse('lista_ventas'))
+        self.client.get(reverse('lista_ventas'))
+        self.client.get(reverse('lista_productos'))
+        metricas = self.client.get(reverse('metricas')).json()['metricas']
+        self.assertEqual(metricas['lista_ventas']['solicitudes'], 2)
+        self.assertEqual(metricas['lista_ventas']['consultas_max'], 2)
+        self.assertEqual(metricas['lista_productos']['solicitudes'], 1)
+
+    def test_metricas_solo_locales(self):
+        respuesta = self.client.get(reverse('metricas'), REMOTE_ADDR='203.0.113.5')
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_vistas_dentro_del_presupuesto(self):
+        producto = self.productos[0]
+        busqueda = {'buscar_cliente': 'juan', 'buscar_producto': 'producto'}
+        pedidos = [
+            ('get', reverse('lista_ventas'), {}),
+            ('get', reverse('ventas_anuladas'), {}),
+            ('get', reverse('crear_venta'), busqueda),
+            ('get', reverse('editar_venta', args=[self.venta.id]), busqueda),
+            ('post', reverse('crear_venta'), {
+                'cliente': self.cliente.id,
+                'productos': [p.id for p in self.productos],
+                **{f'cantidad_{p.id}': 2 for p in self.productos},
+            }),
+            ('post', reverse('editar_venta', args=[self.venta.id]), {
+                'cliente': self.cliente.id, 'productos': [producto.id], f'cantidad_{producto.id}': 3,
+            }),
+            ('get', reverse('lista_productos'), {}),
+            ('get', reverse('productos_inactivos'), {}),
+            ('get', reverse('autocompletar_productos'), {'q': 'prod'}),
+            ('get', reverse('lista_clientes'), {}),
+            ('get', reverse('clientes_inactivos'), {}),
+            ('get', reverse('autocompletar_clientes'), {'q': 'ju'}),
+        ]
+        for metodo, url, datos in pedidos:
+            with self.subTest(metodo=metodo, url=url):
+                respuesta = getattr(self.client, metodo)(url, datos)
+                self.assertIn(respuesta.status_code, (200, 302))
+
+    def test_presupuesto_excedido(self):
+        with mock.patch.object(lista_ventas, 'presupuesto_consultas', 1):
+            with self.assertRaises(PresupuestoExcedido):
+                self.client.get(reverse('lista_ventas'))
+
+    @override_settings(METRICAS_PRESUPUESTO_ESTRICTO=False)
+    def test_presupuesto_excedido_sin_modo_estricto_solo_advierte(self):
+        with mock.patch.object(lista_ventas, 'presupuesto_consultas', 1):
+            with self.assertLogs('mi_proyecto.metricas', 'WARNING'):
+                respuesta = self.client.get(reverse('lista_ventas'))
+        self.assertEqual(respuesta.status_code, 200)
+
+
+class DatosSinteticosYBenchmarkTests(TestCase):
+
+    def generar(self, semilla=7):
+        call_command(
+            'generar_datos', '--limpiar', clientes=30, productos=20, detalles=200, semilla=semilla,
+            lote=15, stdout=StringIO(),
+        )
+        return list(Venta.objects.order_by('id').values_list('cliente__email', 'total', 'anulada'))
+
+    def test_generar_datos_crea_lo_pedido_con_totales_correctos(self):
+        self.generar()
+        self.assertEqual(Cliente.objects.count(), 30)
+        self.assertEqual(Producto.objects.count(), 20)
+        self.assertEqual(DetallesVenta.objects.count(), 200)
+        # Los totales guardados coinciden con los detalles.
+        call_command('recalcular_totales', '--verificar', stdout=StringIO())
+        # Y el resumen diario se armó a partir de ellos.
+        self.assertEqual(
+            ResumenVentaDiaria.objects.aggregate(total=Sum('unidades'))['total'],
+            DetallesVenta.objects.filter(venta__anulada=False).aggregate(total=Sum('cantidad'))['total'],
+        )
+
+    def test_generar_datos_es_reproducible_con_la_misma_semilla(self):
+        primera = self.generar()
+        Cliente.objects.update(email=Concat(Value('x'), 'email'))  # Los correos siguen el último id.
+        segunda = self.generar()
+        self.assertEqual(
+            [(total, anulada) for _, total, anulada in primera],
+            [(total, anulada) for _, total, anulada in segunda],
+        )
+
+    def test_benchmark_guarda_y_compara_contra_la_base(self):
+        self.generar()
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'base.json')
+            with self.assertRaisesMessage(CommandError, f'generala primero con --guardar {archivo}'):
+                call_command('benchmark', repeticiones=2, comparar=archivo, stdout=StringIO())
+            salida = StringIO()
+            call_command('benchmark', repeticiones=2, guardar=archivo, stdout=salida)
+
+            with open(archivo, encoding='utf-8') as f:
+                base = json.load(f)
+            self.assertEqual(base['datos']['detalles'], 200)
+            self.assertEqual(base['resultados']['lista_ventas']['consultas'], 2)
+            self.assertIn('editar_venta', base['resultados'])
+            self.assertIn('autocompletar_clientes', base['resultados'])
+
+            call_command('benchmark', repeticiones=2, comparar=archivo, tolerancia=1000, stdout=StringIO())
+
+            base['resultados']['lista_ventas']['consultas'] = 1
+            with open(archivo, 'w', encoding='utf-8') as f:
+                json.dump(base, f)
+            with self.assertRaises(CommandError):
+                call_command('benchmark', repeticiones=2, comparar=archivo, tolerancia=1000, stdout=StringIO())
+
+
+class ExportarVentasTests(TestCase):
+
+    def setUp(self):
+        self.cliente = crear_cliente()
+        self.alfajor = crear_producto('Alfajor', '100.00')
+        self.chicle = crear_producto('=Chicle', '25.50')
+        self.valida = crear_venta(self.cliente, [(self.alfajor, 2), (self.chicle, 1)])
+        self.anulada = crear_venta(self.cliente, [(self.alfajor, 1)], anulada=True)
+
+    def descargar(self, **parametros):
+        respuesta = self.client.get(reverse('exportar_ventas'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        contenido = b''.join(respuesta.streaming_content).decode('utf-8-sig')
+        return [linea.split(',') for linea in contenido.splitlines()]
+
+    def test_exporta_una_fila_por_detalle_en_streaming(self):
+        respuesta = self.client.get(reverse('exportar_ventas'))
+        self.assertTrue(respuesta.streaming)
+        self.assertIn('attachment; filename="ventas-', respuesta['Content-Disposition'])
+
+        filas = self.descargar()
+        self.assertEqual(filas[0][:3], ['venta_id', 'fecha', 'cliente_id'])
+        self.assertEqual(len(filas), 4)
+        # Los textos que Excel tomaría como fórmula se escapan.
+        self.assertIn("'=Chicle", [fila[8] for fila in filas])
+        self.assertIn('25.50', [fila[11] for fila in filas])
+
+    def test_filtra_por_anulada_y_fechas(self):
+        self.assertEqual({fila[0] for fila in self.descargar(anulada='1')[1:]}, {str(self.anulada.id)})
+        self.assertEqual({fila[0] for fila in self.descargar(anulada='0')[1:]}, {str(self.valida.id)})
+
+        Venta.objects.filter(id=self.anulada.id).update(fecha=timezone.now() - timedelta(days=10))
+        hoy = timezone.localdate()
+        self.assertEqual({fila[0] for fila in self.descargar(desde=hoy.isoformat())[1:]}, {str(self.valida.id)})
+        self.assertEqual(
+            {fila[0] for fila in self.descargar(hasta=(hoy - timedelta(days=5)).isoformat())[1:]},
+            {str(self.anulada.id)},
+        )
+
+    def test_parametros_invalidos_dan_400(self):
+        for parametros in ({'desde': 'ayer'}, {'anulada': 'quizas'}, {'formato': 'pdf'}):
+            self.assertEqual(self.client.get(reverse('exportar_ventas'), parametros).status_code, 400)
+
+    @skipUnless(find_spec('openpyxl'), 'openpyxl no está instalado')
+    def test_exporta_xlsx(self):
+        from openpyxl import load_workbook
+
+        respuesta = self.client.get(reverse('exportar_ventas'), {'formato': 'xlsx'})
+        self.assertEqual(respuesta.status_code, 200)
+        libro = load_workbook(BytesIO(b''.join(respuesta.streaming_content)), read_only=True)
+        filas = list(libro['ventas'].values)
+        self.assertEqual(filas[0][0], 'venta_id')
+        self.assertEqual(len(filas), 4)
+
+    def test_comando_exporta_a_archivo(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'ventas.csv')
+            call_command('exportar', 'ventas', salida=archivo, anulada='0', stderr=StringIO())
+            with open(archivo, encoding='utf-8-sig') as f:
+                self.assertEqual(len(f.read().splitlines()), 3)
+        with self.assertRaises(CommandError):
+            call_command('exportar', 'clientes', desde='ayer', stdout=StringIO())
+
+
+class VentasConcurrentesTests(TransactionTestCase):
+    """
+    Muchas cajas vendiendo a la vez las últimas unidades de un producto:
+    nunca se puede vender más de lo que hay en stock.
+    """
+
+    hilos = 12
+    stock_inicial = 5
+
+    def test_no_se_vende_mas_que_el_stock(self):
+        cliente = crear_cliente()
+        producto = crear_producto(stock=self.stock_inicial)
+        barrera = threading.Barrier(self.hilos)
+        resultados = []
+
+        def vender():
+            barrera.wait()
+            try:
+                while True:
+                    try:
+                        registrar_venta(cliente, {producto.id: 1})
+                        resultados.append('vendida')
+                        return
+                    except StockInsuficiente:
+                        resultados.append('sin stock')
+                        return
+                    except OperationalError:
+                        # Base bloqueada por otra caja: reintentamos.
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=vender) for _ in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        producto.refresh_from_db()
+        self.assertEqual(producto.stock, 0)
+        self.assertEqual(resultados.count('vendida'), self.stock_inicial)
+        self.assertEqual(resultados.count('sin stock'), self.hilos - self.stock_inicial)
+        self.assertEqual(Venta.objects.count(), self.stock_inicial)
+        self.assertEqual(DetallesVenta.objects.count(), self.stock_inicial)
+
+    def test_reenvios_simultaneos_registran_una_sola_venta(self):
+        cliente = crear_cliente()
+        producto = crear_producto(stock=1)
+        barrera = threading.Barrier(self.hilos)
+        ventas = []
+
+        def reenviar():
+            barrera.wait()
+            try:
+                while True:
+                    try:
+                        ventas.append(registrar_venta(cliente, {producto.id: 1}, clave='misma').id)
+                        return
+                    except OperationalError:
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=reenviar) for _ in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(ventas), self.hilos)
+        self.assertEqual(set(ventas), set(Venta.objects.values_list('id', flat=True)))
+        self.assertEqual(Venta.objects.count(), 1)
+
+class PerfilBaseDatosTests(TestCase):
+
+    def conectar(self, perfil, nombre):
+        ajustes = connections.configure_settings({'default': base_sqlite(perfil, nombre)})['default']
+        conexion = DatabaseWrapper(ajustes, 'prueba')
+        conexion.ensure_connection()
+        self.addCleanup(conexion.close)
+        return conexion
+
+    def pragma(self, conexion, nombre):
+        return conexion.connection.execute(f'PRAGMA {nombre}').fetchone()[0]
+
+    def test_produccion_aplica_las_pragmas_en_cada_conexion(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            conexion = self.conectar('produccion', os.path.join(carpeta, 'base.sqlite3'))
+            self.assertEqual(self.pragma(conexion, 'journal_mode'), 'wal')
+            self.assertEqual(self.pragma(conexion, 'busy_timeout'), ESPERA_MS)
+            self.assertEqual(self.pragma(conexion, 'synchronous'), 1)  # NORMAL
+            self.assertEqual(self.pragma(conexion, 'cache_size'), -64_000)
+            self.assertEqual(conexion.settings_dict['CONN_MAX_AGE'], 600)
+            conexion.close()
+
+    def test_desarrollo_deja_la_configuracion_de_django(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            conexion = self.conectar('desarrollo', os.path.join(carpeta, 'base.sqlite3'))
+            self.assertEqual(self.pragma(conexion, 'journal_mode'), 'delete')
+            self.assertEqual(conexion.settings_dict['CONN_MAX_AGE'], 0)
+            conexion.close()
+
+    def test_perfil_desconocido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            base_sqlite('rapido', 'base.sqlite3')
+
+    def test_servidores(self):
+        postgresql = base_servidor('postgresql', 'gestion', conexiones=5)
+        self.assertEqual(postgresql['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(postgresql['OPTIONS']['pool']['max_size'], 5)
+        self.assertEqual(postgresql['CONN_MAX_AGE'], 0)
+        # Sin pool, las conexiones quedan abiertas entre solicitudes.
+        self.assertEqual(base_servidor('postgresql', 'gestion', conexiones=0)['CONN_MAX_AGE'], 600)
+        self.assertEqual(base_servidor('mysql', 'gestion')['OPTIONS']['charset'], 'utf8mb4')
+        with self.assertRaises(ImproperlyConfigured):
+            base_servidor('oracle', 'gestion')
+
+
+@skipUnless(connection.vendor == 'sqlite', 'La prueba de carga compara perfiles de SQLite.')
+class PruebaCargaTests(TransactionTestCase):
+    # La copia de la base se hace fuera de una transacción abierta.
+
+    def test_registra_ventas_en_una_copia_con_cada_perfil(self):
+        crear_cliente()
+        for nombre in ('Alfajor', 'Yerba', 'Café'):
+            crear_producto(nombre=nombre, stock=50)
+        salida = StringIO()
+        call_command('prueba_carga', escritores=2, ventas=3, lineas=2, stdout=salida)
+
+        filas = {linea.split()[0]: linea.split() for linea in salida.getvalue().splitlines()[2:]}
+        self.assertEqual(set(filas), {'desarrollo', 'produccion'})
+        # Todas las ventas de `produccion` se registran; la base configurada no cambia.
+        self.assertEqual(filas['produccion'][1], '6')
+        self.assertEqual(filas['produccion'][5], '0')
+        self.assertEqual(Venta.objects.count(), 0)
+
+    def test_sin_stock_suficiente(self):
+        crear_cliente()
+        crear_producto(stock=1)
+        with self.assertRaises(CommandError):
+            call_command('prueba_carga', escritores=2, ventas=3, lineas=1, stdout=StringIO())
+
+
+class CompararAsgiTests(TransactionTestCase):
+    # Los pedidos corren en otros hilos: los datos tienen que estar confirmados.
+
+    def test_mide_cada_vista_por_asgi_y_por_wsgi(self):
+        crear_venta(crear_cliente('Marta'), [(crear_producto('Alfajor'), 1)])
+        salida = StringIO()
+        call_command('comparar_asgi', pedidos=6, concurrencia=3, stdout=salida)
+
+        filas = [linea.split() for linea in salida.getvalue().splitlines()[2:]]
+        self.assertEqual(len(filas), 8)
+        self.assertEqual({fila[1] for fila in filas}, {'asgi', 'wsgi'})
+        # Ningún pedido falló.
+        self.assertEqual({fila[-1] for fila in filas}, {'0'})
+
+    def test_servidores_van_juntos(self):
+        with self.assertRaises(CommandError):
+            call_command('comparar_asgi', asgi='http://127.0.0.1:8001', stdout=StringIO())
+
+
+@skipUnless(connection.vendor == 'sqlite', 'El origen se arma copiando la base de pruebas SQLite.')
+class CopiarDatosTests(TransactionTestCase):
+    # Con SQLite como origen y como destino: el mismo camino que hacia PostgreSQL o MySQL.
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # El comando abre la base de origen con su propio alias.
+        cls.databases = cls.databases | {ORIGEN}
+
+    def setUp(self):
+        carpeta = tempfile.TemporaryDirectory()
+        self.addCleanup(carpeta.cleanup)
+        self.origen = os.path.join(carpeta.name, 'origen.sqlite3')
+
+    def guardar_origen(self):
+        # La base de pruebas pasa a ser el origen y queda vacía como destino.
+        cliente = crear_cliente()
+        alfajor = crear_producto(stock=10)
+        yerba = crear_producto(nombre='Yerba', precio='2500.50', stock=4)
+        registrar_venta(cliente, {alfajor.id: 2, yerba.id: 1})
+        anular_venta(registrar_venta(cliente, {yerba.id: 3}))
+        self.esperado = self.contenido()
+        connection.ensure_connection()
+        destino = sqlite3.connect(self.origen)
+        connection.connection.backup(destino)
+        destino.close()
+        for modelo in (TotalVentaDiaria, ResumenVentaDiaria, DetallesVenta, MovimientoStock, Venta, Producto, Cliente):
+            modelo.objects.all().delete()
+
+    def contenido(self):
+        return {
+            modelo._meta.label: list(modelo.objects.order_by('pk').values())
+            for modelo in (Cliente, Producto, MovimientoStock, Venta, DetallesVenta, ResumenVentaDiaria, TotalVentaDiaria)
+        }
+
+    def test_copia_todo_conservando_los_ids(self):
+        self.guardar_origen()
+        call_command('copiar_datos', self.origen, lote=2, stdout=StringIO())
+
+        self.assertEqual(self.contenido(), self.esperado)
+        self.assertEqual(list(buscar_productos('yer')), list(Producto.objects.filter(nombre='Yerba')))
+        # Los ids nuevos siguen desde los copiados.
+        venta = registrar_venta(Cliente.objects.get(), {Producto.objects.get(nombre='Alfajor').id: 1})
+        self.assertGreater(venta.id, max(fila['id'] for fila in self.esperado['ventas.Venta']))
+
+    def test_no_pisa_datos_existentes(self):
+        self.guardar_origen()
+        call_command('copiar_datos', self.origen, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, 'ya tiene datos'):
+            call_command('copiar_datos', self.origen, stdout=StringIO())
+        call_command('copiar_datos', self.origen, '--limpiar', stdout=StringIO())
+        self.assertEqual(self.contenido(), self.esperado)
+
+    def test_las_migraciones_tienen_que_coincidir(self):
+        self.guardar_origen()
+        with sqlite3.connect(self.origen) as origen:
+            origen.execute("DELETE FROM django_migrations WHERE app = 'ventas' AND name = '0008_totalventadiaria'")
+        with self.assertRaisesMessage(CommandError, 'ventas.0008_totalventadiaria'):
+            call_command('copiar_datos', self.origen, stdout=StringIO())
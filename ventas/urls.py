@@ -7,6 +7,9 @@ urlpatterns = [
     path('ventas/crear/', views.crear_venta, name='crear_venta'),
     path('ventas/editar/<int:venta_id>/', views.editar_venta, name='editar_venta'),
     path('ventas/eliminar/<int:venta_id>/', views.eliminar_venta, name='eliminar_venta'),
-    path('ventas/anuladas/', views.ventas_anuladas, name='ventas_anuladas')
+    path('ventas/eliminar/', views.eliminar_ventas, name='eliminar_ventas'),
+    path('ventas/sincronizar/', views.sincronizar_ventas, name='sincronizar_ventas'),
+    path('ventas/anuladas/', views.ventas_anuladas, name='ventas_anuladas'),
+    path('ventas/exportar/', views.exportar_ventas, name='exportar_ventas'),
 
 ]
@@ -1,23 +1,86 @@
+import asyncio
+import json
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.views.decorators.http import require_POST
+from .exportar import ENCABEZADOS, filas_ventas
 from .models import Venta, DetallesVenta
+from .sincronizacion import MAXIMO_POR_LOTE, sincronizar
+from .servicios import (
+    StockInsuficiente, VentaAnulada, actualizar_venta, anular_venta, anular_ventas, registrar_venta,
+)
+from clientes.busqueda import buscar_clientes
 from clientes.models import Cliente
+from productos.busqueda import buscar_productos
 from productos.models import Producto
-from django.core.paginator import Paginator
+from mi_proyecto.bajas import leer_ids
+from mi_proyecto.cache import arender_lista, contexto_lista
+from mi_proyecto.exportar import exportar, leer_booleano, leer_fecha
+from mi_proyecto.metricas import presupuesto_consultas
+from mi_proyecto.paginacion import paginar
 from django.contrib import messages
-
-def lista_ventas(request):
-    ventas = Venta.objects.filter(anulada = False).order_by('-fecha')  # ordenadas por fecha descendente
-    paginator = Paginator(ventas, 2)  # mostrar 4 ventas por página
-
-    page_number = request.GET.get('page') or 1
-    pagina_actual = paginator.get_page(page_number)
-
-    return render(request, 'ventas/lista_ventas.html', {
-        'pagina_actual': pagina_actual
-    })
-
-
-def crear_venta(request):
+from django.db.models import Prefetch
+
+
+# Cantidad máxima de resultados que muestran los buscadores de la venta.
+LIMITE_BUSQUEDA = 50
+
+
+def ventas_con_detalles(anulada):
+    """
+    Devuelve las ventas listas para mostrarse en una tabla.
+    El cliente viene en el mismo JOIN y los detalles (con su producto) se cargan
+    en una sola consulta adicional, así la cantidad de consultas no depende de
+    cuántas ventas o detalles haya. El total ya está guardado en la venta.
+    """
+    detalles = DetallesVenta.objects.select_related('producto').order_by('id')
+    return (
+        Venta.objects.filter(anulada=anulada)
+        .select_related('cliente')
+        .prefetch_related(Prefetch('detallesventa_set', queryset=detalles))
+    )
+
+
+def leer_cantidades(request, productos_ids):
+    """
+    Lee la cantidad de cada producto seleccionado en el formulario.
+    Devuelve un diccionario {id de producto: cantidad}, o None si alguna
+    cantidad no es válida (en ese caso deja el mensaje de error cargado).
+    """
+    cantidades = {}
+    for prod_id in productos_ids:
+        try:
+            cantidad = int(request.POST.get(f'cantidad_{prod_id}'))
+            if cantidad <= 0:
+                raise ValueError
+            cantidades[int(prod_id)] = cantidad
+        except (ValueError, TypeError):
+            messages.error(request, "Cantidad inválida.")
+            return None
+    return cantidades
+
+
+async def listar(queryset):
+    return [objeto async for objeto in queryset]
+
+
+@presupuesto_consultas(2)
+async def lista_ventas(request):
+    ventas = ventas_con_detalles(anulada=False)
+    pagina_actual = paginar(request, ventas, ('-fecha', '-id'), 'ventas')  # ordenadas por fecha descendente
+
+    # Las ventas muestran el nombre del cliente y de cada producto.
+    return await arender_lista(
+        request, 'ventas/lista_ventas.html', 'lista_ventas', {'pagina_actual': pagina_actual},
+        'ventas', 'clientes', 'productos',
+    )
+
+
+@presupuesto_consultas(16)
+async def crear_venta(request):
     # Obtenemos los parámetros de búsqueda de cliente y producto desde la URL
     cliente_query = request.GET.get('buscar_cliente', '')
     producto_query = request.GET.get('buscar_producto', '')
@@ -28,79 +91,65 @@ def crear_venta(request):
 
     # Si hay consultas de búsqueda, filtramos los clientes y productos
     if cliente_query:
-        clientes = Cliente.objects.filter(nombre__icontains=cliente_query)
+        clientes = buscar_clientes(cliente_query)[:LIMITE_BUSQUEDA]
     if producto_query:
-        productos = Producto.objects.filter(nombre__icontains=producto_query, stock__gt=0)
+        productos = buscar_productos(producto_query, Producto.objects.filter(stock__gt=0))[:LIMITE_BUSQUEDA]
         
     # Incializamos variables para almacenar el cliente seleccionado y los productos seleccionados
     cliente_seleccionado = ''
     productos_seleccionados = []
+    # Clave de idempotencia del formulario: si se envía dos veces, la venta se
+    # registra una sola (ver registrar_venta). Tras un error se conserva la misma.
+    clave = request.POST.get('clave', '')[:64] or uuid.uuid4().hex
 
     if request.method == 'POST':
-        # Obtener el id del cliente que viene desde el formulario enviado por POST.
-        cliente_id = request.POST.get('cliente')
-        #Buscamos el cliente en la base de datos, si no lo encuentra, devuelve un 404.
-        cliente = get_object_or_404(Cliente, id=cliente_id)
-
-        # Obtenemos los IDs de los productos seleccionados desde el formulario.
-        productos_ids = request.POST.getlist('productos')
-        
-        productos_seleccionados = productos_ids
-        cliente_seleccionado = cliente_id
-
-        hay_error = False  # Bandera para controlar errores
-        
-
-        # Hacemos una validación de los productos seleccionados
-        for prod_id in productos_ids:
-            producto = get_object_or_404(Producto, id=prod_id)
-            cantidad_str = request.POST.get(f'cantidad_{prod_id}')
-
-            # Si la cantidad no es valida, mostramos un mensaje de error y salimos del bucle.
-            try:
-                cantidad = int(cantidad_str)
-                if cantidad <= 0:
-                    raise ValueError
-            except (ValueError, TypeError):
-                messages.error(request, "Cantidad inválida.")
-                hay_error = True
-                break  
-            
-            # Si la cantidad es valida, verificamos si hay suficiente stock.
-            if producto.stock < cantidad:
-                messages.error(request, f'Stock insuficiente para el producto {producto.nombre}.')
-                hay_error = True
-                break
-
-        if not hay_error:
-            venta = Venta.objects.create(cliente=cliente)
-            for prod_id in productos_ids:
-                producto = get_object_or_404(Producto, id=prod_id)
-                cantidad = int(request.POST.get(f'cantidad_{prod_id}'))
-
-                DetallesVenta.objects.create(
-                    venta=venta,
-                    producto=producto,
-                    cantidad=cantidad,
-                    precio_unitario=producto.precio
-                )
-
-                producto.stock -= cantidad
-                producto.save()
-
-            messages.success(request, "✅ Venta registrada correctamente.")
-            return redirect('lista_ventas')
-
-    return render(request, 'ventas/crear_venta.html', {
+        # Obtener el id del cliente y los IDs de los productos que vienen desde el formulario enviado por POST.
+        cliente_seleccionado = request.POST.get('cliente')
+        productos_seleccionados = request.POST.getlist('productos')
+        # registrar_venta usa transacciones, que el ORM asíncrono no tiene: va en el hilo de la base.
+        respuesta = await sync_to_async(guardar_venta)(request, cliente_seleccionado, productos_seleccionados, clave)
+        if respuesta is not None:
+            return respuesta
+
+    # Las dos búsquedas se piden a la vez.
+    clientes, productos = await asyncio.gather(listar(clientes), listar(productos))
+    # La plantilla es síncrona (lee los mensajes de la sesión).
+    return await sync_to_async(render)(request, 'ventas/crear_venta.html', {
         'clientes': clientes,
         'productos': productos,
         'cliente_seleccionado': cliente_seleccionado,
         'productos_seleccionados': productos_seleccionados,
         'cliente_query': cliente_query,
         'producto_query': producto_query,
+        'clave': clave,
     })
 
 
+def guardar_venta(request, cliente_id, productos_ids, clave):
+    """
+    Registra la venta del formulario de `crear_venta`. Devuelve la redirección
+    a la lista, o None si no se pudo (el motivo queda en los mensajes).
+    """
+    #Buscamos el cliente en la base de datos, si no lo encuentra, devuelve un 404.
+    cliente = get_object_or_404(Cliente, id=cliente_id)
+
+    # Validamos las cantidades antes de tocar la base de datos.
+    cantidades = leer_cantidades(request, productos_ids)
+    if cantidades is None:
+        return None
+    try:
+        registrar_venta(cliente, cantidades, clave=clave)
+    except Producto.DoesNotExist:
+        raise Http404('Producto no encontrado.')
+    except StockInsuficiente as error:
+        # La transacción ya se deshizo, no quedó ninguna parte de la venta guardada.
+        messages.error(request, str(error))
+        return None
+    messages.success(request, "✅ Venta registrada correctamente.")
+    return redirect('lista_ventas')
+
+
+@presupuesto_consultas(21)
 def editar_venta(request, venta_id):
     venta = get_object_or_404(Venta, id=venta_id)
     detalles = venta.detallesventa_set.all()
@@ -108,7 +157,7 @@ def editar_venta(request, venta_id):
     cliente_query = request.GET.get('buscar_cliente', '')
     producto_query = request.GET.get('buscar_producto', '')
 
-    cantidades_anteriores = {detalle.producto.id: detalle.cantidad for detalle in detalles}
+    cantidades_anteriores = {detalle.producto_id: detalle.cantidad for detalle in detalles}
     cantidades_anteriores_list = list(cantidades_anteriores.items())
 
     clientes = Cliente.objects.none()
@@ -119,9 +168,9 @@ def editar_venta(request, venta_id):
     productos_seleccionados = []
     
     if cliente_query:
-        clientes = Cliente.objects.filter(nombre__icontains=cliente_query)
+        clientes = buscar_clientes(cliente_query)[:LIMITE_BUSQUEDA]
     if producto_query:
-        productos = Producto.objects.filter(nombre__icontains=producto_query, stock__gt=0)
+        productos = buscar_productos(producto_query, Producto.objects.filter(stock__gt=0))[:LIMITE_BUSQUEDA]
         
         # Sumamos la cantidad anterior al stock para productos que ya estaban en la venta
         for producto in productos:
@@ -139,51 +188,21 @@ def editar_venta(request, venta_id):
         productos_seleccionados = productos_ids
         cliente_seleccionado = cliente_id
 
-        hay_error = False
+        cantidades = leer_cantidades(request, productos_ids)
 
-        for prod_id in productos_ids:
-            producto = get_object_or_404(Producto, id=prod_id)
-            cantidad_str = request.POST.get(f'cantidad_{prod_id}')
+        if cantidades is not None:
             try:
-                cantidad = int(cantidad_str)
-                if cantidad <= 0:
-                    raise ValueError
-            except (ValueError, TypeError):
-                messages.error(request, "Cantidad inválida.")
-                hay_error = True
-                break
-
-            cantidad_anterior = cantidades_anteriores.get(producto.id, 0)
-            stock_disponible = producto.stock + cantidad_anterior
-
-            if stock_disponible < cantidad:
-                messages.error(request, f'Stock insuficiente para el producto {producto.nombre}. Stock disponible: {stock_disponible}.')
-                hay_error = True
-                break
-
-        if not hay_error:
-            venta.cliente = cliente
-            venta.save()
-            venta.detallesventa_set.all().delete()
-
-            for prod_id in productos_ids:
-                producto = get_object_or_404(Producto, id=prod_id)
-                cantidad = int(request.POST.get(f'cantidad_{prod_id}'))
-
-                DetallesVenta.objects.create(
-                    venta=venta,
-                    producto=producto,
-                    cantidad=cantidad,
-                    precio_unitario=producto.precio
-                )
-
-                cantidad_anterior = cantidades_anteriores.get(producto.id, 0)
-                stock_actual = producto.stock + cantidad_anterior
-                producto.stock = stock_actual - cantidad
-                producto.save()
-
-            messages.success(request, "✅ Venta actualizada correctamente.")
-            return redirect('lista_ventas')
+                actualizar_venta(venta, cliente, cantidades)
+            except Producto.DoesNotExist:
+                raise Http404('Producto no encontrado.')
+            except StockInsuficiente as error:
+                messages.error(request, f'{error} Stock disponible: {error.disponible}.')
+            except VentaAnulada as error:
+                messages.error(request, str(error))
+                return redirect('lista_ventas')
+            else:
+                messages.success(request, "✅ Venta actualizada correctamente.")
+                return redirect('lista_ventas')
 
     return render(request, 'ventas/formulario_venta.html', {
         'venta': venta,
@@ -199,25 +218,73 @@ def editar_venta(request, venta_id):
 
     
     
+@presupuesto_consultas(11)
 def eliminar_venta(request, venta_id):
     venta = get_object_or_404(Venta, id=venta_id)
     
     if request.method == 'POST':
-        venta.anulada = True
-        venta.save()
+        anular_venta(venta)
         
         messages.success(request, " Venta marcada como inactiva.")
         return redirect('lista_ventas')
 
     return render(request, 'ventas/eliminar_venta.html', {'venta': venta})
 
+# Sin presupuesto de consultas: el resumen diario suma cuatro por cada día
+# que tenga ventas anuladas (ver resumen.py).
+@require_POST
+def eliminar_ventas(request):
+    """
+    Anula de una vez las ventas marcadas (los `ids` del formulario).
+    """
+    anuladas = anular_ventas(leer_ids(request))
+    messages.success(request, f" {anuladas} venta(s) marcada(s) como inactiva(s).")
+    return redirect('lista_ventas')
+
+
+# Sin presupuesto de consultas: el resumen diario suma cuatro por cada día
+# que tenga ventas del lote (ver resumen.py).
+@require_POST
+def sincronizar_ventas(request):
+    """
+    Recibe las ventas que una caja registró sin conexión (ver
+    sincronizacion.py) como JSON {"ventas": [...]} y devuelve
+    {"resultados": [...]}, uno por venta y en el mismo orden.
+    """
+    try:
+        lote = json.loads(request.body)['ventas']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Se espera un JSON con la lista "ventas".'}, status=400)
+    if not isinstance(lote, list) or len(lote) > MAXIMO_POR_LOTE:
+        return JsonResponse({'error': f'"ventas" tiene que ser una lista de hasta {MAXIMO_POR_LOTE}.'}, status=400)
+    return JsonResponse({'resultados': sincronizar(lote)})
+
+
+@presupuesto_consultas(2)
 def ventas_anuladas(request):
-    ventas = Venta.objects.filter(anulada=True).order_by('-fecha')
-    paginator = Paginator(ventas, 2)  # mostrar 4 ventas por página
-
-    page_number = request.GET.get('page') or 1
-    pagina_actual = paginator.get_page(page_number)
+    ventas = ventas_con_detalles(anulada=True)
+    pagina_actual = paginar(request, ventas, ('-fecha', '-id'), 'ventas')
 
     return render(request, 'ventas/ventas_anuladas.html', {
-        'pagina_actual': pagina_actual
-    })
\ No newline at end of file
+        'pagina_actual': pagina_actual,
+        **contexto_lista('ventas', 'clientes', 'productos'),
+    })
+
+
+@presupuesto_consultas(1)
+def exportar_ventas(request):
+    """
+    Descarga todas las ventas con sus detalles en CSV (por defecto) o XLSX
+    (`?formato=xlsx`). Filtros opcionales: `?desde=` y `?hasta=` (AAAA-MM-DD)
+    y `?anulada=1` o `0`.
+    """
+    try:
+        filtros = {
+            'desde': leer_fecha(request.GET.get('desde')),
+            'hasta': leer_fecha(request.GET.get('hasta')),
+            'anulada': leer_booleano(request.GET.get('anulada')),
+        }
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    return exportar(request, 'ventas', ENCABEZADOS, filas_ventas(**filtros))
+